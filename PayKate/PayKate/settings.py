@@ -46,11 +46,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "WalletService.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "WalletService.routers.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -87,12 +89,70 @@ DATABASES = {
         "PASSWORD": env("POSTGRES_USER_PSWD"),
         "HOST": "localhost",
         "PORT": 5432,
+        # seconds a connection of a thread is kept open between requests,
+        # 0 - closed at the end of every request, checked before reuse
+        "CONN_MAX_AGE": env.int("CONN_MAX_AGE", default=0),
+        "CONN_HEALTH_CHECKS": True,
         "TEST": {
             "NAME": "test_walletservice",
         },
     }
 }
 
+# POSTGRES_POOL=true: requests borrow connections of a pool of the process
+# and return them when they end. Connections idle for POSTGRES_POOL_CHECK_INTERVAL
+# seconds are checked before reuse, replaced after POSTGRES_POOL_MAX_LIFETIME
+if env.bool("POSTGRES_POOL", default=False):
+    DATABASES["default"].update(
+        {
+            "ENGINE": "WalletService.pooled_postgresql",
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {
+                "pool": {
+                    "min_size": env.int("POSTGRES_POOL_MIN_SIZE", default=2),
+                    "max_size": env.int("POSTGRES_POOL_MAX_SIZE", default=20),
+                    "max_lifetime": env.int("POSTGRES_POOL_MAX_LIFETIME", default=1800),
+                    "max_idle": env.int("POSTGRES_POOL_MAX_IDLE", default=600),
+                    "check_interval": env.int(
+                        "POSTGRES_POOL_CHECK_INTERVAL", default=30
+                    ),
+                    "timeout": env.float("POSTGRES_POOL_TIMEOUT", default=5.0),
+                },
+            },
+        }
+    )
+
+# Read replicas of default, e.g. POSTGRES_REPLICA_HOSTS=replica1,replica2.
+# Safe requests to REPLICA_READ_ROUTES read from a replica, users who made
+# an unsafe request within READ_YOUR_WRITES_SECONDS read from default.
+# Replicas failing to connect are skipped for REPLICA_RETRY_SECONDS
+REPLICA_DATABASES = []
+for number, host in enumerate(env.list("POSTGRES_REPLICA_HOSTS", default=[])):
+    alias = f"replica{number + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["WalletService.routers.ReplicaRouter"]
+
+REPLICA_READ_ROUTES = [
+    "wallets/",
+    "transactions/",
+    "transactions/<str:name>/",
+    "async/wallets/",
+    "async/transactions/",
+]
+READ_YOUR_WRITES_SECONDS = env.int("READ_YOUR_WRITES_SECONDS", default=5)
+REPLICA_RETRY_SECONDS = env.int("REPLICA_RETRY_SECONDS", default=30)
+
+# Users who wrote are pinned to default by cache entries, so with replicas and
+# several processes the cache has to be shared by them,
+# e.g. CACHE_URL=dbcache://paykate_cache after manage.py createcachetable
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -112,6 +172,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Registration passwords are hashed by PASSWORD_HASHING_WORKERS threads with
+# PASSWORD_HASHING_QUEUE more waiting. Registering requests wait for their hash,
+# so this caps the request workers held by registrations: those which find
+# no place are answered with 503 at once
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+PASSWORD_HASHING_QUEUE = env.int("PASSWORD_HASHING_QUEUE", default=8)
+
+# Fast profile for tests and benchmarks only: new passwords are hashed with
+# MD5, thousands of times faster than PBKDF2. PBKDF2 hashes still verify
+if env.bool("FAST_PASSWORD_HASHING", default=False):
+    PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    ]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -136,3 +211,56 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 WALLET_NAME_LENGTH = 8
+# key of the permutation hiding the order of wallet names within a name block
+WALLET_NAME_KEY = env("WALLET_NAME_KEY", default=SECRET_KEY)
+
+TRANSACTIONS_PAGE_SIZE = 50
+
+BULK_TRANSACTIONS_MAX = 1000
+
+# Number of rows fetched from a server-side cursor at once by exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Hours stored responses of requests with Idempotency-Key are kept for
+IDEMPOTENCY_KEY_TTL = 24
+
+# Max number of wallets which metadata (name, id, currency, owner) is cached
+# in process memory to skip wallet lookups on transfers. 0 turns cache off
+WALLET_CACHE_SIZE = env.int("WALLET_CACHE_SIZE", default=0)
+
+# Queued mode: POST /transactions/ only enqueues a PENDING transaction,
+# which is settled later by the settle_transactions worker
+TRANSACTIONS_QUEUED = env.bool("TRANSACTIONS_QUEUED", default=False)
+
+# Transfer fee rates per currency of the sender wallet. Transfers between
+# wallets of one owner cost same_owner rate, other transfers are charged by
+# volume bands: (transfer amount from, rate) pairs. Rates are fractions of the
+# transfer amount with up to 4 decimal places ("0.015" is 1.5%), amounts are
+# in whole cents
+TRANSFER_FEES = {
+    "USD": {"same_owner": "0.00", "cross_owner": [("0.00", "0.10")]},
+    "EUR": {"same_owner": "0.00", "cross_owner": [("0.00", "0.10")]},
+    "RUB": {"same_owner": "0.00", "cross_owner": [("0.00", "0.10")]},
+}
+
+# Seconds exchange rates cached in process memory are used without checking
+# the rate table version, loaded with the load_exchange_rates command
+FX_RATES_TTL = env.int("FX_RATES_TTL", default=60)
+
+# bearer tokens are checked without database queries, sessions and
+# basic auth are kept for the browsable api
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "WalletService.tokens.TokenAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    "EXCEPTION_HANDLER": "WalletService.views.token_exception_handler",
+}
+
+# Seconds access tokens and refresh tokens of POST /token/ are valid for
+ACCESS_TOKEN_LIFETIME = env.int("ACCESS_TOKEN_LIFETIME", default=300)
+REFRESH_TOKEN_LIFETIME = env.int("REFRESH_TOKEN_LIFETIME", default=24 * 60 * 60)
+
+# Requests making more SQL queries than this are logged as warnings, 0 turns it off
+QUERY_BUDGET = env.int("QUERY_BUDGET", default=0)
@@ -16,12 +16,23 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic.base import RedirectView
+from WalletService.async_views import (
+    AsyncTransactionView,
+    AsyncWalletDetailView,
+    AsyncWalletListView,
+)
 from WalletService.views import (  # TransactionDetailView,; TransactionListView,
     CreateUserView,
     ListUserView,
+    MetricsView,
+    TokenObtainView,
+    TokenRefreshView,
+    TransactionBulkView,
+    TransactionExportView,
     TransactionViewSet,
     WalletDetailView,
     WalletListView,
+    WalletStatementView,
     WalletTransactionView,
 )
 
@@ -33,9 +44,18 @@ urlpatterns = [
     path("register/", CreateUserView.as_view(), name="user-registration"),
     path("users/", ListUserView.as_view(), name="user-list"),
     path("api-auth/", include("rest_framework.urls")),
+    path("token/", TokenObtainView.as_view()),
+    path("token/refresh/", TokenRefreshView.as_view()),
     path("wallets/", WalletListView.as_view(), name="wallets-list"),
     path("wallets/<str:name>/", WalletDetailView.as_view()),
+    path("wallets/<str:name>/statement/", WalletStatementView.as_view()),
     path("transactions/", transaction_list),
     path("transactions/<int:id>/", transaction_detail),
+    path("transactions/bulk/", TransactionBulkView.as_view()),
+    path("transactions/export/", TransactionExportView.as_view()),
     path("transactions/<str:name>/", WalletTransactionView.as_view()),
+    path("async/wallets/", AsyncWalletListView.as_view()),
+    path("async/wallets/<str:name>/", AsyncWalletDetailView.as_view()),
+    path("async/transactions/", AsyncTransactionView.as_view()),
+    path("metrics/", MetricsView.as_view()),
 ]
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class WalletserviceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "WalletService"
+
+    def ready(self):
+        """Connects signal handlers, loads fee schedules and password validators"""
+        from WalletService import signals  # noqa: F401
+        from WalletService.fees import load_fee_schedules
+        from WalletService.passwords import preload_password_validators
+
+        load_fee_schedules()
+        preload_password_validators()
@@ -0,0 +1,162 @@
+"""This module is for async views served under ASGI.
+
+They mirror wallet and transaction endpoints of views module and return
+the same data, but queries are made with Django async ORM methods, so a
+slow client doesn't hold a worker thread. DRF views are sync only, that's
+why these are plain Django views reusing DRF serializers. Parts that Django
+can't run asynchronously (atomic blocks of transfers, DRF pagination) are
+run in a thread with sync_to_async.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import (
+    APIException,
+    NotAuthenticated,
+    ParseError,
+    PermissionDenied,
+)
+from rest_framework.request import Request
+from rest_framework.status import (
+    HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_403_FORBIDDEN,
+    HTTP_404_NOT_FOUND,
+)
+from WalletService.models import Transaction, Wallet
+from WalletService.pagination import TransactionCursorPagination
+from WalletService.resolvers import get_wallet_resolver
+from WalletService.serializers import TransactionSerializer, WalletSerializer
+from WalletService.tokens import TokenAuthentication
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """Base async view: authenticates user and turns API errors into json.
+    CSRF is checked for session users only, like DRF views do
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Lets only authenticated users in"""
+        try:
+            request.authenticated_user = await authenticated_user(request)
+            response = super().dispatch(request, *args, **kwargs)
+            # method not allowed response isn't awaitable in Django 4.1
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+        except APIException as error:
+            response = JsonResponse({"detail": error.detail}, status=error.status_code)
+            if getattr(error, "auth_header", None):
+                response["WWW-Authenticate"] = error.auth_header
+            return response
+
+
+async def authenticated_user(request):
+    """Returns user of the request, of its session or of its bearer token,
+    tried in the order of DEFAULT_AUTHENTICATION_CLASSES. Invalid tokens are
+    unauthorized and anonymous requests forbidden, as in DRF views
+    """
+    user = await sync_to_async(get_user)(request)
+    if user.is_authenticated:
+        SessionAuthentication().enforce_csrf(request)
+        return user
+    user_and_claims = TokenAuthentication().authenticate(request)
+    if user_and_claims is None:
+        raise PermissionDenied(NotAuthenticated.default_detail)
+    return user_and_claims[0]
+
+
+def request_data(request):
+    """Parses json or form request body"""
+    if request.content_type != "application/json":
+        return request.POST
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ParseError()
+    if not isinstance(data, dict):
+        raise ParseError("Expected a json object")
+    return data
+
+
+class AsyncWalletListView(AsyncAPIView):
+    """Async API view for all user's wallets"""
+
+    async def get(self, request, *args, **kwargs):
+        """Lists user wallets"""
+        wallets = [
+            wallet
+            async for wallet in Wallet.objects.filter(
+                user=request.authenticated_user
+            ).with_shard_balance()
+        ]
+        return JsonResponse(WalletSerializer(wallets, many=True).data, safe=False)
+
+
+class AsyncWalletDetailView(AsyncAPIView):
+    """Async API view for a single wallet"""
+
+    async def get(self, request, *args, **kwargs):
+        """Shows user's wallet with a given name"""
+        try:
+            wallet = await Wallet.objects.with_shard_balance().aget(
+                user=request.authenticated_user, name=kwargs["name"]
+            )
+        except Wallet.DoesNotExist:
+            return JsonResponse({"detail": "Not found."}, status=HTTP_404_NOT_FOUND)
+        return JsonResponse(WalletSerializer(wallet).data)
+
+
+class AsyncTransactionView(AsyncAPIView):
+    """Async API view for listing and creating user's transactions"""
+
+    async def get(self, request, *args, **kwargs):
+        """Lists a page of user's transactions"""
+        return JsonResponse(await sync_to_async(self.get_page)(request))
+
+    def get_page(self, request):
+        """Paginates transactions the same way as sync endpoint"""
+        queryset = Transaction.objects.for_user(
+            request.authenticated_user
+        ).with_wallet_names()
+        paginator = TransactionCursorPagination()
+        page = paginator.paginate_queryset(queryset, Request(request), view=self)
+        data = TransactionSerializer(page, many=True).data
+        return paginator.get_paginated_response(data).data
+
+    async def post(self, request, *args, **kwargs):
+        """Creates a transaction from user's wallet"""
+        data = request_data(request)
+        # both wallets are resolved asynchronously here,
+        # so the serializer validation doesn't query them again
+        sender, _ = await get_wallet_resolver(request).aresolve(
+            data.get("sender"), data.get("receiver")
+        )
+        if not sender:
+            return JsonResponse(
+                {"detail": "Sender wallet doesn't exist"}, status=HTTP_404_NOT_FOUND
+            )
+        if sender.user_id != request.authenticated_user.pk:
+            return JsonResponse(
+                {"detail": "Sender wallet is not user's wallet"},
+                status=HTTP_403_FORBIDDEN,
+            )
+
+        serializer = TransactionSerializer(data=data, context={"request": request})
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+        transaction_ = await sync_to_async(serializer.save)()
+        status = (
+            HTTP_202_ACCEPTED if transaction_.status == "PENDING" else HTTP_201_CREATED
+        )
+        return JsonResponse(serializer.data, status=status)
@@ -0,0 +1,750 @@
+"""
+WalletService benchmarks: throughput and latency of the API endpoints and
+of the services behind them, run by the benchmark command on seeded data
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+import timeit
+import tracemalloc
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from WalletService.fees import amount_with_fee, fee_amount, transfer_fee
+from WalletService.fx import exchange_rate, rate_cache
+from WalletService.models import CURRENCIES, ExchangeRate, Transaction, Wallet
+from WalletService.names import WalletNameGenerator, wallet_names
+from WalletService.passwords import reset_hashing_pool
+from WalletService.services import settle_pending_transfers, transfer
+from WalletService.tokens import issue_tokens
+
+SEED_CHUNK_SIZE = 10_000
+# users making requests in turns, every one has a logged in client
+ACTIVE_USERS = 16
+PASSWORD = "Bench-mark-2022!"
+PBKDF2_HASHERS = ["django.contrib.auth.hashers.PBKDF2PasswordHasher"]
+
+
+class Timings:
+    """Durations of calls of a benchmark and their summary"""
+
+    def __init__(self):
+        """Starts with no calls"""
+        self.durations = []
+        self.errors = 0
+        self.seconds = 0.0
+
+    def call(self, function, *args):
+        """Calls a function, counting falsy results and exceptions as errors"""
+        start = time.perf_counter()
+        try:
+            ok = function(*args)
+        except Exception:
+            ok = False
+        self.durations.append(time.perf_counter() - start)
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        """Throughput and latency percentiles in milliseconds"""
+        durations = sorted(self.durations)
+        seconds = self.seconds or sum(durations)
+        return {
+            "calls": len(durations),
+            "errors": self.errors,
+            "seconds": round(seconds, 4),
+            "throughput": round(len(durations) / seconds, 2) if seconds else None,
+            "mean_ms": milliseconds(
+                sum(durations) / len(durations) if durations else 0
+            ),
+            "p50_ms": milliseconds(percentile(durations, 50)),
+            "p99_ms": milliseconds(percentile(durations, 99)),
+        }
+
+
+def percentile(durations, percent):
+    """Nearest rank percentile of sorted durations"""
+    if not durations:
+        return 0
+    rank = max(0, -(-len(durations) * percent // 100) - 1)
+    return durations[int(rank)]
+
+
+def milliseconds(seconds):
+    """Seconds in milliseconds, rounded to microseconds"""
+    return round(seconds * 1000, 3)
+
+
+def sequential(calls, function):
+    """Times calls of function(index) one after another"""
+    timings = Timings()
+    start = time.perf_counter()
+    for index in range(calls):
+        timings.call(function, index)
+    timings.seconds = time.perf_counter() - start
+    return timings
+
+
+def concurrent(workers, calls, make_worker):
+    """Times calls spread over worker threads, each calling the function
+    make_worker(worker index) returns. Every thread uses its own connection
+    """
+    timings = Timings()
+    barrier = threading.Barrier(workers + 1)
+
+    def run(worker):
+        """Calls the worker function its share of calls"""
+        try:
+            function = make_worker(worker)
+            barrier.wait()
+            for index in range(worker, calls, workers):
+                timings.call(function, index)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=run, args=(worker,)) for worker in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    timings.seconds = time.perf_counter() - start
+    return timings
+
+
+def logged_in_client(user, client_class=Client):
+    """Test client with a session of the user"""
+    client = client_class()
+    client.force_login(user)
+    return client
+
+
+def active_clients(data):
+    """Logged in clients of the first users"""
+    return [
+        logged_in_client(data.user(index))
+        for index in range(min(len(data.users), ACTIVE_USERS))
+    ]
+
+
+def succeeded(response):
+    """Whether a test client response is successful"""
+    return response.status_code < 400
+
+
+class BenchmarkData:
+    """Seeded users with wallets in every currency and transactions between them"""
+
+    def __init__(self, users, wallets_per_user, transactions, seed):
+        """Seeds the database, wallets of a user take currencies in turns"""
+        self.random = random.Random(seed)
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(username=f"bench{index}", password=password) for index in range(users)
+        )
+        self.users = list(
+            User.objects.filter(username__startswith="bench").order_by("id")
+        )
+        names = iter(wallet_names.names(users * wallets_per_user))
+        Wallet.objects.bulk_create(
+            Wallet(
+                name=next(names),
+                type="Visa",
+                currency=CURRENCIES[number % len(CURRENCIES)],
+                balance=1_000_000,
+                user=user,
+            )
+            for user in self.users
+            for number in range(wallets_per_user)
+        )
+        self.wallets = {user.pk: [] for user in self.users}
+        for wallet in Wallet.objects.filter(user__in=self.users).order_by("id"):
+            self.wallets[wallet.user_id].append(wallet)
+        self.seed_transactions(transactions)
+
+    def seed_transactions(self, count):
+        """Paid transactions between random wallets of the same currency"""
+        by_currency = {}
+        for wallets in self.wallets.values():
+            for wallet in wallets:
+                by_currency.setdefault(wallet.currency, []).append(wallet)
+        pools = list(by_currency.values())
+        for start in range(0, count, SEED_CHUNK_SIZE):
+            batch = []
+            for _ in range(min(SEED_CHUNK_SIZE, count - start)):
+                sender, receiver = self.random.sample(self.random.choice(pools), 2)
+                amount = Decimal(self.random.randint(100, 10000)).scaleb(-2)
+                batch.append(
+                    Transaction(
+                        sender=sender,
+                        receiver=receiver,
+                        transfer_amount=amount,
+                        received_amount=amount,
+                        status="PAID",
+                    )
+                )
+            Transaction.objects.bulk_create(batch)
+
+    def user(self, index):
+        """User by index, wrapping around"""
+        return self.users[index % len(self.users)]
+
+    def wallet(self, index, currency="USD"):
+        """Wallet of a user in the currency, None if the user has none"""
+        for wallet in self.wallets[self.user(index).pk]:
+            if wallet.currency == currency:
+                return wallet
+        return None
+
+
+def post_transactions(data, options):
+    """POST /transactions/ between wallets of different users"""
+    clients = active_clients(data)
+
+    def post(index):
+        """Posts a transfer to the wallet of the next user"""
+        user = index % len(clients)
+        response = clients[user].post(
+            "/transactions/",
+            data={
+                "sender": data.wallet(user).name,
+                "receiver": data.wallet(user + 1).name,
+                "transfer_amount": "1.00",
+            },
+        )
+        return succeeded(response)
+
+    return sequential(options["requests"], post).summary()
+
+
+def get_endpoint(url):
+    """Benchmark of a GET endpoint, url is formatted with the user wallet"""
+
+    def benchmark(data, options):
+        """GET requests of users in turns"""
+        clients = active_clients(data)
+
+        def get(index):
+            """Gets the page as a user"""
+            user = index % len(clients)
+            return succeeded(clients[user].get(url.format(wallet=data.wallet(user))))
+
+        return sequential(options["requests"], get).summary()
+
+    benchmark.__doc__ = f"GET {url}"
+    return benchmark
+
+
+def register(data, options):
+    """POST /register/, password hashing included"""
+    client = Client()
+
+    def post(index):
+        """Registers a new user"""
+        username = f"registered{index}"
+        response = client.post(
+            "/register/",
+            data={
+                "username": username,
+                "password": PASSWORD,
+                "password2": PASSWORD,
+                "email": f"{username}@example.com",
+            },
+        )
+        return succeeded(response)
+
+    return sequential(options["register_requests"], post).summary()
+
+
+def registration_burst(data, options):
+    """p99 of POST /transactions/ alone and during a burst of POST /register/,
+    with every registration hashing at once (unbounded) and with the hashing
+    pool of the settings (bounded). Passwords are hashed with PBKDF2 even if
+    FAST_PASSWORD_HASHING is on
+    """
+    client = logged_in_client(data.user(1))
+    payload = {
+        "sender": data.wallet(1).name,
+        "receiver": data.wallet(0).name,
+        "transfer_amount": "0.01",
+    }
+    usernames = itertools.count()
+
+    def post_transactions():
+        """Times transfers made one by one"""
+        return sequential(
+            options["requests"],
+            lambda index: succeeded(client.post("/transactions/", data=payload)),
+        ).summary()
+
+    def burst(stop, statuses):
+        """Registers users until stopped, collects response statuses"""
+        burst_client = Client()
+        try:
+            while not stop.is_set():
+                username = f"burst{next(usernames)}"
+                response = burst_client.post(
+                    "/register/",
+                    data={
+                        "username": username,
+                        "password": PASSWORD,
+                        "password2": PASSWORD,
+                    },
+                )
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    results = {"alone": post_transactions()}
+    pools = {
+        "unbounded": {
+            "PASSWORD_HASHING_WORKERS": options["concurrency"],
+            "PASSWORD_HASHING_QUEUE": 0,
+        },
+        "bounded": {
+            "PASSWORD_HASHING_WORKERS": settings.PASSWORD_HASHING_WORKERS,
+            "PASSWORD_HASHING_QUEUE": settings.PASSWORD_HASHING_QUEUE,
+        },
+    }
+    for name, pool in pools.items():
+        with override_settings(PASSWORD_HASHERS=PBKDF2_HASHERS, **pool):
+            reset_hashing_pool()
+            stop, statuses = threading.Event(), []
+            threads = [
+                threading.Thread(target=burst, args=(stop, statuses))
+                for _ in range(options["concurrency"])
+            ]
+            for thread in threads:
+                thread.start()
+            transactions = post_transactions()
+            stop.set()
+            for thread in threads:
+                thread.join()
+        reset_hashing_pool()
+        results[name] = {
+            "transactions": transactions,
+            "registered": statuses.count(201),
+            "rejected": statuses.count(503),
+        }
+    return results
+
+
+def hot_wallet(data, options):
+    """Concurrent POST /transactions/ of many users to one receiver wallet"""
+    receiver = data.wallet(0).name
+
+    def make_worker(worker):
+        """Client of a user paying to the hot wallet"""
+        user = worker % (len(data.users) - 1) + 1
+        client = logged_in_client(data.user(user))
+        payload = {
+            "sender": data.wallet(user).name,
+            "receiver": receiver,
+            "transfer_amount": "1.00",
+        }
+        return lambda index: succeeded(client.post("/transactions/", data=payload))
+
+    return concurrent(
+        options["concurrency"], options["requests"], make_worker
+    ).summary()
+
+
+def sharded_credits(data, options):
+    """Concurrent credits of one hot wallet by number of its balance shards"""
+    receiver = data.wallet(0)
+    results = {}
+    for shards in options["shards"]:
+        call_command("shard_wallet", receiver.name, shards, stdout=StringIO())
+
+        def make_worker(worker):
+            """Transfers from a wallet of its own to the hot wallet"""
+            sender = data.wallet(worker % (len(data.users) - 1) + 1)
+            hot = Wallet.objects.get(pk=receiver.pk)
+            return lambda index: transfer(sender, hot, Decimal("1.00"))
+
+        timings = concurrent(options["concurrency"], options["requests"], make_worker)
+        results[str(shards)] = timings.summary()
+    call_command("shard_wallet", receiver.name, 0, stdout=StringIO())
+    return results
+
+
+def settlement(data, options):
+    """Per-transfer settlement against netted settlement of queued batches,
+    for the same random transfers between settlement wallets
+    """
+    owner = User.objects.create(username="bench-settlement")
+    Wallet.objects.bulk_create(
+        Wallet(name=name, type="Visa", currency="USD", balance=1_000_000, user=owner)
+        for name in wallet_names.names(options["settlement_wallets"])
+    )
+    wallets = list(Wallet.objects.filter(user=owner))
+    transfers = []
+    for _ in range(options["settlement_transfers"]):
+        sender, receiver = data.random.sample(wallets, 2)
+        transfers.append((sender, receiver, Decimal(data.random.randint(1, 100))))
+
+    per_transfer = sequential(len(transfers), lambda index: transfer(*transfers[index]))
+
+    for start in range(0, len(transfers), SEED_CHUNK_SIZE):
+        end = start + SEED_CHUNK_SIZE
+        Transaction.objects.bulk_create(
+            Transaction(
+                sender=sender,
+                receiver=receiver,
+                fee=transfer_fee(sender, receiver, amount),
+                transfer_amount=amount,
+                received_amount=amount,
+                status="PENDING",
+            )
+            for sender, receiver, amount in transfers[start:end]
+        )
+    batches = Timings()
+    start = time.perf_counter()
+    settled = True
+    while settled:
+        begin = time.perf_counter()
+        settled = settle_pending_transfers(options["batch_size"])
+        if settled:
+            batches.durations.append(time.perf_counter() - begin)
+    batches.seconds = time.perf_counter() - start
+
+    netted = batches.summary()
+    netted["transfers_per_second"] = round(len(transfers) / batches.seconds, 2)
+    return {
+        "transfers": len(transfers),
+        "wallets": len(wallets),
+        "per_transfer": per_transfer.summary(),
+        "netted": netted,
+        "speedup": round(per_transfer.seconds / batches.seconds, 2),
+    }
+
+
+def fees(data, options):
+    """Fee engine calls against the float expression fees were computed with"""
+    amounts = [
+        Decimal(data.random.randint(1, 10**8)).scaleb(-2)
+        for _ in range(options["fee_amounts"])
+    ]
+    sender, receiver = data.wallet(0), data.wallet(1)
+    rate = transfer_fee(sender, receiver, amounts[0])
+
+    def per_call(function):
+        """Nanoseconds per call of function(amount)"""
+        seconds = timeit.timeit(
+            lambda: [function(amount) for amount in amounts], number=1
+        )
+        return round(seconds / len(amounts) * 10**9, 1)
+
+    return {
+        "amounts": len(amounts),
+        "transfer_fee_ns": per_call(
+            lambda amount: transfer_fee(sender, receiver, amount)
+        ),
+        "fee_amount_ns": per_call(lambda amount: fee_amount(amount, rate)),
+        "amount_with_fee_ns": per_call(lambda amount: amount_with_fee(amount, rate)),
+        "float_expression_ns": per_call(
+            lambda amount: amount * round(Decimal(1.00 + 0.1), 2)
+        ),
+    }
+
+
+def names(data, options):
+    """Wallet names generated in bulk, block allocation queries included"""
+    generator = WalletNameGenerator()
+    start = time.perf_counter()
+    generated = generator.names(options["names"])
+    seconds = time.perf_counter() - start
+    return {
+        "names": len(generated),
+        "unique": len(set(generated)),
+        "seconds": round(seconds, 4),
+        "names_per_second": round(len(generated) / seconds, 2),
+    }
+
+
+def fx(data, options):
+    """Same currency against converted POST /transactions/ and rate lookups"""
+    if not ExchangeRate.objects.exists():
+        ExchangeRate.objects.bulk_create(
+            ExchangeRate(base=base, quote=quote, rate=Decimal("1.01"), version=1)
+            for base in CURRENCIES
+            for quote in CURRENCIES
+            if base != quote
+        )
+    rate_cache.clear()
+    client = logged_in_client(data.user(0))
+    sender = data.wallet(0)
+    results = {}
+    for currency in ("USD", "EUR"):
+        receiver = data.wallet(1, currency)
+        if receiver is None:
+            continue
+        payload = {
+            "sender": sender.name,
+            "receiver": receiver.name,
+            "transfer_amount": "1",
+        }
+        timings = sequential(
+            options["requests"],
+            lambda index: succeeded(client.post("/transactions/", data=payload)),
+        )
+        results[f"USD_to_{currency}"] = timings.summary()
+        seconds = timeit.timeit(lambda: exchange_rate(sender, receiver), number=10_000)
+        results[f"USD_to_{currency}"]["exchange_rate_ns"] = round(
+            seconds / 10_000 * 10**9, 1
+        )
+    return results
+
+
+def token_auth(data, options):
+    """GET /wallets/ authenticated with a session against a bearer token"""
+    session = logged_in_client(data.user(0))
+    bearer = Client(HTTP_AUTHORIZATION=f"Bearer {issue_tokens(data.user(0))['access']}")
+    results = {}
+    for name, client in (("session", session), ("token", bearer)):
+        results[name] = sequential(
+            options["requests"], lambda index: succeeded(client.get("/wallets/"))
+        ).summary()
+    return results
+
+
+def metrics_overhead(data, options):
+    """GET /wallets/ with and without the request metrics middleware"""
+    middleware = "WalletService.metrics.RequestMetricsMiddleware"
+    results = {}
+    for name, stack in (
+        ("with_metrics", settings.MIDDLEWARE),
+        (
+            "without_metrics",
+            [item for item in settings.MIDDLEWARE if item != middleware],
+        ),
+    ):
+        with override_settings(MIDDLEWARE=stack):
+            client = logged_in_client(data.user(0))
+            timings = sequential(
+                options["requests"], lambda index: succeeded(client.get("/wallets/"))
+            )
+        results[name] = timings.summary()
+    results["overhead_p50_ms"] = round(
+        results["with_metrics"]["p50_ms"] - results["without_metrics"]["p50_ms"], 3
+    )
+    return results
+
+
+def export(data, options):
+    """Whole history of a user by the streaming export against paging
+    through GET /transactions/. Peak memory is the peak of Python allocations
+    traced by tracemalloc, measured in a second, traced run
+    """
+    client = logged_in_client(data.user(0))
+
+    def streamed():
+        """Rows of the csv export"""
+        response = client.get("/transactions/export/?format=csv")
+        return sum(chunk.count(b"\n") for chunk in response.streaming_content) - 1
+
+    def paged():
+        """Rows of all pages of the transaction list"""
+        rows, url = 0, "/transactions/?page_size=500"
+        while url:
+            page = client.get(url).json()
+            rows += len(page["results"])
+            url = page["next"]
+        return rows
+
+    results = {}
+    for name, read in (("export", streamed), ("list", paged)):
+        start = time.perf_counter()
+        rows = read()
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        read()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds, 2) if seconds else None,
+            "peak_memory_bytes": peak,
+        }
+    return results
+
+
+def asgi(data, options):
+    """Concurrent GET /async/wallets/ through the ASGI handler against
+    GET /wallets/ of the same number of WSGI threads. Requests are made in
+    process by test clients, so this compares the handlers, not servers
+    """
+    workers, calls = options["concurrency"], options["requests"]
+    clients = [
+        logged_in_client(data.user(worker), AsyncClient) for worker in range(workers)
+    ]
+    timings = Timings()
+
+    async def worker(client, worker_index):
+        """Makes the worker share of requests one after another"""
+        for _ in range(worker_index, calls, workers):
+            start = time.perf_counter()
+            response = await client.get("/async/wallets/")
+            timings.durations.append(time.perf_counter() - start)
+            timings.errors += not succeeded(response)
+
+    async def run():
+        """Runs all workers concurrently"""
+        await asyncio.gather(
+            *(worker(client, index) for index, client in enumerate(clients))
+        )
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    timings.seconds = time.perf_counter() - start
+
+    def make_worker(worker):
+        """WSGI client of a user"""
+        client = logged_in_client(data.user(worker))
+        return lambda index: succeeded(client.get("/wallets/"))
+
+    return {
+        "concurrency": workers,
+        "asgi": timings.summary(),
+        "wsgi": concurrent(workers, calls, make_worker).summary(),
+    }
+
+
+def connection_pooling(data, options):
+    """Concurrent GET /wallets/ closing connections at the end of every
+    request like WSGI servers do: with a connection per request, with
+    persistent connections and, on PostgreSQL, with pooled connections.
+    Reports requests per second and database connections opened
+    """
+    default = connections.settings[DEFAULT_DB_ALIAS]
+    engine = default["ENGINE"]
+    if connection.vendor == "postgresql":
+        engine = "django.db.backends.postgresql"
+    modes = {
+        "per_request": {"ENGINE": engine, "CONN_MAX_AGE": 0},
+        "persistent": {"ENGINE": engine, "CONN_MAX_AGE": 600},
+    }
+    if connection.vendor == "postgresql":
+        from WalletService.pooled_postgresql.base import close_pools, pools
+
+        modes["pooled"] = {
+            "ENGINE": "WalletService.pooled_postgresql",
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {
+                **default["OPTIONS"],
+                "pool": {"max_size": options["concurrency"]},
+            },
+        }
+        pooled_before = sum(pool.opened for pool in pools.values())
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        """Counts connections of the benchmarked database"""
+        opened.append(connection.alias)
+
+    def make_worker(worker):
+        """Client of a user, connections are closed after its requests"""
+        client = logged_in_client(data.user(worker % len(data.users)))
+
+        def get(index):
+            """Gets wallets, then lets the connection go"""
+            response = client.get("/wallets/")
+            close_old_connections()
+            return succeeded(response)
+
+        return get
+
+    results = {}
+    connection_created.connect(count)
+    try:
+        for name, mode in modes.items():
+            connections.settings[DEFAULT_DB_ALIAS] = {**default, **mode}
+            opened.clear()
+            timings = concurrent(
+                options["concurrency"], options["requests"], make_worker
+            )
+            results[name] = {**timings.summary(), "connections_opened": len(opened)}
+        if "pooled" in modes:
+            # connection_created is sent for every borrowed connection,
+            # connections opened are counted by the pools
+            results["pooled"]["connections_opened"] = (
+                sum(pool.opened for pool in pools.values()) - pooled_before
+            )
+    finally:
+        connections.settings[DEFAULT_DB_ALIAS] = default
+        connection_created.disconnect(count)
+        if "pooled" in modes:
+            close_pools()
+    return results
+
+
+def query_plans(data, options):
+    """Plans of the queries behind transaction and wallet lists. On PostgreSQL
+    the seeded tables are analyzed first and the plans are EXPLAIN ANALYZE
+    ones, with actual times and buffers of running the queries
+    """
+    explain_options = {}
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        explain_options = {"analyze": True, "buffers": True}
+    user, wallet = data.user(0), data.wallet(0)
+    querysets = {
+        "user_transactions": Transaction.objects.for_user(user)
+        .with_wallet_names()
+        .order_by("timestamp", "id")[: settings.TRANSACTIONS_PAGE_SIZE],
+        "wallet_transactions": Transaction.objects.for_wallet(wallet)
+        .with_wallet_names()
+        .order_by("timestamp", "id")[: settings.TRANSACTIONS_PAGE_SIZE],
+        "user_wallets": Wallet.objects.filter(user=user).with_shard_balance(),
+    }
+    return {
+        name: queryset.explain(**explain_options)
+        for name, queryset in querysets.items()
+    }
+
+
+BENCHMARKS = {
+    "post_transactions": post_transactions,
+    "list_transactions": get_endpoint("/transactions/"),
+    "wallet_transactions": get_endpoint("/transactions/{wallet.name}/"),
+    "list_wallets": get_endpoint("/wallets/"),
+    "register": register,
+    "registration_burst": registration_burst,
+    "hot_wallet": hot_wallet,
+    "sharded_credits": sharded_credits,
+    "settlement": settlement,
+    "fees": fees,
+    "names": names,
+    "fx": fx,
+    "token_auth": token_auth,
+    "metrics_overhead": metrics_overhead,
+    "export": export,
+    "connection_pooling": connection_pooling,
+    "asgi": asgi,
+    "query_plans": query_plans,
+}
+
+
+def run_benchmarks(benchmark_names, options):
+    """Seeds data and runs benchmarks by name, returns their results"""
+    data = BenchmarkData(
+        options["users"],
+        options["wallets_per_user"],
+        options["transactions"],
+        options["seed"],
+    )
+    return {name: BENCHMARKS[name](data, options) for name in benchmark_names}
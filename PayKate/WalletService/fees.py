@@ -0,0 +1,82 @@
+"""
+WalletService fee engine
+"""
+import bisect
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from WalletService.models import Transaction
+
+CENT = Decimal("0.01")
+# smallest step of a fee rate, 0.0001 is 0.01%
+RATE_STEP = Decimal("0.0001")
+
+
+class FeeSchedule:
+    """Fee rates of transfers in one currency, kept as Decimals"""
+
+    def __init__(self, currency, same_owner, cross_owner):
+        """Parses rates of settings.TRANSFER_FEES entry of a currency"""
+        self.currency = currency
+        self.same_owner = self.parse(same_owner, RATE_STEP)
+        bands = sorted(
+            (self.parse(start, CENT), self.parse(rate, RATE_STEP))
+            for start, rate in cross_owner
+        )
+        if not bands or bands[0][0] != 0:
+            raise ImproperlyConfigured(
+                f"Cross owner fees of {currency} must have a band starting from 0"
+            )
+        self.band_starts = [start for start, _ in bands]
+        self.band_rates = [rate for _, rate in bands]
+
+    def parse(self, value, step):
+        """Parses an amount of whole cents or a rate of whole RATE_STEPs"""
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            value = None
+        if value is None or value < 0 or value != value.quantize(step):
+            raise ImproperlyConfigured(
+                f"Fees of {self.currency}: {value} is not a non-negative "
+                f"multiple of {step}"
+            )
+        return value.quantize(step)
+
+    def rate(self, transfer_amount, same_owner):
+        """Fee rate of a transfer"""
+        if same_owner:
+            return self.same_owner
+        return self.band_rates[
+            bisect.bisect_right(self.band_starts, transfer_amount) - 1
+        ]
+
+
+fee_schedules = {}
+
+# used for currencies missing in settings.TRANSFER_FEES
+default_schedule = FeeSchedule("default", "0.00", [("0.00", Transaction.DEFAULT_FEE)])
+
+
+def load_fee_schedules():
+    """Builds fee schedules from settings, called once on startup"""
+    fee_schedules.clear()
+    for currency, schedule in settings.TRANSFER_FEES.items():
+        fee_schedules[currency] = FeeSchedule(currency, **schedule)
+
+
+def transfer_fee(sender, receiver, transfer_amount):
+    """Fee rate of a transfer, by currency of the sender wallet"""
+    schedule = fee_schedules.get(sender.currency, default_schedule)
+    return schedule.rate(transfer_amount, sender.user_id == receiver.user_id)
+
+
+def fee_amount(transfer_amount, fee):
+    """Fee of a transfer in cents, halves are rounded up"""
+    return (transfer_amount * fee).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def amount_with_fee(transfer_amount, fee):
+    """Amount debited from a sender wallet"""
+    return transfer_amount + fee_amount(transfer_amount, fee)
@@ -0,0 +1,83 @@
+"""
+WalletService currency conversion
+"""
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Max
+from WalletService.fees import CENT
+from WalletService.models import ExchangeRate
+
+ONE = Decimal(1)
+
+
+class ExchangeRateError(Exception):
+    """Raised when there's no rate to convert between currencies of wallets"""
+
+
+class ExchangeRateCache:
+    """Process level cache of the exchange rate table.
+
+    Rates are served from memory. Once settings.FX_RATES_TTL seconds
+    have passed since the last check, the version of the rate table is
+    read with one query and rates are reloaded only if it has changed.
+    """
+
+    def __init__(self):
+        """Creates an empty cache, loaded on first use"""
+        self._rates = {}
+        self._version = None
+        self._checked_on = None
+        self._lock = threading.Lock()
+
+    def get(self, base, quote):
+        """Returns the rate of converting base currency to quote, None if unknown"""
+        checked_on = self._checked_on
+        if checked_on is None or time.monotonic() - checked_on > settings.FX_RATES_TTL:
+            self.refresh()
+        return self._rates.get((base, quote))
+
+    def refresh(self):
+        """Reloads rates if the rate table has a new version"""
+        with self._lock:
+            version = ExchangeRate.objects.aggregate(version=Max("version"))["version"]
+            if version != self._version:
+                self._rates = {
+                    (base, quote): rate
+                    for base, quote, rate in ExchangeRate.objects.values_list(
+                        "base", "quote", "rate"
+                    )
+                }
+                self._version = version
+            self._checked_on = time.monotonic()
+
+    def clear(self):
+        """Makes the next lookup reload rates"""
+        with self._lock:
+            self._rates = {}
+            self._version = None
+            self._checked_on = None
+
+
+rate_cache = ExchangeRateCache()
+
+
+def exchange_rate(sender, receiver):
+    """Rate of converting currency of the sender wallet to the receiver one"""
+    if sender.currency == receiver.currency:
+        return ONE
+    rate = rate_cache.get(sender.currency, receiver.currency)
+    if rate is None:
+        raise ExchangeRateError(
+            f"No exchange rate from {sender.currency} to {receiver.currency}"
+        )
+    return rate
+
+
+def converted_amount(transfer_amount, rate):
+    """Amount credited to the receiver in its currency, in cents"""
+    if rate == ONE:
+        return transfer_amount
+    return (transfer_amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
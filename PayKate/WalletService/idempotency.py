@@ -0,0 +1,77 @@
+"""
+WalletService idempotent request handling
+"""
+import hashlib
+import json
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.status import HTTP_422_UNPROCESSABLE_ENTITY
+from WalletService.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_hash(request):
+    """Fingerprint of request data, to detect a key reused for another request"""
+    data = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def replay(stored, request):
+    """Answers a retried request with the stored response"""
+    if stored.request_hash != request_hash(request):
+        return Response(
+            {"Failed": f"{IDEMPOTENCY_HEADER} was already used for another request"},
+            status=HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(
+        stored.response_body,
+        status=stored.response_status,
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+class IdempotentCreateMixin:
+    """Makes create requests with an Idempotency-Key header safe to retry.
+
+    A successful response is stored together with the key, in the same
+    database transaction as the created object, so retries are answered
+    from it with one indexed lookup. A concurrent duplicate waits on the
+    unique (user, key) constraint until the first request is done and then
+    replays its response. Failed requests are not stored and can be retried.
+    """
+
+    def create(self, request, *args, **kwargs):
+        """Creates an object once per idempotency key"""
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey.MAX_KEY_LENGTH:
+            raise ValidationError(
+                f"{IDEMPOTENCY_HEADER} can't be longer than "
+                f"{IdempotencyKey.MAX_KEY_LENGTH} characters"
+            )
+
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if stored:
+            return replay(stored, request)
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    stored = IdempotencyKey.objects.create(
+                        user=request.user, key=key, request_hash=request_hash(request)
+                    )
+            except IntegrityError:
+                # a concurrent request with the key has been committed meanwhile
+                stored = IdempotencyKey.objects.get(user=request.user, key=key)
+                return replay(stored, request)
+
+            response = super().create(request, *args, **kwargs)
+            stored.response_status = response.status_code
+            stored.response_body = response.data
+            stored.save(update_fields=["response_status", "response_body"])
+        return response
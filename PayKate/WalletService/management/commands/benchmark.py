@@ -0,0 +1,129 @@
+"""Command that runs WalletService benchmarks and reports them as json"""
+import json
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from WalletService.benchmarks import BENCHMARKS, run_benchmarks
+
+REPORTED_OPTIONS = (
+    "users",
+    "wallets_per_user",
+    "transactions",
+    "requests",
+    "register_requests",
+    "concurrency",
+    "shards",
+    "settlement_transfers",
+    "settlement_wallets",
+    "batch_size",
+    "fee_amounts",
+    "names",
+    "seed",
+)
+
+
+def commit():
+    """Hash of the checked out git commit, None outside of a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    """Seeds a throwaway test database and benchmarks the service on it"""
+
+    help = (
+        "Measures throughput and p50/p99 latency of the endpoints and services "
+        "on seeded data. Runs on a test database created for the run, like tests, "
+        "results are written as json to compare them between commits"
+    )
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "benchmarks",
+            nargs="*",
+            help=f"Benchmarks to run, all by default: {', '.join(BENCHMARKS)}",
+        )
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--wallets-per-user", type=int, default=3)
+        parser.add_argument("--transactions", type=int, default=100_000)
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests of every benchmark"
+        )
+        parser.add_argument(
+            "--register-requests",
+            type=int,
+            default=20,
+            help="Registrations, each one hashes a password",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent clients or workers"
+        )
+        parser.add_argument(
+            "--shards",
+            type=lambda value: [int(shards) for shards in value.split(",")],
+            default=[0, 4, 16],
+            help="Comma separated numbers of shards of the hot wallet",
+        )
+        parser.add_argument("--settlement-transfers", type=int, default=100_000)
+        parser.add_argument("--settlement-wallets", type=int, default=1000)
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Settlement batch size"
+        )
+        parser.add_argument("--fee-amounts", type=int, default=100_000)
+        parser.add_argument(
+            "--names", type=int, default=1_000_000, help="Wallet names to generate"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of data")
+        parser.add_argument(
+            "--output", help="File to write results to, stdout by default"
+        )
+
+    def handle(self, *args, **options):
+        """Runs benchmarks on a test database and writes the results"""
+        if options["users"] < 2 or options["settlement_wallets"] < 2:
+            raise CommandError("Benchmarks need at least 2 users and 2 wallets")
+        benchmark_names = options["benchmarks"] or list(BENCHMARKS)
+        unknown = [name for name in benchmark_names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(unknown)}")
+        started = timezone.now()
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_benchmarks(benchmark_names, options)
+            vendor = connection.vendor
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "commit": commit(),
+            "database": vendor,
+            "python": sys.version.split()[0],
+            "started": started.isoformat(),
+            "options": {name: options[name] for name in REPORTED_OPTIONS},
+            "results": results,
+        }
+        output = json.dumps(report, indent=2, default=str)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+            self.stdout.write(f"Results are written to {options['output']}")
+        else:
+            self.stdout.write(output)
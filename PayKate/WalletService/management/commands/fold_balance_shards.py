@@ -0,0 +1,54 @@
+"""Command that folds balance shards of sharded wallets"""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from WalletService.models import Wallet
+from WalletService.services import rebuild_daily_balances
+
+
+class Command(BaseCommand):
+    """Folds shards of all sharded wallets and refreshes their statements"""
+
+    help = (
+        "Moves balances of wallet shards to wallet rows and rebuilds "
+        "recent daily balances of sharded wallets. Meant to be run periodically"
+    )
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of wallets folded in one database transaction",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=2,
+            help="Number of last days which daily balances are rebuilt",
+        )
+
+    def handle(self, *args, **options):
+        """Streams ids of sharded wallets and folds them in chunks"""
+        chunk_size = options["chunk_size"]
+        since = timezone.localdate() - datetime.timedelta(days=options["days"] - 1)
+        wallet_ids = (
+            Wallet.objects.filter(shards__gt=0)
+            .order_by("pk")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        folded = 0
+        for wallet_id in wallet_ids:
+            chunk.append(wallet_id)
+            if len(chunk) == chunk_size:
+                rebuild_daily_balances(chunk, since=since)
+                folded += len(chunk)
+                chunk = []
+        if chunk:
+            rebuild_daily_balances(chunk, since=since)
+            folded += len(chunk)
+        self.stdout.write(f"Folded balance shards of {folded} wallets")
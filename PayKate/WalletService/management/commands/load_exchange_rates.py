@@ -0,0 +1,60 @@
+"""Command that loads the exchange rate table from a csv file"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from WalletService.fx import rate_cache
+from WalletService.models import CURRENCIES, ExchangeRate
+
+
+class Command(BaseCommand):
+    """Replaces exchange rates with rates of a csv file"""
+
+    help = (
+        "Loads exchange rates from a csv file with base, quote and rate columns. "
+        "Rates missing in the file are removed. Running processes pick the new "
+        "rates up within FX_RATES_TTL seconds"
+    )
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument("path", help="Path to the csv file")
+
+    def handle(self, *args, **options):
+        """Validates the file and loads it as a new version of the rate table"""
+        try:
+            with open(options["path"], newline="") as file:
+                rates = [self.parse(row) for row in csv.DictReader(file)]
+        except OSError as error:
+            raise CommandError(error)
+
+        with transaction.atomic():
+            version = ExchangeRate.objects.aggregate(version=Max("version"))["version"]
+            version = (version or 0) + 1
+            ExchangeRate.objects.bulk_create(
+                [
+                    ExchangeRate(base=base, quote=quote, rate=rate, version=version)
+                    for base, quote, rate in rates
+                ],
+                update_conflicts=True,
+                unique_fields=["base", "quote"],
+                update_fields=["rate", "version", "updated_on"],
+            )
+            ExchangeRate.objects.exclude(version=version).delete()
+        rate_cache.clear()
+        self.stdout.write(f"Loaded {len(rates)} exchange rates, version {version}")
+
+    def parse(self, row):
+        """Validates a row of the file"""
+        base, quote = row.get("base"), row.get("quote")
+        if base not in CURRENCIES or quote not in CURRENCIES or base == quote:
+            raise CommandError(f"Invalid currency pair {base}/{quote}")
+        try:
+            rate = Decimal(row.get("rate") or "")
+        except InvalidOperation:
+            rate = None
+        if rate is None or rate <= 0:
+            raise CommandError(f"Invalid rate of {base}/{quote}: {row.get('rate')}")
+        return base, quote, rate
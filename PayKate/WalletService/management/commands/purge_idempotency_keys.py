@@ -0,0 +1,41 @@
+"""Command that deletes expired idempotency keys"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from WalletService.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Deletes idempotency keys older than IDEMPOTENCY_KEY_TTL hours"""
+
+    help = "Deletes expired idempotency keys in chunks"
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=settings.IDEMPOTENCY_KEY_TTL,
+            help="Delete keys older than this number of hours",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of keys deleted by one query",
+        )
+
+    def handle(self, *args, **options):
+        """Deletes expired keys chunk by chunk, so no long lock is held"""
+        expired = IdempotencyKey.objects.filter(
+            created_on__lt=timezone.now() - timedelta(hours=options["hours"])
+        )
+        deleted = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[: options["chunk_size"]])
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
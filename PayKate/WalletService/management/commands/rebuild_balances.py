@@ -0,0 +1,47 @@
+"""Command that rebuilds cached wallet balances from the ledger"""
+from django.core.management.base import BaseCommand
+from WalletService.models import Wallet
+from WalletService.services import rebuild_balances
+
+
+class Command(BaseCommand):
+    """Verifies or rebuilds balances of all wallets, chunk of wallets by chunk"""
+
+    help = "Rebuilds cached wallet balances from ledger postings"
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of wallets processed in one database transaction",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report wallets which balance doesn't match the ledger",
+        )
+
+    def handle(self, *args, **options):
+        """Streams wallet ids and rebuilds their balances in chunks"""
+        chunk_size = options["chunk_size"]
+        wallet_ids = (
+            Wallet.objects.order_by("pk")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        mismatched = []
+        for wallet_id in wallet_ids:
+            chunk.append(wallet_id)
+            if len(chunk) == chunk_size:
+                mismatched += rebuild_balances(chunk, check_only=options["check"])
+                chunk = []
+        if chunk:
+            mismatched += rebuild_balances(chunk, check_only=options["check"])
+
+        for wallet_id in mismatched:
+            self.stdout.write(f"Balance of wallet {wallet_id} doesn't match the ledger")
+        action = "Found" if options["check"] else "Fixed"
+        self.stdout.write(f"{action} {len(mismatched)} mismatched balances")
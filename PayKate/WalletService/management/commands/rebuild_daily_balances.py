@@ -0,0 +1,40 @@
+"""Command that rebuilds wallet daily balances from transactions"""
+from django.core.management.base import BaseCommand
+from WalletService.models import Wallet
+from WalletService.services import rebuild_daily_balances
+
+
+class Command(BaseCommand):
+    """Rebuilds daily balances of all wallets, chunk of wallets by chunk"""
+
+    help = "Rebuilds wallet daily balances from paid transactions"
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of wallets rebuilt in one database transaction",
+        )
+
+    def handle(self, *args, **options):
+        """Streams wallet ids and rebuilds their rollups in chunks"""
+        chunk_size = options["chunk_size"]
+        wallet_ids = (
+            Wallet.objects.order_by("pk")
+            .values_list("id", flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+        chunk = []
+        rebuilt = 0
+        for wallet_id in wallet_ids:
+            chunk.append(wallet_id)
+            if len(chunk) == chunk_size:
+                rebuild_daily_balances(chunk)
+                rebuilt += len(chunk)
+                chunk = []
+        if chunk:
+            rebuild_daily_balances(chunk)
+            rebuilt += len(chunk)
+        self.stdout.write(f"Rebuilt daily balances of {rebuilt} wallets")
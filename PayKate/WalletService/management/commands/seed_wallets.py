@@ -0,0 +1,81 @@
+"""Command that seeds synthetic users, wallets and transactions for load tests"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from WalletService.models import CURRENCIES, Wallet
+from WalletService.seeding import Seeder
+
+
+class Command(BaseCommand):
+    """Writes synthetic data in large chunks, reporting rows per second"""
+
+    help = (
+        "Seeds users sharing one password, their wallets and a power-law graph "
+        "of transfers with ledger postings and consistent balances. Rows are "
+        "written with COPY on PostgreSQL. Wallet statements are built afterwards "
+        "with rebuild_daily_balances"
+    )
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--wallets-per-user",
+            type=int,
+            default=2,
+            help="Wallets of a user take currencies in turns",
+        )
+        parser.add_argument("--transactions", type=int, default=100_000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Exponent of the power law receivers are chosen by, 0 - uniform",
+        )
+        parser.add_argument("--opening-balance", type=int, default=1000)
+        parser.add_argument(
+            "--days", type=int, default=30, help="Days transactions are spread over"
+        )
+        parser.add_argument(
+            "--prefix",
+            default="s",
+            help="Prefix of seeded usernames, they are <prefix>seed<n>",
+        )
+        parser.add_argument(
+            "--password", default="seed-password", help="Password of seeded users"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=50_000, help="Rows written at once"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    def handle(self, *args, **options):
+        """Seeds data and reports rows per second of every table"""
+        prefix = options["prefix"]
+        if not 1 <= options["wallets_per_user"] <= Wallet.MAX_USER_WALLETS:
+            raise CommandError(f"Users can have 1 to {Wallet.MAX_USER_WALLETS} wallets")
+        if User.objects.filter(username__startswith=f"{prefix}seed").exists():
+            raise CommandError(
+                f"Users with prefix {prefix} already exist, choose another --prefix"
+            )
+
+        seeder = Seeder(
+            prefix, CURRENCIES, options["chunk_size"], options["skew"], options["seed"]
+        )
+        start = time.perf_counter()
+        written = seeder.seed(
+            options["users"],
+            options["wallets_per_user"],
+            options["transactions"],
+            options["opening_balance"],
+            options["days"],
+            options["password"],
+        )
+        seconds = time.perf_counter() - start
+        for table, rows in written.items():
+            self.stdout.write(f"{table}: {rows} rows")
+        total = sum(written.values())
+        self.stdout.write(
+            f"Seeded {total} rows in {seconds:.1f}s, {total / seconds:.0f} rows/s"
+        )
@@ -0,0 +1,46 @@
+"""Command that runs the settlement worker of queued transactions"""
+import time
+
+from django.core.management.base import BaseCommand
+from WalletService.services import settle_pending_transfers
+
+
+class Command(BaseCommand):
+    """Settles pending transactions batch by batch.
+    Several workers can run at once, each one takes its own batches
+    """
+
+    help = "Settles transactions queued with TRANSACTIONS_QUEUED mode on"
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of transactions settled in one database transaction",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for new transactions",
+        )
+
+    def handle(self, *args, **options):
+        """Drains the queue, then waits for new transactions or exits"""
+        settled = 0
+        while True:
+            count = settle_pending_transfers(options["batch_size"])
+            settled += count
+            if count:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(f"Settled {settled} transactions")
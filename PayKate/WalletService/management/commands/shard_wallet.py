@@ -0,0 +1,44 @@
+"""Command that turns balance sharding of a hot wallet on or off"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from WalletService.models import Wallet
+from WalletService.resolvers import wallet_cache
+from WalletService.services import shard_wallet
+
+
+class Command(BaseCommand):
+    """Sets the number of balance shards of a wallet"""
+
+    help = (
+        "Spreads credits of a wallet over a number of balance shards, "
+        "0 folds the shards and turns sharding off. Processes with the wallet "
+        "metadata cache enabled pick the change up after restart"
+    )
+
+    def add_arguments(self, parser):
+        """Command arguments"""
+        parser.add_argument("name", help="Name of the wallet")
+        parser.add_argument("shards", type=int, help="Number of balance shards")
+
+    def handle(self, *args, **options):
+        """Changes shards of the wallet"""
+        if not 0 <= options["shards"] <= 256:
+            raise CommandError("Number of shards must be between 0 and 256")
+        wallet_id = (
+            Wallet.objects.filter(name=options["name"])
+            .values_list("id", flat=True)
+            .first()
+        )
+        if wallet_id is None:
+            raise CommandError(f"Wallet {options['name']} doesn't exist")
+
+        # statement of a sharded wallet is only up to date since the last fold
+        shard_wallet(
+            wallet_id,
+            options["shards"],
+            since=timezone.localdate() - datetime.timedelta(days=1),
+        )
+        wallet_cache.delete(options["name"])
+        self.stdout.write(f"Wallet {options['name']} has {options['shards']} shards")
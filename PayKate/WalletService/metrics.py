@@ -0,0 +1,229 @@
+"""
+WalletService request metrics: query count, database time, serializer time
+and latency of every endpoint, kept in process memory as histograms
+"""
+import asyncio
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    "http_request_duration_seconds": ("Request latency", LATENCY_BUCKETS),
+    "http_request_db_seconds": ("Time spent in SQL queries", LATENCY_BUCKETS),
+    "http_request_serializer_seconds": ("Time spent in serializers", LATENCY_BUCKETS),
+    "http_request_queries": ("Number of SQL queries", QUERY_BUCKETS),
+}
+
+request_metrics = contextvars.ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """Cumulative histogram of observed values, like Prometheus client keeps"""
+
+    def __init__(self, buckets):
+        """Creates an empty histogram with given upper bounds of buckets"""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        """Adds a value to the histogram, caller holds the registry lock"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, cumulative count) pairs of buckets, +Inf included"""
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """Histograms of every metric by endpoint, shared by threads of a process"""
+
+    def __init__(self):
+        """Creates an empty registry"""
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, values):
+        """Records {metric name: value} of one request to an endpoint"""
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[(name, view)] = Histogram(
+                        METRICS[name][1]
+                    )
+                histogram.observe(value)
+
+    def render(self):
+        """Histograms in Prometheus text exposition format"""
+        with self._lock:
+            histograms = {
+                key: (list(histogram.samples()), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            }
+        lines = []
+        for name, (description, _) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, view), (samples, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                view = view.replace("\\", "\\\\").replace('"', '\\"')
+                for bound, cumulative in samples:
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{{view="{view}"}} {total}')
+                lines.append(f'{name}_count{{view="{view}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Drops all recorded values"""
+        with self._lock:
+            self._histograms = {}
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """Metrics of the request being served"""
+
+    __slots__ = ("queries", "db_time", "serializer_time", "serializing")
+
+    def __init__(self):
+        """Starts counting from zero"""
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of the current request.
+    Installed on every connection, so queries made by async views
+    in sync_to_async threads are counted as well
+    """
+    metrics = request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_recorder(connection):
+    """Adds record_query to execute wrappers of a database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """Adds time spent validating and representing data to request metrics"""
+
+    def run_validation(self, *args, **kwargs):
+        """Validates data"""
+        return self._timed(super().run_validation, *args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        """Represents an object"""
+        return self._timed(super().to_representation, *args, **kwargs)
+
+    def _timed(self, method, *args, **kwargs):
+        """Calls a method, adding its duration to serializer time.
+        Nested serializers are timed by the outermost one only
+        """
+        metrics = request_metrics.get()
+        if metrics is None or metrics.serializing:
+            return method(*args, **kwargs)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializing = False
+
+
+class RequestMetricsMiddleware:
+    """Records query count, database time, serializer time and latency
+    of every request into the registry, by route of the endpoint.
+
+    Logs a warning when a request makes more queries than
+    settings.QUERY_BUDGET (0 turns the check off). Latency of streaming
+    responses covers the time before streaming starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wraps the next handler, sync or async"""
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        """Serves a request, measuring it"""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+            self.record(request, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        """Serves a request of an async handler, measuring it"""
+        metrics = RequestMetrics()
+        token = request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+            self.record(request, metrics, time.perf_counter() - start)
+
+    def record(self, request, metrics, duration):
+        """Adds metrics of a served request to the registry"""
+        match = request.resolver_match
+        view = match.route if match else "unresolved"
+        registry.observe(
+            view,
+            {
+                "http_request_duration_seconds": duration,
+                "http_request_db_seconds": metrics.db_time,
+                "http_request_serializer_seconds": metrics.serializer_time,
+                "http_request_queries": metrics.queries,
+            },
+        )
+        budget = settings.QUERY_BUDGET
+        if budget and metrics.queries > budget:
+            logger.warning(
+                "%s %s made %d queries, query budget is %d",
+                request.method,
+                view,
+                metrics.queries,
+                budget,
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "WalletService",
+            "0002_alter_transaction_fee_alter_transaction_status_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["timestamp", "id"], name="transaction_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["sender", "timestamp", "id"], name="transaction_sender_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["receiver", "timestamp", "id"], name="transaction_receiver_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("WalletService", "0003_transaction_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="transaction",
+            options={"ordering": ["timestamp", "id"]},
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="receiver",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="receiver",
+                to="WalletService.wallet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="sender",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="sender",
+                to="WalletService.wallet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="wallet",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallet",
+            index=models.Index(fields=["user", "modified_on"], name="wallet_user_idx"),
+        ),
+    ]
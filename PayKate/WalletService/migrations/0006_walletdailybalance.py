@@ -0,0 +1,64 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0005_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WalletDailyBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "opening_balance",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "total_in",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "total_out",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_balances",
+                        to="WalletService.wallet",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["day"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="walletdailybalance",
+            constraint=models.UniqueConstraint(
+                fields=("wallet", "day"), name="wallet_daily_balance_unique"
+            ),
+        ),
+    ]
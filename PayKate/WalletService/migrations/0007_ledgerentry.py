@@ -0,0 +1,93 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def post_opening_balances(apps, schema_editor):
+    """Posts current balances of existing wallets as their opening entries"""
+    Wallet = apps.get_model("WalletService", "Wallet")
+    LedgerEntry = apps.get_model("WalletService", "LedgerEntry")
+    wallets = Wallet.objects.exclude(balance=0).values_list("id", "currency", "balance")
+    LedgerEntry.objects.bulk_create(
+        (
+            LedgerEntry(
+                wallet_id=wallet_id, currency=currency, kind="OPENING", amount=balance
+            )
+            for wallet_id, currency, balance in wallets.iterator()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0006_walletdailybalance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.CharField(
+                        choices=[("USD", "USD"), ("EUR", "EUR"), ("RUB", "RUB")],
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("OPENING", "OPENING"),
+                            ("DEBIT", "DEBIT"),
+                            ("CREDIT", "CREDIT"),
+                            ("FEE", "FEE"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.RESTRICT,
+                        related_name="ledger_entries",
+                        to="WalletService.transaction",
+                    ),
+                ),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="ledger_entries",
+                        to="WalletService.wallet",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(fields=["wallet", "amount"], name="ledger_wallet_idx"),
+        ),
+        migrations.RunPython(post_opening_balances, migrations.RunPython.noop),
+    ]
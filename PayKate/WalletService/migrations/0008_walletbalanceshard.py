@@ -0,0 +1,53 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0007_ledgerentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wallet",
+            name="shards",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="WalletBalanceShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balance_shards",
+                        to="WalletService.wallet",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="walletbalanceshard",
+            constraint=models.UniqueConstraint(
+                fields=("wallet", "shard"), name="wallet_balance_shard_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0008_walletbalanceshard"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transaction",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "PENDING"),
+                    ("PAID", "PAID"),
+                    ("FAILED", "FAILED"),
+                ],
+                max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["id"],
+                name="transaction_pending_idx",
+            ),
+        ),
+    ]
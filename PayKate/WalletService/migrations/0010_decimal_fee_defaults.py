@@ -0,0 +1,29 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:34
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0009_transaction_pending"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transaction",
+            name="fee",
+            field=models.DecimalField(
+                decimal_places=4, default=Decimal("0.10"), max_digits=10
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="transfer_amount",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.10"), max_digits=10
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:36
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_received_amounts(apps, schema_editor):
+    """Existing transactions are all in one currency: receivers got the transfer amount"""
+    Transaction = apps.get_model("WalletService", "Transaction")
+    Transaction.objects.update(received_amount=F("transfer_amount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0010_decimal_fee_defaults"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "base",
+                    models.CharField(
+                        choices=[("USD", "USD"), ("EUR", "EUR"), ("RUB", "RUB")],
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "quote",
+                    models.CharField(
+                        choices=[("USD", "USD"), ("EUR", "EUR"), ("RUB", "RUB")],
+                        max_length=3,
+                    ),
+                ),
+                ("rate", models.DecimalField(decimal_places=8, max_digits=18)),
+                ("version", models.PositiveIntegerField(db_index=True)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="exchange_rate",
+            field=models.DecimalField(decimal_places=8, default=1, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="received_amount",
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(fill_received_amounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="transaction",
+            name="received_amount",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name="ledgerentry",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("OPENING", "OPENING"),
+                    ("DEBIT", "DEBIT"),
+                    ("CREDIT", "CREDIT"),
+                    ("FEE", "FEE"),
+                    ("FX", "FX"),
+                ],
+                max_length=10,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="exchangerate",
+            constraint=models.UniqueConstraint(
+                fields=("base", "quote"), name="exchange_rate_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.1 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("WalletService", "0011_exchangerate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WalletNameBlock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.1 on 2026-10-18 07:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_wallets(apps, schema_editor):
+    """Creates counters of users which have wallets"""
+    Wallet = apps.get_model("WalletService", "Wallet")
+    WalletCounter = apps.get_model("WalletService", "WalletCounter")
+    counts = Wallet.objects.order_by().values("user").annotate(wallets=Count("id"))
+    WalletCounter.objects.bulk_create(
+        (
+            WalletCounter(user_id=count["user"], wallets=count["wallets"])
+            for count in counts.iterator()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("WalletService", "0012_walletnameblock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WalletCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("wallets", models.PositiveSmallIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_wallets, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,12 @@
 WalletService models
 """
 
+from decimal import Decimal
+
 from django.conf import settings
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 
 CARDS = ["Visa", "Mastercard"]
 CURRENCIES = ["USD", "EUR", "RUB"]
@@ -11,53 +15,399 @@ CURRENCIES = ["USD", "EUR", "RUB"]
 CARD_CHOICES = [(card, card) for card in CARDS]
 CURRENCY_CHOICES = [(currency, currency) for currency in CURRENCIES]
 
-STATUS_CHOICES = [("PAID", "PAID"), ("FAILED", "FAILED")]
+STATUS_CHOICES = [("PENDING", "PENDING"), ("PAID", "PAID"), ("FAILED", "FAILED")]
+
+LEDGER_KINDS = ["OPENING", "DEBIT", "CREDIT", "FEE", "FX"]
+LEDGER_KIND_CHOICES = [(kind, kind) for kind in LEDGER_KINDS]
+
+
+class WalletQuerySet(models.QuerySet):
+    """Queryset of wallets"""
+
+    def with_shard_balance(self):
+        """Annotates wallets with the sum of their shard balances,
+        so total_balance doesn't query shards per wallet
+        """
+        shards = (
+            WalletBalanceShard.objects.filter(wallet=OuterRef("pk"))
+            .order_by()
+            .values("wallet")
+            .annotate(total=Sum("balance"))
+            .values("total")
+        )
+        return self.annotate(
+            shard_balance=Coalesce(
+                Subquery(shards), Value(Decimal(0)), output_field=models.DecimalField()
+            )
+        )
 
 
 class Wallet(models.Model):
     """Model that describes wallet essense"""
 
     MAX_USER_WALLETS = 5
-    BONUS = {"USD": 3.00, "EUR": 3.00, "RUB": 100.00}
+    BONUS = {"USD": Decimal("3.00"), "EUR": Decimal("3.00"), "RUB": Decimal("100.00")}
 
     name = models.CharField(max_length=settings.WALLET_NAME_LENGTH, unique=True)
     type = models.CharField(choices=CARD_CHOICES, max_length=10)
     currency = models.CharField(choices=CURRENCY_CHOICES, max_length=3)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    user = models.ForeignKey("auth.User", on_delete=models.CASCADE)
+    # number of balance shards taking credits of a hot wallet, 0 - not sharded
+    shards = models.PositiveSmallIntegerField(default=0)
+    # indexed by (user, modified_on) below
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE, db_index=False)
     created_on = models.DateTimeField(auto_now_add=True)
     modified_on = models.DateTimeField(auto_now=True)
 
+    objects = WalletQuerySet.as_manager()
+
     class Meta:
         """Wallets meta"""
 
         ordering = ["modified_on"]
+        indexes = [
+            models.Index(fields=["user", "modified_on"], name="wallet_user_idx"),
+        ]
 
     def __str__(self) -> str:
         """Str representation of a wallet"""
         return f"Owner: {self.user}, wallet: {self.name}"
 
+    @property
+    def total_balance(self):
+        """Visible balance of a wallet: its own balance and balances of its shards"""
+        shard_balance = getattr(self, "shard_balance", None)
+        if shard_balance is None:
+            shard_balance = 0
+            if self.shards:
+                shard_balance = self.balance_shards.aggregate(
+                    total=Coalesce(Sum("balance"), Decimal(0))
+                )["total"]
+        return self.balance + shard_balance
+
+
+class WalletCounterQuerySet(models.QuerySet):
+    """Queryset of wallet counters"""
+
+    def has_room(self, user):
+        """Whether a user can have one more wallet. Called in the transaction
+        inserting the wallet: the UPDATE locks the counter row until the insert
+        commits, so concurrent creations are admitted one by one
+        """
+        counter = self.filter(user=user, wallets__lt=Wallet.MAX_USER_WALLETS)
+        if counter.update(wallets=F("wallets")):
+            return True
+        # first wallet since counters were added, or the limit is reached
+        self.get_or_create(
+            user=user, defaults={"wallets": Wallet.objects.filter(user=user).count()}
+        )
+        return bool(counter.update(wallets=F("wallets")))
+
+    def add(self, user_id):
+        """Counts one more wallet of a user"""
+        if self.filter(user_id=user_id).update(wallets=F("wallets") + 1):
+            return
+        # first wallet since counters were added, counted with the others
+        _, created = self.get_or_create(
+            user_id=user_id,
+            defaults={"wallets": Wallet.objects.filter(user_id=user_id).count()},
+        )
+        if not created:
+            self.filter(user_id=user_id).update(wallets=F("wallets") + 1)
+
+    def release(self, user_id):
+        """Counts one wallet of a user less"""
+        self.filter(user_id=user_id, wallets__gt=0).update(wallets=F("wallets") - 1)
+
+
+class WalletCounter(models.Model):
+    """Model that counts wallets of a user, to enforce MAX_USER_WALLETS
+    with one conditional update instead of counting wallets
+    """
+
+    user = models.OneToOneField("auth.User", on_delete=models.CASCADE, primary_key=True)
+    wallets = models.PositiveSmallIntegerField(default=0)
+
+    objects = WalletCounterQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        """Str representation of a wallet counter"""
+        return f"{self.user_id}: {self.wallets} wallets"
+
+
+class WalletBalanceShard(models.Model):
+    """Model that describes a sub-balance of a sharded wallet.
+
+    Credits of a hot wallet are spread over its shards, so concurrent
+    transfers to it don't queue up behind the lock of the wallet row.
+    Shard balances are folded back into the wallet balance before debits
+    and periodically by the fold_balance_shards command.
+    """
+
+    wallet = models.ForeignKey(
+        Wallet,
+        related_name="balance_shards",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    shard = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        """Balance shards meta"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "shard"], name="wallet_balance_shard_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Str representation of a balance shard"""
+        return f"Wallet: {self.wallet_id}, shard: {self.shard}, balance: {self.balance}"
+
+
+class TransactionQuerySet(models.QuerySet):
+    """Queryset used by every transaction read endpoint"""
+
+    def with_wallet_names(self):
+        """Joins sender and receiver wallets in the same query,
+        loading only their names, so serializers don't hit the database per row
+        """
+        return self.select_related("sender", "receiver").only(
+            "id",
+            "transfer_amount",
+            "fee",
+            "received_amount",
+            "exchange_rate",
+            "status",
+            "timestamp",
+            "sender__name",
+            "receiver__name",
+        )
+
+    def for_user(self, user):
+        """Transactions where any of user's wallets is a sender or a receiver.
+
+        Ownership of both sides is tested with EXISTS instead of collecting
+        the ids of the whole history first, so a page ordered by (timestamp, id)
+        walks the (timestamp, id) index from the cursor and stops after a page
+        of matching rows.
+        """
+        user_wallets = Wallet.objects.filter(user=user)
+        return self.filter(
+            Exists(user_wallets.filter(pk=OuterRef("sender")))
+            | Exists(user_wallets.filter(pk=OuterRef("receiver")))
+        )
+
+    def for_wallet(self, wallet):
+        """Transactions where the wallet is a sender or a receiver"""
+        return self.filter(Q(receiver=wallet) | Q(sender=wallet))
+
 
 class Transaction(models.Model):
     """Model that describes transaction essence"""
 
-    DEFAULT_FEE = 0.10
-    sender = models.ForeignKey(Wallet, related_name="sender", on_delete=models.RESTRICT)
+    DEFAULT_FEE = Decimal("0.10")
+    # sender and receiver are indexed by (wallet, timestamp, id) below
+    sender = models.ForeignKey(
+        Wallet, related_name="sender", on_delete=models.RESTRICT, db_index=False
+    )
     receiver = models.ForeignKey(
-        Wallet, related_name="receiver", on_delete=models.RESTRICT
+        Wallet, related_name="receiver", on_delete=models.RESTRICT, db_index=False
     )
     transfer_amount = models.DecimalField(
         max_digits=10, decimal_places=2, default=DEFAULT_FEE
     )
-    fee = models.DecimalField(max_digits=10, decimal_places=2, default=0.10)
+    # fee rate, a fraction of transfer_amount
+    fee = models.DecimalField(max_digits=10, decimal_places=4, default=DEFAULT_FEE)
+    # amount credited to the receiver, in its currency, transfer_amount if unset
+    received_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True)
+    exchange_rate = models.DecimalField(max_digits=18, decimal_places=8, default=1)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         """Meta class"""
 
-        ordering = ["timestamp"]
+        ordering = ["timestamp", "id"]
+        indexes = [
+            # keyset pagination and ordering of user and wallet transaction lists
+            models.Index(fields=["timestamp", "id"], name="transaction_timestamp_idx"),
+            models.Index(
+                fields=["sender", "timestamp", "id"], name="transaction_sender_idx"
+            ),
+            models.Index(
+                fields=["receiver", "timestamp", "id"], name="transaction_receiver_idx"
+            ),
+            # settlement queue, small as settled transactions drop out of it
+            models.Index(
+                fields=["id"],
+                condition=Q(status="PENDING"),
+                name="transaction_pending_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         """Str representation of a transaction"""
         return f"id:{self.pk} - {self.sender} - {self.receiver}"
+
+    def save(self, *args, **kwargs):
+        """Saves a transaction, received_amount of a same currency transfer
+        can be left out
+        """
+        if self.received_amount is None:
+            self.received_amount = self.transfer_amount
+        super().save(*args, **kwargs)
+
+
+class ExchangeRate(models.Model):
+    """Model that describes a rate of converting base currency to quote currency.
+
+    Every load of the rate table bumps the version of loaded rates,
+    processes reload their cached rates when the version changes.
+    """
+
+    base = models.CharField(choices=CURRENCY_CHOICES, max_length=3)
+    quote = models.CharField(choices=CURRENCY_CHOICES, max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    version = models.PositiveIntegerField(db_index=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Exchange rates meta"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["base", "quote"], name="exchange_rate_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Str representation of an exchange rate"""
+        return f"{self.base}/{self.quote}: {self.rate}"
+
+
+class WalletNameBlock(models.Model):
+    """Model that hands out blocks of wallet names.
+
+    Every row is a block allocated by one process, its id is the block number:
+    names of the block are generated in memory without further queries.
+    """
+
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """Str representation of a name block"""
+        return f"block {self.pk}"
+
+
+class IdempotencyKey(models.Model):
+    """Model that stores the response of a request made with an Idempotency-Key,
+    so retries of the request are answered without repeating it
+    """
+
+    MAX_KEY_LENGTH = 255
+
+    key = models.CharField(max_length=MAX_KEY_LENGTH)
+    # indexed by the unique (user, key) constraint below
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE, db_index=False)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_on = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        """Idempotency keys meta"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Str representation of an idempotency key"""
+        return f"Owner: {self.user_id}, key: {self.key}"
+
+
+class WalletDailyBalance(models.Model):
+    """Model that rolls up transactions of a wallet made during a day"""
+
+    # indexed by the unique (wallet, day) constraint below
+    wallet = models.ForeignKey(
+        Wallet,
+        related_name="daily_balances",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    day = models.DateField()
+    opening_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    total_in = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_out = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    fees = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """Daily balances meta"""
+
+        ordering = ["day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "day"], name="wallet_daily_balance_unique"
+            ),
+        ]
+
+    @property
+    def closing_balance(self):
+        """Wallet balance at the end of the day"""
+        return self.opening_balance + self.total_in - self.total_out - self.fees
+
+    def __str__(self) -> str:
+        """Str representation of a daily balance"""
+        return f"Wallet: {self.wallet_id}, day: {self.day}"
+
+
+class LedgerEntry(models.Model):
+    """Model that describes an append-only posting of money to a wallet.
+
+    Balance of a wallet is the sum of its postings, Wallet.balance is only
+    a cached snapshot of it. Postings of a transaction sum up to zero:
+    sender is debited, receiver is credited and the fee goes to the house
+    account of the currency (postings without a wallet).
+    """
+
+    # ledger keeps postings of deleted wallets for audit
+    wallet = models.ForeignKey(
+        Wallet,
+        related_name="ledger_entries",
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name="ledger_entries",
+        null=True,
+        on_delete=models.RESTRICT,
+    )
+    currency = models.CharField(choices=CURRENCY_CHOICES, max_length=3)
+    kind = models.CharField(choices=LEDGER_KIND_CHOICES, max_length=10)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Ledger meta"""
+
+        ordering = ["id"]
+        indexes = [
+            # balances are summed up per wallet
+            models.Index(fields=["wallet", "amount"], name="ledger_wallet_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """Str representation of a ledger entry"""
+        return f"{self.kind} {self.amount} {self.currency}, wallet: {self.wallet_id}"
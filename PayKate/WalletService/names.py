@@ -0,0 +1,158 @@
+"""
+WalletService wallet names: unique without retries, cheap to generate in bulk
+"""
+import hashlib
+import itertools
+import string
+import threading
+
+from django.conf import settings
+from WalletService.models import Wallet, WalletNameBlock
+
+ALPHABET = string.digits + string.ascii_uppercase
+BASE = len(ALPHABET)
+VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# name: block number, position in the block, check character
+POSITION_CHARS = 3
+BLOCK_CHARS = settings.WALLET_NAME_LENGTH - POSITION_CHARS - 1
+BLOCK_SIZE = BASE**POSITION_CHARS
+# names start with a letter, as names of digits only are routed as transaction ids
+BLOCKS = len(string.ascii_uppercase) * BASE ** (BLOCK_CHARS - 1)
+# positions are permuted as two halves, BLOCK_SIZE == HALF * HALF
+HALF = 216
+ROUNDS = 4
+
+
+class WalletNamesExhausted(Exception):
+    """Raised when every block of wallet names has been allocated"""
+
+
+def encode(number, width):
+    """Number in base 36, zero padded to width characters"""
+    chars = []
+    for _ in range(width):
+        number, digit = divmod(number, BASE)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def block_prefix(block):
+    """Beginning of names of a block: a letter and the block number in base 36,
+    prefixes grow in the same order as block numbers do
+    """
+    letter, number = divmod(block, BASE ** (BLOCK_CHARS - 1))
+    return string.ascii_uppercase[letter] + encode(number, BLOCK_CHARS - 1)
+
+
+def check_char(payload):
+    """Luhn mod 36 check character of a name without it"""
+    total = 0
+    for index, char in enumerate(reversed(payload)):
+        addend = VALUES[char] * (2 if index % 2 == 0 else 1)
+        total += addend // BASE + addend % BASE
+    return ALPHABET[-total % BASE]
+
+
+def has_valid_check_char(name):
+    """Whether the last character of a name is its check character.
+    Catches any mistyped character and most swaps of adjacent ones
+    """
+    return (
+        len(name) == settings.WALLET_NAME_LENGTH
+        and all(char in ALPHABET for char in name)
+        and check_char(name[:-1]) == name[-1]
+    )
+
+
+class BlockNames:
+    """Names of one block, in the order of a keyed permutation of positions.
+
+    The block number is the name prefix, so names of a block are neighbours
+    in the name index and new blocks are appended to its end. Positions are
+    shuffled by a Feistel network keyed with settings.WALLET_NAME_KEY, so a
+    name doesn't give away the next ones. Names are unique whatever the key
+    is, as every block is used by one process only.
+    """
+
+    def __init__(self, block, key=None):
+        """Precomputes round functions of the permutation of the block"""
+        if not 0 <= block < BLOCKS:
+            raise WalletNamesExhausted(f"Wallet name block {block} is out of range")
+        key = hashlib.sha256((key or settings.WALLET_NAME_KEY).encode()).digest()
+        self.prefix = block_prefix(block)
+        self.rounds = [
+            [
+                int.from_bytes(
+                    hashlib.blake2b(
+                        f"{block}:{number}:{half}".encode(), key=key, digest_size=4
+                    ).digest(),
+                    "big",
+                )
+                % HALF
+                for half in range(HALF)
+            ]
+            for number in range(ROUNDS)
+        ]
+
+    def permute(self, position):
+        """Position in the block a position is moved to"""
+        left, right = divmod(position, HALF)
+        for function in self.rounds:
+            left, right = right, (left + function[right]) % HALF
+        return left * HALF + right
+
+    def name(self, position):
+        """Name at a position of the block"""
+        payload = self.prefix + encode(self.permute(position), POSITION_CHARS)
+        return payload + check_char(payload)
+
+    def __iter__(self):
+        """All names of the block"""
+        return map(self.name, range(BLOCK_SIZE))
+
+
+class WalletNameGenerator:
+    """Hands out wallet names of blocks allocated to this process.
+
+    A block is allocated with one insert of a WalletNameBlock row and serves
+    BLOCK_SIZE names without queries. Names taken by wallets named otherwise
+    (before names were generated by blocks) are skipped when a block is
+    allocated, so inserting a generated name never hits the unique constraint.
+    """
+
+    def __init__(self):
+        """Generator without a block, it's allocated on first use"""
+        self._names = iter(())
+        self._lock = threading.Lock()
+
+    def next_name(self):
+        """Returns a new wallet name"""
+        with self._lock:
+            name = next(self._names, None)
+            if name is None:
+                self._names = self.allocate()
+                name = next(self._names)
+            return name
+
+    def names(self, count):
+        """Returns a list of count new wallet names"""
+        with self._lock:
+            names = []
+            while len(names) < count:
+                names.extend(itertools.islice(self._names, count - len(names)))
+                if len(names) < count:
+                    self._names = self.allocate()
+            return names
+
+    def allocate(self):
+        """Allocates a new block, returns an iterator of its free names"""
+        block = BlockNames(WalletNameBlock.objects.create().pk)
+        taken = set(
+            Wallet.objects.filter(name__startswith=block.prefix).values_list(
+                "name", flat=True
+            )
+        )
+        return (name for name in block if name not in taken)
+
+
+wallet_names = WalletNameGenerator()
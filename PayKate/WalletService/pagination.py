@@ -0,0 +1,96 @@
+"""
+WalletService paginators
+"""
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    """Keyset pagination for transaction lists.
+
+    Pages are ordered by (timestamp, id). Unlike the DRF cursor, which keeps
+    only the first ordering field and skips rows sharing it with an offset,
+    the cursor keeps both values of the last seen row and the next page is
+    filtered by (timestamp, id) > (t, i), so every page is an index range scan
+    of page size rows, however deep the client scrolls and however many
+    transactions share a timestamp.
+    """
+
+    ordering = ("timestamp", "id")
+    page_size = settings.TRANSACTIONS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Page of the queryset following or preceding the cursor position"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request) or Cursor(0, False, None)
+        reverse, position = self.cursor.reverse, self.cursor.position
+        if reverse:
+            queryset = queryset.order_by(*(f"-{field}" for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position, reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous = following_position is not None
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.next_position = following_position
+            self.has_previous, self.previous_position = position is not None, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after_position(self, position, reverse=False):
+        """Filter of rows after the position, or before it for reverse cursors.
+        The timestamp bound is kept on its own so it can start the index scan
+        """
+        timestamp, pk = self.parse_position(position)
+        if reverse:
+            return Q(timestamp__lte=timestamp) & (
+                Q(timestamp__lt=timestamp) | Q(id__lt=pk)
+            )
+        return Q(timestamp__gte=timestamp) & (Q(timestamp__gt=timestamp) | Q(id__gt=pk))
+
+    def parse_position(self, position):
+        """Timestamp and id of a cursor position"""
+        try:
+            timestamp, pk = position.rsplit(",", 1)
+            timestamp, pk = parse_datetime(timestamp), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
+
+    def decode_cursor(self, request):
+        """Cursor of the request, its position must be a timestamp and an id"""
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            self.parse_position(cursor.position)
+        return cursor
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Timestamp and id of a row, joined into one cursor position"""
+        return f"{instance.timestamp.isoformat()},{instance.id}"
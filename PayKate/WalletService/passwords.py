@@ -0,0 +1,94 @@
+"""
+WalletService password hashing of registrations, done by a bounded pool of
+worker threads. The request thread still waits for its hash, so the pool is
+a cap on concurrent registrations: sign-ups beyond it are answered with 503
+at once, so a burst of them holds at most workers + queue request workers
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import get_default_password_validators
+from rest_framework.exceptions import APIException
+from rest_framework.status import HTTP_503_SERVICE_UNAVAILABLE
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when every hashing worker and queue slot is taken"""
+
+    status_code = HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many registrations at once, try again later."
+    default_code = "password_hashing_busy"
+    # seconds sent in the Retry-After header
+    wait = 1
+
+
+def preload_password_validators():
+    """Instantiates AUTH_PASSWORD_VALIDATORS, so CommonPasswordValidator reads
+    its list of 20000 passwords at startup instead of on the first registration
+    """
+    return get_default_password_validators()
+
+
+class HashingPool:
+    """Hashes passwords with worker threads, with at most queue_size more
+    passwords waiting for a worker. It doesn't free callers: each one blocks
+    until its hash is made. Callers finding every slot taken are turned away
+    at once with PasswordHashingBusy, so at most workers + queue_size request
+    threads wait for hashes and the rest keep serving other requests.
+
+    PBKDF2 of hashlib releases the GIL, so request threads waiting for
+    their hashes leave the CPU to the workers and to other requests.
+    """
+
+    def __init__(self, workers, queue_size):
+        """Pool of worker threads, started on first use"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def hash(self, password):
+        """Returns the hash of a password made by a worker"""
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return self.executor.submit(make_password, password).result()
+        finally:
+            self.slots.release()
+
+    def shutdown(self):
+        """Stops workers once hashes being made are done"""
+        self.executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    """Pool of the process, sized by PASSWORD_HASHING_WORKERS and
+    PASSWORD_HASHING_QUEUE
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE
+            )
+        return _pool
+
+
+def reset_hashing_pool():
+    """Drops the pool, the next hash starts one of the current settings"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+
+def hash_password(password):
+    """Hash of a password for User.password, made by the hashing pool"""
+    return hashing_pool().hash(password)
@@ -2,8 +2,7 @@
 """
 from rest_framework import permissions
 from rest_framework.exceptions import MethodNotAllowed, NotFound
-from WalletService.models import Wallet
-from WalletService.serializers import get_object_if_exists
+from WalletService.resolvers import get_wallet_resolver
 
 
 class PostOrSafeMethodsOnly(permissions.BasePermission):
@@ -30,8 +29,11 @@ class SenderWalletOwnerPermission(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         else:
-            wallet = get_object_if_exists(Wallet, name=request.data.get("sender"))
+            # receiver is resolved in the same query for the serializer
+            wallet, _ = get_wallet_resolver(request).resolve(
+                request.data.get("sender"), request.data.get("receiver")
+            )
             if wallet:
-                return wallet.user == request.user
+                return wallet.user_id == request.user.pk
             else:
                 raise NotFound(detail="Sender wallet doesn't exist", code=404)
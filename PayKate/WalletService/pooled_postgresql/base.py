@@ -0,0 +1,116 @@
+"""
+PostgreSQL backend taking connections from a pool of the process. The pool
+is configured by OPTIONS["pool"], with keys of WalletService.pooling.ConnectionPool
+"""
+import threading
+
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+from WalletService.pooling import ConnectionPool
+
+# pools by alias and connection parameters
+pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(conn_params, isolation_level):
+    """Opens a connection the way the postgresql backend does"""
+    connection = base.Database.connect(**conn_params)
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def check_connection(connection):
+    """Raises if a connection doesn't answer a query"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    reset_connection(connection)
+
+
+def reset_connection(connection):
+    """Rolls back a transaction left open, returns whether the connection works"""
+    if connection.closed:
+        return False
+    status = connection.get_transaction_status()
+    if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+def close_pools():
+    """Closes idle connections of every pool and forgets the pools"""
+    with _pools_lock:
+        closed = list(pools.values())
+        pools.clear()
+    for pool in closed:
+        pool.close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Test database creation closing pooled connections before dropping it"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        """Drops the test database once no pooled connection holds it"""
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection wrapper which borrows its connection from a pool
+    and returns it on close, so CONN_MAX_AGE should be 0: a connection is
+    returned at the end of every request and reused by any thread
+    """
+
+    creation_class = DatabaseCreation
+    pooled = None
+
+    def get_connection_params(self):
+        """Connection parameters without the pool options"""
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_pool(self, conn_params):
+        """Pool of the connection parameters, made and filled on first use"""
+        key = (self.alias, tuple(sorted((k, str(v)) for k, v in conn_params.items())))
+        with _pools_lock:
+            pool = pools.get(key)
+            if pool is not None:
+                return pool
+            isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+            pool = pools[key] = ConnectionPool(
+                lambda: connect(conn_params, isolation_level),
+                check_connection,
+                reset_connection,
+                **self.settings_dict["OPTIONS"].get("pool", {}),
+            )
+        pool.fill()
+        return pool
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        """Borrows a connection of the pool"""
+        if self.alias == NO_DB_ALIAS:
+            # connections to the maintenance database aren't pooled
+            return super().get_new_connection(conn_params)
+        self.pooled = self.get_pool(conn_params).get()
+        connection = self.pooled.connection
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        """Returns the connection to its pool"""
+        pooled, self.pooled = self.pooled, None
+        if pooled is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pooled.pool.put(pooled)
@@ -0,0 +1,186 @@
+"""
+WalletService connection pooling: database connections of a process are
+kept open and handed from request to request instead of reconnecting
+"""
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection gets free within the pool timeout"""
+
+
+class PooledConnection:
+    """Connection of a pool, with the times it was opened and last used"""
+
+    def __init__(self, pool, connection):
+        """Connection just opened by the pool"""
+        self.pool = pool
+        self.connection = connection
+        self.opened = self.used = time.monotonic()
+
+
+class ConnectionPool:
+    """Pool of up to max_size connections made by connect().
+
+    Connections are returned with put() and given out again most recently
+    used first. Connections older than max_lifetime are closed instead of
+    being reused, and ones idle for max_idle are closed while the pool has
+    more than min_size. A connection idle for check_interval is checked with
+    check(connection) before it's given out, reset(connection) cleans up a
+    returned connection and tells whether it can be reused.
+    """
+
+    def __init__(
+        self,
+        connect,
+        check,
+        reset,
+        min_size=0,
+        max_size=10,
+        max_lifetime=1800,
+        max_idle=600,
+        check_interval=30,
+        timeout=5,
+    ):
+        """Empty pool, fill() opens min_size connections"""
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.idle = deque()
+        # connections open, idle or given out, and slots reserved for opening
+        self.size = 0
+        self.opened = self.closed = self.waits = 0
+        self.condition = threading.Condition()
+
+    def fill(self):
+        """Opens connections until the pool has min_size of them"""
+        while True:
+            with self.condition:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            self.put(self.open())
+
+    def get(self):
+        """Returns a connection of the pool, opening one if none is idle.
+        Raises PoolTimeout if max_size connections stay given out for timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            pooled = self.take(deadline)
+            if pooled is None:
+                return self.open()
+            if self.usable(pooled):
+                return pooled
+            self.discard(pooled)
+
+    def take(self, deadline):
+        """Idle connection, or None with a slot reserved to open a new one"""
+        with self.condition:
+            waited = False
+            while True:
+                if self.idle:
+                    return self.idle.pop()
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection got free in {self.timeout} seconds, "
+                        f"all {self.max_size} are in use"
+                    )
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self.condition.wait(remaining)
+
+    def open(self):
+        """Opens a connection in a reserved slot"""
+        try:
+            pooled = PooledConnection(self, self.connect())
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened += 1
+        return pooled
+
+    def usable(self, pooled):
+        """Whether an idle connection is young enough and passes its check"""
+        now = time.monotonic()
+        if now - pooled.opened >= self.max_lifetime:
+            return False
+        if now - pooled.used >= self.check_interval:
+            try:
+                self.check(pooled.connection)
+            except Exception:
+                return False
+        return True
+
+    def put(self, pooled):
+        """Returns a connection, closing it if it can't be reused"""
+        now = time.monotonic()
+        try:
+            reusable = now - pooled.opened < self.max_lifetime and self.reset(
+                pooled.connection
+            )
+        except Exception:
+            reusable = False
+        if not reusable:
+            self.discard(pooled)
+            return
+        pooled.used = now
+        stale = []
+        with self.condition:
+            self.idle.append(pooled)
+            while (
+                len(self.idle) > self.min_size
+                and now - self.idle[0].used >= self.max_idle
+            ):
+                stale.append(self.idle.popleft())
+            self.condition.notify()
+        for pooled in stale:
+            self.discard(pooled)
+
+    def discard(self, pooled):
+        """Closes a connection, freeing its slot"""
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.closed += 1
+            self.condition.notify()
+
+    def close(self):
+        """Closes idle connections, given out ones are closed when returned"""
+        with self.condition:
+            idle, self.idle = list(self.idle), deque()
+            self.max_lifetime = 0
+        for pooled in idle:
+            self.discard(pooled)
+
+    def stats(self):
+        """Numbers of connections of the pool"""
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "opened": self.opened,
+                "closed": self.closed,
+                "waits": self.waits,
+            }
@@ -0,0 +1,92 @@
+"""
+WalletService renderers of streaming exports
+"""
+import abc
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EchoBuffer:
+    """File-like object that returns written value instead of storing it"""
+
+    def write(self, value):
+        """Returns value written by csv writer"""
+        return value
+
+
+class StreamingRenderer(BaseRenderer, metaclass=abc.ABCMeta):
+    """Base renderer that also streams rows of an export.
+
+    render() is used for regular responses, like errors;
+    stream() turns an iterator of rows into an iterator of text chunks,
+    one chunk per rows_per_chunk rows, so memory use doesn't depend on
+    the number of rows.
+    """
+
+    charset = "utf-8"
+    rows_per_chunk = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders a non-streaming response data"""
+        if isinstance(data, dict):
+            return "".join(self.stream(list(data), [list(data.values())]))
+        return "".join(self.stream(["detail"], [[data]]))
+
+    def stream(self, header, rows):
+        """Yields rendered rows in chunks"""
+        lines = [self.render_header(header)]
+        for row in rows:
+            lines.append(self.render_row(header, row))
+            if len(lines) >= self.rows_per_chunk:
+                yield "".join(lines)
+                lines = []
+        yield "".join(lines)
+
+    def render_header(self, header):
+        """Renders the first line of an export"""
+        return ""
+
+    @abc.abstractmethod
+    def render_row(self, header, row):
+        """Renders a single row of an export"""
+
+
+class CSVRenderer(StreamingRenderer):
+    """Renders rows as comma separated values with a header line"""
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def __init__(self):
+        """Creates csv writer that returns rendered lines"""
+        self.writer = csv.writer(EchoBuffer())
+
+    def render_header(self, header):
+        """Renders names of columns"""
+        return self.writer.writerow(header)
+
+    def render_row(self, header, row):
+        """Renders a line of values"""
+        return self.writer.writerow(
+            value.isoformat() if hasattr(value, "isoformat") else value for value in row
+        )
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Renders rows as newline delimited json objects"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_row(self, header, row):
+        """Renders a row as a json object on its own line"""
+        return json.dumps(dict(zip(header, row)), default=self.default) + "\n"
+
+    @staticmethod
+    def default(value):
+        """Makes decimals and datetimes json serializable"""
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
@@ -0,0 +1,135 @@
+"""
+WalletService wallet lookups shared by permissions and serializers
+"""
+import threading
+
+from django.conf import settings
+from WalletService.models import Wallet
+
+# in order of model fields, as expected by Model.from_db
+WALLET_METADATA_FIELDS = ("id", "name", "currency", "shards", "user_id")
+
+
+class WalletMetadataCache:
+    """Process level cache of wallet metadata:
+    name -> (id, name, currency, shards, owner id).
+    Id, name, currency and owner don't change during wallet life. Number of
+    shards is changed by the shard_wallet command, transfers with a stale
+    number still credit the wallet correctly. Entries are only dropped in
+    the process which deleted the wallet or resharded it, other processes
+    keep them: transfers to a deleted wallet fail with WalletNotFoundError.
+    Size is limited by settings.WALLET_CACHE_SIZE, 0 disables the cache
+    """
+
+    def __init__(self):
+        """Creates an empty cache"""
+        self._wallets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Checks if cache is turned on in settings"""
+        return settings.WALLET_CACHE_SIZE > 0
+
+    def get_many(self, names):
+        """Returns cached metadata of wallets with given names"""
+        wallets = self._wallets
+        return {name: wallets[name] for name in names if name in wallets}
+
+    def set_many(self, wallets):
+        """Caches metadata of wallets, dropping all entries if cache is full"""
+        with self._lock:
+            if len(self._wallets) + len(wallets) > settings.WALLET_CACHE_SIZE:
+                self._wallets = {}
+            self._wallets.update(wallets)
+
+    def delete(self, name):
+        """Invalidates metadata of a wallet"""
+        with self._lock:
+            self._wallets.pop(name, None)
+
+    def clear(self):
+        """Invalidates all cached metadata"""
+        with self._lock:
+            self._wallets = {}
+
+
+wallet_cache = WalletMetadataCache()
+
+
+class WalletResolver:
+    """Request scoped wallet lookup.
+
+    Wallets are resolved by name with a single query (or from the metadata
+    cache) and remembered for the rest of the request. Resolved wallets
+    have only id, name, currency, user_id and shards loaded.
+    """
+
+    def __init__(self):
+        """Creates a resolver with nothing resolved yet"""
+        self._wallets = {}
+
+    def resolve(self, *names):
+        """Returns wallets with given names, None for not existing ones"""
+        names, missing = self._prepare(names)
+        if missing:
+            found, queryset = self._from_cache(missing)
+            if queryset is not None:
+                self._cache(found, list(queryset))
+            self._store(missing, found)
+        return self._result(names)
+
+    async def aresolve(self, *names):
+        """Async version of resolve, uses async database queries"""
+        names, missing = self._prepare(names)
+        if missing:
+            found, queryset = self._from_cache(missing)
+            if queryset is not None:
+                self._cache(found, [row async for row in queryset])
+            self._store(missing, found)
+        return self._result(names)
+
+    def _prepare(self, names):
+        """Normalizes names and finds ones not resolved yet"""
+        names = [None if name is None else str(name) for name in names]
+        missing = {name for name in names if name and name not in self._wallets}
+        return names, missing
+
+    def _from_cache(self, names):
+        """Gets cached metadata and a query for wallets missing in the cache"""
+        found = wallet_cache.get_many(names) if wallet_cache.enabled else {}
+        if len(found) == len(names):
+            return found, None
+        return found, Wallet.objects.filter(name__in=names - found.keys()).values_list(
+            *WALLET_METADATA_FIELDS
+        )
+
+    def _cache(self, found, rows):
+        """Adds metadata loaded from the database to found and to the cache"""
+        loaded = {row[1]: row for row in rows}
+        if wallet_cache.enabled:
+            wallet_cache.set_many(loaded)
+        found.update(loaded)
+
+    def _store(self, names, found):
+        """Remembers resolved wallets"""
+        db = Wallet.objects.db
+        for name in names:
+            row = found.get(name)
+            self._wallets[name] = (
+                Wallet.from_db(db, WALLET_METADATA_FIELDS, row) if row else None
+            )
+
+    def _result(self, names):
+        """Resolved wallets in order of names"""
+        return [self._wallets.get(name) if name else None for name in names]
+
+
+def get_wallet_resolver(request):
+    """Returns wallet resolver of the request, creating it on first use"""
+    if request is None:
+        return WalletResolver()
+    resolver = getattr(request, "wallet_resolver", None)
+    if resolver is None:
+        resolver = request.wallet_resolver = WalletResolver()
+    return resolver
@@ -0,0 +1,200 @@
+"""
+WalletService read replicas: reads of read-only endpoints are served by
+replica databases, users who have just written read from the primary
+"""
+import asyncio
+import contextvars
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+from WalletService.tokens import InvalidToken, bearer_token, decode_token
+
+PIN_COOKIE = "primary_pin"
+
+
+class ReadRouting:
+    """Database reads of a request are routed to, None - the primary"""
+
+    alias = None
+
+
+read_routing = contextvars.ContextVar("read_routing", default=None)
+
+# replicas which failed to connect: alias -> time to try them again
+_down = {}
+_down_lock = threading.Lock()
+
+
+def pin_key(user_id):
+    """Cache key of the pin of a user"""
+    return f"{PIN_COOKIE}:{user_id}"
+
+
+def pin_to_primary(user_id, response=None):
+    """Sends reads of a user to the primary for READ_YOUR_WRITES_SECONDS.
+    The pin is a cache entry of the user, so it holds for all their clients,
+    token ones included. If a response is given, its client also gets a signed
+    cookie, which pins it while the cache entry is missing
+    """
+    cache.set(pin_key(user_id), True, settings.READ_YOUR_WRITES_SECONDS)
+    if response is not None:
+        response.set_signed_cookie(
+            PIN_COOKIE,
+            user_id,
+            salt=PIN_COOKIE,
+            max_age=settings.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+def is_pinned(request, user_id):
+    """Whether the user of a request has written within READ_YOUR_WRITES_SECONDS"""
+    if cache.get(pin_key(user_id)):
+        return True
+    pinned = request.get_signed_cookie(
+        PIN_COOKIE,
+        default=None,
+        salt=PIN_COOKIE,
+        max_age=settings.READ_YOUR_WRITES_SECONDS,
+    )
+    return pinned == str(user_id)
+
+
+def request_user_id(request):
+    """Id of the user of a request, from its bearer token or its session,
+    without authenticating it: a wrong id only picks the database to read
+    """
+    try:
+        token = bearer_token(get_authorization_header(request))
+        if token is not None:
+            return decode_token(token, "access")["sub"]
+    except InvalidToken:
+        return None
+    return request.session.get(SESSION_KEY)
+
+
+def available_replica():
+    """Alias of a replica accepting connections, None if there is none.
+    Replicas failing to connect are skipped for REPLICA_RETRY_SECONDS
+    """
+    now = time.monotonic()
+    replicas = [
+        alias for alias in settings.REPLICA_DATABASES if _down.get(alias, 0) <= now
+    ]
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+            return alias
+        except DatabaseError:
+            with _down_lock:
+                _down[alias] = now + settings.REPLICA_RETRY_SECONDS
+    return None
+
+
+class ReplicaRouter:
+    """Routes reads of the request to its replica, if ReplicaRoutingMiddleware
+    chose one, and everything else to the primary. Reads in a transaction of
+    the primary stay on the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        """Replica of the request or the primary"""
+        routing = read_routing.get()
+        if routing is None or routing.alias is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.alias
+
+    def db_for_write(self, model, **hints):
+        """Writes go to the primary, even of instances read from a replica"""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same rows as the primary"""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Replicas get migrations by replication only"""
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaRoutingMiddleware:
+    """Chooses the database reads of a request go to.
+
+    Safe requests to REPLICA_READ_ROUTES read from an available replica,
+    unless their user made a successful unsafe request within
+    READ_YOUR_WRITES_SECONDS. Pins are cache entries of the user id, so every
+    process has to share the cache; session clients get a signed cookie too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wraps the next handler, sync or async"""
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        """Serves a request with the routing of its reads"""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = read_routing.set(ReadRouting())
+        try:
+            response = self.get_response(request)
+        finally:
+            read_routing.reset(token)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        """Serves a request of an async handler with the routing of its reads"""
+        token = read_routing.set(ReadRouting())
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_routing.reset(token)
+        if request.method not in SAFE_METHODS:
+            # the user of the session may be loaded by pin
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Routes reads of a safe request to a read route to a replica"""
+        if (
+            settings.REPLICA_DATABASES
+            and request.method in SAFE_METHODS
+            and request.resolver_match.route in settings.REPLICA_READ_ROUTES
+        ):
+            user_id = request_user_id(request)
+            if user_id is None or not is_pinned(request, user_id):
+                # the routing object is shared with the context of the view
+                read_routing.get().alias = available_replica()
+
+    def pin(self, request, response):
+        """Pins the user of a successful unsafe request to the primary"""
+        if (
+            not settings.REPLICA_DATABASES
+            or request.method in SAFE_METHODS
+            or response.status_code >= 400
+        ):
+            return
+        # users of async views are authenticated by the view, not the middleware
+        user = getattr(request, "authenticated_user", None) or getattr(
+            request, "user", None
+        )
+        if user is not None and user.is_authenticated:
+            session = SESSION_KEY in request.session
+            pin_to_primary(user.pk, response if session else None)
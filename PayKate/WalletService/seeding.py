@@ -0,0 +1,370 @@
+"""
+WalletService synthetic data for load tests: users, wallets and a power-law
+graph of transfers between them, written in large chunks
+"""
+import datetime
+import itertools
+import random
+from collections import namedtuple
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+from WalletService.fees import fee_amount, transfer_fee
+from WalletService.models import CARDS, LedgerEntry, Transaction, Wallet, WalletCounter
+from WalletService.names import wallet_names
+
+SeedWallet = namedtuple("SeedWallet", ["pk", "user_id", "currency"])
+
+
+class RowWriter:
+    """Collects rows of a model and writes them in chunks: with COPY on
+    PostgreSQL, with a multi-row INSERT elsewhere. Rows are tuples of field
+    values, written as they are, without model instances.
+
+    Writers of rows referenced by foreign keys of this model are flushed first.
+    """
+
+    def __init__(self, model, fields, chunk_size, depends_on=()):
+        """Writer of the fields of the model"""
+        self.model = model
+        self.fields = [model._meta.get_field(name) for name in fields]
+        self.chunk_size = chunk_size
+        self.depends_on = depends_on
+        self.rows = []
+        self.written = 0
+
+    def add(self, row):
+        """Adds a row, writing the chunk once it's full"""
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes collected rows"""
+        if not self.rows:
+            return
+        for writer in self.depends_on:
+            writer.flush()
+        if connection.vendor == "postgresql":
+            self.copy()
+        else:
+            self.insert()
+        self.written += len(self.rows)
+        self.rows = []
+
+    def insert(self):
+        """Writes collected rows with executemany of an INSERT statement"""
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(field.column) for field in self.fields)
+        placeholders = ", ".join(["%s"] * len(self.fields))
+        # the connection itself, not the thread-local proxy, is used per value
+        database = connections[DEFAULT_DB_ALIAS]
+        rows = [
+            [
+                field.get_db_prep_save(value, database)
+                for field, value in zip(self.fields, row)
+            ]
+            for row in self.rows
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {quote(self.model._meta.db_table)} ({columns}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def copy(self):
+        """Writes collected rows with one COPY statement"""
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(field.column) for field in self.fields)
+        data = StringIO(
+            "".join("\t".join(map(copy_value, row)) + "\n" for row in self.rows)
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(self.model._meta.db_table)} ({columns}) FROM STDIN", data
+            )
+
+
+def copy_value(value):
+    """Value in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def next_id(model):
+    """First free primary key of a model, seeded rows take ids explicitly"""
+    last = model.objects.order_by("-pk").values_list("pk", flat=True).first()
+    return (last or 0) + 1
+
+
+class Seeder:
+    """Generates users, wallets, transfers and ledger postings.
+
+    Senders are chosen uniformly and receivers by a Zipf-like law, so a few
+    wallets receive most of the transfers, like merchant wallets do.
+    Balances are tracked while transfers are generated: transfers a sender
+    can't cover are FAILED, and wallets end up with balances equal to the sums
+    of their ledger postings.
+    """
+
+    def __init__(self, prefix, currencies, chunk_size, skew, seed):
+        """Seeder of users named with the prefix"""
+        self.prefix = prefix
+        self.currencies = currencies
+        self.chunk_size = chunk_size
+        self.skew = skew
+        self.random = random.Random(seed)
+        self.wallets = []
+        self.balances = []
+
+    def seed(
+        self, users, wallets_per_user, transactions, opening_balance, days, password
+    ):
+        """Writes everything, returns {table: rows written}"""
+        now = timezone.now()
+        self.start = now - datetime.timedelta(days=days)
+        self.span = now - self.start
+
+        self.users = RowWriter(
+            User,
+            [
+                "id",
+                "password",
+                "is_superuser",
+                "username",
+                "first_name",
+                "last_name",
+                "email",
+                "is_staff",
+                "is_active",
+                "date_joined",
+            ],
+            self.chunk_size,
+        )
+        self.wallet_rows = RowWriter(
+            Wallet,
+            [
+                "id",
+                "name",
+                "type",
+                "currency",
+                "balance",
+                "shards",
+                "user",
+                "created_on",
+                "modified_on",
+            ],
+            self.chunk_size,
+            depends_on=[self.users],
+        )
+        self.counters = RowWriter(
+            WalletCounter,
+            ["user", "wallets"],
+            self.chunk_size,
+            depends_on=[self.users],
+        )
+        self.transactions = RowWriter(
+            Transaction,
+            [
+                "id",
+                "sender",
+                "receiver",
+                "transfer_amount",
+                "fee",
+                "received_amount",
+                "exchange_rate",
+                "status",
+                "timestamp",
+            ],
+            self.chunk_size,
+            depends_on=[self.wallet_rows],
+        )
+        self.entries = RowWriter(
+            LedgerEntry,
+            ["wallet", "transaction", "currency", "kind", "amount", "created_on"],
+            self.chunk_size,
+            depends_on=[self.transactions],
+        )
+
+        self.seed_wallets(users, wallets_per_user, opening_balance, password)
+        self.seed_transactions(transactions)
+        for writer in self.writers():
+            writer.flush()
+        self.write_balances()
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Wallet, Transaction]
+            ):
+                cursor.execute(sql)
+        return {
+            writer.model._meta.db_table: writer.written for writer in self.writers()
+        }
+
+    def writers(self):
+        """Row writers, in the order tables are filled"""
+        return (
+            self.users,
+            self.wallet_rows,
+            self.counters,
+            self.transactions,
+            self.entries,
+        )
+
+    def seed_wallets(self, users, wallets_per_user, opening_balance, password):
+        """Users with one shared password hash, their wallets and opening postings"""
+        password = make_password(password)
+        user_id, wallet_id = next_id(User), next_id(Wallet)
+        opening = Decimal(opening_balance).quantize(Decimal("0.01"))
+        for index in range(users):
+            username = f"{self.prefix}seed{index}"
+            self.users.add(
+                (
+                    user_id,
+                    password,
+                    False,
+                    username,
+                    "",
+                    "",
+                    "",
+                    False,
+                    True,
+                    self.start,
+                )
+            )
+            self.counters.add((user_id, wallets_per_user))
+            names = wallet_names.names(wallets_per_user)
+            for number, name in enumerate(names):
+                currency = self.currencies[number % len(self.currencies)]
+                self.wallet_rows.add(
+                    (
+                        wallet_id,
+                        name,
+                        CARDS[number % len(CARDS)],
+                        currency,
+                        opening,
+                        0,
+                        user_id,
+                        self.start,
+                        self.start,
+                    )
+                )
+                if opening:
+                    self.entries.add(
+                        (wallet_id, None, currency, "OPENING", opening, self.start)
+                    )
+                self.wallets.append(SeedWallet(wallet_id, user_id, currency))
+                self.balances.append(int(opening * 100))
+                wallet_id += 1
+            user_id += 1
+
+    def seed_transactions(self, count):
+        """Transfers between wallets of the same currency and their postings"""
+        pools = {}
+        for offset, wallet in enumerate(self.wallets):
+            pools.setdefault(wallet.currency, []).append(offset)
+        receivers = {}
+        for currency, pool in pools.items():
+            pool = pool[:]
+            self.random.shuffle(pool)
+            weights = itertools.accumulate(
+                1 / (rank + 1) ** self.skew for rank in range(len(pool))
+            )
+            receivers[currency] = (pool, list(weights))
+
+        transaction_id = next_id(Transaction)
+        step = self.span / max(count, 1)
+        for index in range(count):
+            sender = self.random.randrange(len(self.wallets))
+            pool, weights = receivers[self.wallets[sender].currency]
+            if len(pool) < 2:
+                continue
+            receiver = sender
+            while receiver == sender:
+                receiver = self.random.choices(pool, cum_weights=weights)[0]
+            self.add_transfer(
+                transaction_id, sender, receiver, self.start + step * index
+            )
+            transaction_id += 1
+
+    def add_transfer(self, transaction_id, sender, receiver, timestamp):
+        """Adds one transfer, paid if the sender can cover it"""
+        cents = min(int(self.random.paretovariate(1.2) * 100), 10**6)
+        amount = Decimal(cents).scaleb(-2)
+        sender_wallet, receiver_wallet = self.wallets[sender], self.wallets[receiver]
+        fee = transfer_fee(sender_wallet, receiver_wallet, amount)
+        charged = fee_amount(amount, fee)
+        debit = cents + int(charged.scaleb(2))
+        paid = self.balances[sender] >= debit
+        self.transactions.add(
+            (
+                transaction_id,
+                sender_wallet.pk,
+                receiver_wallet.pk,
+                amount,
+                fee,
+                amount,
+                1,
+                "PAID" if paid else "FAILED",
+                timestamp,
+            )
+        )
+        if not paid:
+            return
+        self.balances[sender] -= debit
+        self.balances[receiver] += cents
+        currency = sender_wallet.currency
+        self.entries.add(
+            (
+                sender_wallet.pk,
+                transaction_id,
+                currency,
+                "DEBIT",
+                -(amount + charged),
+                timestamp,
+            )
+        )
+        self.entries.add(
+            (receiver_wallet.pk, transaction_id, currency, "CREDIT", amount, timestamp)
+        )
+        if charged:
+            self.entries.add(
+                (None, transaction_id, currency, "FEE", charged, timestamp)
+            )
+
+    def write_balances(self):
+        """Sets balances of seeded wallets to the ones left by the transfers"""
+        balances = [
+            (wallet.pk, Decimal(cents).scaleb(-2))
+            for wallet, cents in zip(self.wallets, self.balances)
+        ]
+        if connection.vendor != "postgresql":
+            Wallet.objects.bulk_update(
+                [Wallet(pk=pk, balance=balance) for pk, balance in balances],
+                ["balance"],
+                batch_size=500,
+            )
+            return
+        # balances are copied to a temporary table and joined in one UPDATE
+        table = connection.ops.quote_name(Wallet._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE seed_balance (id bigint, balance numeric)"
+            )
+            cursor.copy_expert(
+                "COPY seed_balance (id, balance) FROM STDIN",
+                StringIO("".join(f"{pk}\t{balance}\n" for pk, balance in balances)),
+            )
+            cursor.execute(
+                f"UPDATE {table} SET balance = seed_balance.balance "
+                f"FROM seed_balance WHERE {table}.id = seed_balance.id"
+            )
+            cursor.execute("DROP TABLE seed_balance")
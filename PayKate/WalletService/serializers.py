@@ -2,19 +2,37 @@
 WalletService serializers
 """
 import decimal
-import random
-import string
 
 from django.conf import settings
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import NotFound
-from WalletService.models import CARDS, CURRENCIES, Transaction, Wallet
-
-
-class UserRegisterSerializer(serializers.ModelSerializer):
+from WalletService.fx import ExchangeRateError, exchange_rate
+from WalletService.metrics import TimedSerializerMixin
+from WalletService.models import (
+    CARDS,
+    CURRENCIES,
+    Transaction,
+    Wallet,
+    WalletCounter,
+    WalletDailyBalance,
+)
+from WalletService.names import wallet_names
+from WalletService.passwords import hash_password
+from WalletService.resolvers import get_wallet_resolver
+from WalletService.services import (
+    InsufficientFundsError,
+    WalletNotFoundError,
+    enqueue_transfer,
+    transfer,
+)
+from WalletService.tokens import InvalidToken, issue_tokens, refresh_tokens
+
+
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for user registration"""
 
     password2 = serializers.CharField(write_only=True)
@@ -28,13 +46,12 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
     def create(self, validated_data):
-        """Creating user and hashing password"""
-        user = User.objects.create(username=validated_data["username"])
-        if "email" in validated_data.keys():
-            user.email = validated_data["email"]
-        user.set_password(validated_data["password"])
-        user.save()
-        return user
+        """Creating user with a password hashed by the hashing pool"""
+        return User.objects.create(
+            username=validated_data["username"],
+            email=validated_data.get("email", ""),
+            password=hash_password(validated_data["password"]),
+        )
 
     def validate(self, attrs):
         """Extended validation"""
@@ -46,7 +63,41 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return super().validate(attrs)
 
 
-class WalletSerializer(serializers.ModelSerializer):
+class TokenObtainSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for getting tokens with username and password"""
+
+    username = serializers.CharField(write_only=True)
+    password = serializers.CharField(write_only=True, style={"input_type": "password"})
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+
+    def validate(self, data):
+        """Checks the password, returns tokens of the user"""
+        user = authenticate(
+            self.context.get("request"),
+            username=data["username"],
+            password=data["password"],
+        )
+        if user is None:
+            raise serializers.ValidationError("Invalid username or password")
+        return issue_tokens(user)
+
+
+class TokenRefreshSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for getting new tokens with a refresh token"""
+
+    refresh = serializers.CharField()
+    access = serializers.CharField(read_only=True)
+
+    def validate(self, data):
+        """Checks the refresh token, returns new tokens"""
+        try:
+            return refresh_tokens(data["refresh"])
+        except InvalidToken as error:
+            raise serializers.ValidationError(str(error))
+
+
+class WalletSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for wallet listing, creation and deletion"""
 
     # overriding type and currency fields from model to specify validation in serializer,
@@ -56,6 +107,9 @@ class WalletSerializer(serializers.ModelSerializer):
 
     type = serializers.CharField(max_length=10)
     currency = serializers.CharField(max_length=3)
+    balance = serializers.DecimalField(
+        source="total_balance", max_digits=12, decimal_places=2, read_only=True
+    )
 
     class Meta:
         """fields config"""
@@ -91,29 +145,26 @@ class WalletSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Method that creates a wallet instance:
         - checks if user can have one more wallet,
-        - ctreates random name,
+        - takes a new unique name,
         - sets bonus balance according to currency
         """
 
-        count = Wallet.objects.filter(user=validated_data["user"]).count()
-        if count >= Wallet.MAX_USER_WALLETS:
-            raise serializers.ValidationError(
-                f"You can't have more than {Wallet.MAX_USER_WALLETS} wallets"
+        # outside of the transaction, a name block allocated here is never rolled back
+        name = wallet_names.next_name()
+        with transaction.atomic():
+            if not WalletCounter.objects.has_room(validated_data["user"]):
+                raise serializers.ValidationError(
+                    f"You can't have more than {Wallet.MAX_USER_WALLETS} wallets"
+                )
+            wallet = Wallet.objects.create(
+                name=name,
+                **validated_data,
+                balance=Wallet.BONUS[validated_data["currency"]],
             )
-        name = "".join(
-            random.SystemRandom().choice(string.ascii_uppercase + string.digits)
-            for _ in range(settings.WALLET_NAME_LENGTH)
-        )
-
-        wallet = Wallet.objects.create(
-            name=name,
-            **validated_data,
-            balance=Wallet.BONUS[validated_data["currency"]],
-        )
         return wallet
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializing for transaction creation and listing"""
 
     receiver = serializers.CharField(
@@ -133,77 +184,80 @@ class TransactionSerializer(serializers.ModelSerializer):
             "sender",
             "transfer_amount",
             "fee",
+            "received_amount",
+            "exchange_rate",
             "status",
             "timestamp",
         )
-        read_only_fields = ("id", "status", "fee")
+        read_only_fields = ("id", "status", "fee", "received_amount", "exchange_rate")
 
     def validate(self, data):
         """Serializer data validation"""
-        receiver = get_object_if_exists(Wallet, name=data["receiver"]["name"])
-        sender = get_object_if_exists(Wallet, name=data["sender"]["name"])
+        receiver, sender = get_wallet_resolver(self.context.get("request")).resolve(
+            data["receiver"]["name"], data["sender"]["name"]
+        )
 
         if not receiver:
             raise NotFound(detail="Receiver wallet doesn't exist", code=404)
         if not sender:
             raise NotFound(detail="Sender wallet doesn't exist", code=404)
 
-        if sender.currency != receiver.currency:
-            raise serializers.ValidationError("Currencies of wallets are not equal")
-
-        if sender.user == receiver.user:
-            if sender.balance < data["transfer_amount"]:
-                raise serializers.ValidationError(
-                    "Sender wallet doesn't have enough funds for transaction"
-                )
-        else:
-            if sender.balance < data["transfer_amount"] * round(
-                decimal.Decimal(1.00 + Transaction.DEFAULT_FEE), 2
-            ):
-                raise serializers.ValidationError(
-                    "Sender wallet doesn't have enough funds for transaction"
-                )
+        try:
+            exchange_rate(sender, receiver)
+        except ExchangeRateError as error:
+            raise serializers.ValidationError(str(error))
 
+        # funds are checked by the transfer engine right in the balance update
         data["receiver"] = receiver
         data["sender"] = sender
 
         return data
 
     def create(self, validated_data):
-        """Transaction creation method"""
+        """Transaction creation method, in queued mode it's only enqueued"""
+        if settings.TRANSACTIONS_QUEUED:
+            return enqueue_transfer(
+                validated_data["sender"],
+                validated_data["receiver"],
+                validated_data["transfer_amount"],
+            )
+        try:
+            return transfer(
+                validated_data["sender"],
+                validated_data["receiver"],
+                validated_data["transfer_amount"],
+            )
+        except (InsufficientFundsError, WalletNotFoundError) as error:
+            raise serializers.ValidationError(str(error))
 
-        sender = validated_data["sender"]
-        receiver = validated_data["receiver"]
-        if sender.user == receiver.user:
-            fee = 0.00
-        else:
-            fee = Transaction.DEFAULT_FEE
 
-        transfer_amount_with_fee = validated_data["transfer_amount"] * round(
-            decimal.Decimal(1.00 + fee), 2
-        )
-        transaction_ = Transaction.objects.create(
-            sender=sender,
-            receiver=receiver,
-            fee=fee,
-            transfer_amount=validated_data["transfer_amount"],
-            status="FAILED",
-        )
+class TransferItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer for a single transfer of a bulk transaction request"""
 
-        with transaction.atomic():
-            sender.balance = sender.balance - transfer_amount_with_fee
-            sender.save()
-            receiver.balance = receiver.balance + validated_data["transfer_amount"]
-            receiver.save()
-            transaction_.status = "PAID"
-            transaction_.save()
-
-        return transaction_
-
-
-def get_object_if_exists(classmodel, **kwargs):
-    """function to handle model DoesNotExist exception"""
-    try:
-        return classmodel.objects.get(**kwargs)
-    except classmodel.DoesNotExist:
-        return
+    receiver = serializers.CharField(max_length=settings.WALLET_NAME_LENGTH)
+    sender = serializers.CharField(max_length=settings.WALLET_NAME_LENGTH)
+    transfer_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=decimal.Decimal("0.01")
+    )
+
+
+class WalletDailyBalanceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for a day of wallet statement"""
+
+    closing_balance = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        """fields config"""
+
+        model = WalletDailyBalance
+        fields = (
+            "day",
+            "opening_balance",
+            "total_in",
+            "total_out",
+            "fees",
+            "count",
+            "closing_balance",
+        )
@@ -0,0 +1,655 @@
+"""
+WalletService transfer engine
+"""
+import datetime
+import decimal
+import random
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Round, TruncDate
+from django.utils import timezone
+from WalletService.fees import amount_with_fee, fee_amount, transfer_fee
+from WalletService.fx import ExchangeRateError, converted_amount, exchange_rate
+from WalletService.models import (
+    LedgerEntry,
+    Transaction,
+    Wallet,
+    WalletBalanceShard,
+    WalletDailyBalance,
+)
+
+ROLLUP_FIELDS = ("total_in", "total_out", "fees", "count")
+
+
+class InsufficientFundsError(Exception):
+    """Raised when a sender wallet can't cover a transfer"""
+
+
+class WalletNotFoundError(Exception):
+    """Raised when a wallet of a transfer was deleted meanwhile"""
+
+
+class TransferError(Exception):
+    """Raised when a transfer of a bulk request can't be made"""
+
+
+def apply_balance_deltas(deltas):
+    """Applies {wallet id: balance delta} changes with conditional updates.
+
+    Rows are updated (and so locked) in primary key order, which keeps
+    concurrent transfers between the same wallets from deadlocking.
+    Debits are only applied if the wallet has enough funds, otherwise
+    InsufficientFundsError is raised. WalletNotFoundError is raised for
+    wallets which don't exist anymore. Must be called inside an atomic block.
+    """
+    now = timezone.now()
+    for wallet_id in sorted(deltas):
+        delta = deltas[wallet_id]
+        wallets = Wallet.objects.filter(pk=wallet_id)
+        if delta < 0:
+            wallets = wallets.filter(balance__gte=-delta)
+        updated = wallets.update(balance=F("balance") + delta, modified_on=now)
+        if updated:
+            continue
+        if delta >= 0:
+            raise WalletNotFoundError("Receiver wallet doesn't exist")
+        # funds credited to balance shards are only seen after folding them
+        if not fold_balance_shards([wallet_id]) or not wallets.update(
+            balance=F("balance") + delta, modified_on=now
+        ):
+            if not Wallet.objects.filter(pk=wallet_id).exists():
+                raise WalletNotFoundError("Sender wallet doesn't exist")
+            raise InsufficientFundsError(
+                "Sender wallet doesn't have enough funds for transaction"
+            )
+
+
+def credit_balance_shard(receiver, transfer_amount):
+    """Credits one of the balance shards of a sharded wallet.
+
+    Shard is chosen at random for every transfer, so concurrent credits,
+    even from one sender, are spread over shard rows instead of waiting
+    for the lock of the wallet row. If the wallet turns out not to be
+    sharded anymore, its row is credited and False is returned.
+    """
+    shard = random.randrange(receiver.shards)
+    updated = WalletBalanceShard.objects.filter(wallet=receiver.pk, shard=shard).update(
+        balance=F("balance") + transfer_amount
+    )
+    if not updated:
+        apply_balance_deltas({receiver.pk: transfer_amount})
+    return bool(updated)
+
+
+def fold_balance_shards(wallet_ids):
+    """Moves balances of wallet shards to the wallet rows.
+
+    Wallets and all their shards are locked till the end of the transaction,
+    so this must be called inside an atomic block. Returns
+    {wallet id: folded amount} of wallets which shards had funds.
+    """
+    list(
+        Wallet.objects.select_for_update()
+        .filter(pk__in=wallet_ids)
+        .order_by("pk")
+        .values_list("id", flat=True)
+    )
+    shards = (
+        WalletBalanceShard.objects.select_for_update()
+        .filter(wallet__in=wallet_ids)
+        .order_by("pk")
+        .values_list("id", "wallet_id", "balance")
+    )
+    folded = defaultdict(decimal.Decimal)
+    shard_ids = []
+    for shard_id, wallet_id, balance in shards:
+        if balance:
+            folded[wallet_id] += balance
+            shard_ids.append(shard_id)
+    if shard_ids:
+        WalletBalanceShard.objects.filter(pk__in=shard_ids).update(balance=0)
+        Wallet.objects.filter(pk__in=folded).update(
+            balance=F("balance")
+            + Case(
+                *[
+                    When(pk=wallet_id, then=Value(total))
+                    for wallet_id, total in folded.items()
+                ],
+                output_field=Wallet._meta.get_field("balance"),
+            )
+        )
+    return folded
+
+
+def shard_wallet(wallet_id, shards, since=None):
+    """Changes the number of balance shards of a wallet, 0 turns sharding off.
+
+    Shard balances are folded into the wallet first and shards above
+    the new number are removed. Daily balances since the given day
+    are rebuilt, as they aren't kept up to date for sharded wallets.
+    """
+    with transaction.atomic():
+        fold_balance_shards([wallet_id])
+        WalletBalanceShard.objects.filter(wallet=wallet_id, shard__gte=shards).delete()
+        WalletBalanceShard.objects.bulk_create(
+            [
+                WalletBalanceShard(wallet_id=wallet_id, shard=shard)
+                for shard in range(shards)
+            ],
+            ignore_conflicts=True,
+        )
+        Wallet.objects.filter(pk=wallet_id).update(shards=shards)
+        rebuild_daily_balances([wallet_id], since=since)
+
+
+def transfer(sender, receiver, transfer_amount):
+    """Moves funds between wallets and records a paid transaction.
+
+    Debit, credit and the transaction row are written in one atomic block,
+    balances are changed in the database, so concurrent transfers
+    from the same wallet can't lose updates or overdraw it.
+    Credits of a sharded wallet go to one of its balance shards.
+    Receiver is credited in its currency, converted with a cached rate.
+    """
+    fee = transfer_fee(sender, receiver, transfer_amount)
+    rate = exchange_rate(sender, receiver)
+    received_amount = converted_amount(transfer_amount, rate)
+    deltas = {sender.pk: -amount_with_fee(transfer_amount, fee)}
+    sharded = {wallet.pk for wallet in (sender, receiver) if wallet.shards}
+    credit_shard = receiver.pk in sharded and receiver.pk != sender.pk
+    if not credit_shard:
+        deltas[receiver.pk] = deltas.get(receiver.pk, 0) + received_amount
+
+    with transaction.atomic():
+        apply_balance_deltas(deltas)
+        if credit_shard and not credit_balance_shard(receiver, received_amount):
+            sharded.discard(receiver.pk)
+        transaction_ = Transaction.objects.create(
+            sender=sender,
+            receiver=receiver,
+            fee=fee,
+            transfer_amount=transfer_amount,
+            received_amount=received_amount,
+            exchange_rate=rate,
+            status="PAID",
+        )
+        post_ledger_entries([transaction_])
+        record_daily_balances([transaction_], skip_wallets=sharded)
+    return transaction_
+
+
+def enqueue_transfer(sender, receiver, transfer_amount):
+    """Records a pending transfer to be settled by the settlement worker.
+    Balances aren't touched, funds are checked when the transfer is settled.
+    Exchange rate is fixed when the transfer is enqueued
+    """
+    rate = exchange_rate(sender, receiver)
+    return Transaction.objects.create(
+        sender=sender,
+        receiver=receiver,
+        fee=transfer_fee(sender, receiver, transfer_amount),
+        transfer_amount=transfer_amount,
+        received_amount=converted_amount(transfer_amount, rate),
+        exchange_rate=rate,
+        status="PENDING",
+    )
+
+
+def lock_wallets(wallets):
+    """Locks wallets of a batch in primary key order and folds shards
+    of sharded ones, so their balances are the whole balance of a wallet.
+    Returns the locked wallets; must be called inside an atomic block.
+    """
+    wallets = list(wallets.select_for_update().order_by("pk"))
+    sharded = {wallet.pk: wallet for wallet in wallets if wallet.shards}
+    if sharded:
+        for wallet_id, folded in fold_balance_shards(list(sharded)).items():
+            sharded[wallet_id].balance += folded
+    return wallets
+
+
+def apply_net_deltas(deltas):
+    """Applies {wallet id: balance delta} changes of locked wallets
+    with one UPDATE statement, skipping wallets which balance didn't change
+    """
+    deltas = {wallet_id: delta for wallet_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Wallet.objects.filter(pk__in=deltas).update(
+        balance=F("balance")
+        + Case(
+            *[
+                When(pk=wallet_id, then=Value(delta))
+                for wallet_id, delta in deltas.items()
+            ],
+            output_field=Wallet._meta.get_field("balance"),
+        ),
+        modified_on=timezone.now(),
+    )
+
+
+def settle_batch(transactions, wallets):
+    """Net settlement of a batch of transfers between locked wallets.
+
+    Transfers are checked in batch order against running balances, so each
+    one sees the result of the transfers before it. The ones a sender can't
+    cover are marked FAILED, the rest PAID. Balance changes of the batch
+    are netted per wallet in one pass and applied with one UPDATE, however
+    many transfers bounce between the same wallets; every transfer is
+    still kept as its own transaction.
+
+    wallets maps primary keys to wallets locked by lock_wallets.
+    Returns paid transfers.
+    """
+    deltas = defaultdict(decimal.Decimal)
+    paid = []
+    for transaction_ in transactions:
+        sender = transaction_.sender = wallets[transaction_.sender_id]
+        receiver = transaction_.receiver = wallets[transaction_.receiver_id]
+        amount = transaction_.transfer_amount
+        debit = amount_with_fee(amount, transaction_.fee)
+        if sender.balance < debit:
+            transaction_.status = "FAILED"
+            continue
+        sender.balance -= debit
+        receiver.balance += transaction_.received_amount
+        deltas[sender.pk] -= debit
+        deltas[receiver.pk] += transaction_.received_amount
+        transaction_.status = "PAID"
+        paid.append(transaction_)
+    apply_net_deltas(deltas)
+    return paid
+
+
+def record_settlement(paid, wallets):
+    """Writes ledger postings and daily balances of a settled batch"""
+    post_ledger_entries(paid)
+    record_daily_balances(
+        paid, skip_wallets={wallet.pk for wallet in wallets if wallet.shards}
+    )
+
+
+def settle_pending_transfers(batch_size):
+    """Settles a batch of the oldest pending transfers.
+
+    Pending rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent workers take disjoint batches and a transfer can't be
+    settled twice. The batch is settled by settle_batch.
+
+    Returns the number of settled (paid or failed) transfers.
+    """
+    with transaction.atomic():
+        pending = list(
+            Transaction.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING")
+            .order_by("id")[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        wallet_ids = {transaction_.sender_id for transaction_ in pending}
+        wallet_ids.update(transaction_.receiver_id for transaction_ in pending)
+        wallets = lock_wallets(
+            Wallet.objects.filter(pk__in=wallet_ids).only(
+                "id", "currency", "balance", "shards"
+            )
+        )
+        paid = settle_batch(pending, {wallet.pk: wallet for wallet in wallets})
+        Transaction.objects.bulk_update(pending, ["status"])
+        record_settlement(paid, wallets)
+    return len(pending)
+
+
+def check_bulk_transfer(user, sender, receiver, transfer_amount):
+    """Validates one transfer of a bulk request, funds are checked
+    on settlement. Returns the fee and the exchange rate of the transfer
+    """
+    if not sender:
+        raise TransferError("Sender wallet doesn't exist")
+    if not receiver:
+        raise TransferError("Receiver wallet doesn't exist")
+    if sender.user_id != user.pk:
+        raise TransferError("Sender wallet is not user's wallet")
+    try:
+        rate = exchange_rate(sender, receiver)
+    except ExchangeRateError as error:
+        raise TransferError(str(error))
+    return transfer_fee(sender, receiver, transfer_amount), rate
+
+
+def bulk_transfer(user, transfers):
+    """Makes a batch of transfers of a user in one database transaction.
+
+    All wallets of the batch are fetched and locked with one query, senders
+    only among wallets of the user, and valid transfers are settled by
+    settle_batch, with one balance update.
+    Paid transfers are written with one bulk insert, invalid and
+    uncovered ones are skipped.
+
+    Returns a list with a Transaction or a TransferError for every transfer.
+    """
+    senders = {item["sender"] for item in transfers}
+    receivers = {item["receiver"] for item in transfers}
+    results = []
+
+    with transaction.atomic():
+        wallets = lock_wallets(
+            Wallet.objects.filter(
+                Q(user=user, name__in=senders) | Q(name__in=receivers)
+            )
+        )
+        by_name = {wallet.name: wallet for wallet in wallets}
+        for item in transfers:
+            sender = by_name.get(item["sender"])
+            receiver = by_name.get(item["receiver"])
+            transfer_amount = item["transfer_amount"]
+            try:
+                fee, rate = check_bulk_transfer(user, sender, receiver, transfer_amount)
+            except TransferError as error:
+                results.append(error)
+                continue
+            results.append(
+                Transaction(
+                    sender=sender,
+                    receiver=receiver,
+                    fee=fee,
+                    transfer_amount=transfer_amount,
+                    received_amount=converted_amount(transfer_amount, rate),
+                    exchange_rate=rate,
+                )
+            )
+
+        paid = settle_batch(
+            [result for result in results if isinstance(result, Transaction)],
+            {wallet.pk: wallet for wallet in wallets},
+        )
+        results = [
+            TransferError("Sender wallet doesn't have enough funds for transaction")
+            if isinstance(result, Transaction) and result.status == "FAILED"
+            else result
+            for result in results
+        ]
+        Transaction.objects.bulk_create(paid)
+        record_settlement(paid, wallets)
+
+    return results
+
+
+def post_ledger_entries(transactions):
+    """Writes ledger postings of paid transactions with one multi-row insert.
+
+    Converted transfers go through the house accounts of both currencies
+    (FX postings), so postings of every currency still sum up to zero.
+    """
+    entries = []
+    for transaction_ in transactions:
+        amount = transaction_.transfer_amount
+        received_amount = transaction_.received_amount
+        debit = amount_with_fee(amount, transaction_.fee)
+        currency = transaction_.sender.currency
+        received_currency = transaction_.receiver.currency
+        entries.append(
+            LedgerEntry(
+                transaction=transaction_,
+                wallet_id=transaction_.sender_id,
+                currency=currency,
+                kind="DEBIT",
+                amount=-debit,
+            )
+        )
+        entries.append(
+            LedgerEntry(
+                transaction=transaction_,
+                wallet_id=transaction_.receiver_id,
+                currency=received_currency,
+                kind="CREDIT",
+                amount=received_amount,
+            )
+        )
+        if debit != amount:
+            entries.append(
+                LedgerEntry(
+                    transaction=transaction_,
+                    currency=currency,
+                    kind="FEE",
+                    amount=debit - amount,
+                )
+            )
+        if currency != received_currency:
+            entries.append(
+                LedgerEntry(
+                    transaction=transaction_,
+                    currency=currency,
+                    kind="FX",
+                    amount=amount,
+                )
+            )
+            entries.append(
+                LedgerEntry(
+                    transaction=transaction_,
+                    currency=received_currency,
+                    kind="FX",
+                    amount=-received_amount,
+                )
+            )
+    LedgerEntry.objects.bulk_create(entries)
+
+
+def rebuild_balances(wallet_ids, check_only=False):
+    """Recomputes cached balances of wallets as sums of their ledger postings.
+
+    Wallets are locked while their postings are summed up, their balance
+    shards are folded first. Returns ids of wallets which balance didn't
+    match the ledger; with check_only the balances are only verified, not fixed.
+    """
+    with transaction.atomic():
+        fold_balance_shards(wallet_ids)
+        wallets = list(
+            Wallet.objects.select_for_update()
+            .filter(pk__in=wallet_ids)
+            .order_by("pk")
+            .only("id", "balance")
+        )
+        ledger = dict(
+            LedgerEntry.objects.filter(wallet__in=wallet_ids)
+            .order_by()
+            .values("wallet")
+            .annotate(balance=Sum("amount"))
+            .values_list("wallet", "balance")
+        )
+        mismatched = []
+        for wallet in wallets:
+            balance = ledger.get(wallet.pk, decimal.Decimal(0))
+            if wallet.balance != balance:
+                wallet.balance = balance
+                mismatched.append(wallet)
+        if not check_only:
+            Wallet.objects.bulk_update(mismatched, ["balance"])
+    return [wallet.pk for wallet in mismatched]
+
+
+def daily_totals(transactions):
+    """Groups paid transactions into {day: {wallet id: rollup totals}}"""
+    days = defaultdict(
+        lambda: defaultdict(
+            lambda: {
+                "total_in": decimal.Decimal(0),
+                "total_out": decimal.Decimal(0),
+                "fees": decimal.Decimal(0),
+                "count": 0,
+            }
+        )
+    )
+    for transaction_ in transactions:
+        wallets = days[timezone.localdate(transaction_.timestamp)]
+        amount = transaction_.transfer_amount
+        sent = wallets[transaction_.sender_id]
+        sent["total_out"] += amount
+        sent["fees"] += fee_amount(amount, transaction_.fee)
+        sent["count"] += 1
+        received = wallets[transaction_.receiver_id]
+        received["total_in"] += transaction_.received_amount
+        if transaction_.receiver_id != transaction_.sender_id:
+            received["count"] += 1
+    return days
+
+
+def rollup_net(totals):
+    """Change of wallet balance made by rolled up transactions"""
+    return totals["total_in"] - totals["total_out"] - totals["fees"]
+
+
+def recorded_net_after(wallet_ids, day):
+    """Balance changes of wallets recorded by their rollups after a day"""
+    rows = (
+        WalletDailyBalance.objects.filter(wallet__in=wallet_ids, day__gt=day)
+        .values("wallet")
+        .annotate(net=Sum(F("total_in") - F("total_out") - F("fees")))
+    )
+    return defaultdict(decimal.Decimal, {row["wallet"]: row["net"] for row in rows})
+
+
+def record_daily_balances(transactions, skip_wallets=()):
+    """Adds paid transactions to daily balances of their wallets.
+
+    Rollup rows of a day are updated with one statement. Rows missing for
+    the first transactions of the day are created with an opening balance
+    derived from the current wallet balance, so this must be called in the
+    atomic block that has changed (and locked) the wallets.
+    Transactions of a past day (queued ones settled later) also move the
+    opening balances of the rows recorded after it.
+    Skipped (sharded) wallets get their rollups rebuilt when shards are folded.
+    """
+    today = timezone.localdate()
+    later_net = defaultdict(decimal.Decimal)
+    days = daily_totals(transactions)
+    for day in sorted(days, reverse=True):
+        wallets = {
+            wallet_id: totals
+            for wallet_id, totals in days[day].items()
+            if wallet_id not in skip_wallets
+        }
+        if not wallets:
+            continue
+        rollups = WalletDailyBalance.objects.filter(day=day, wallet__in=wallets)
+        updated = rollups.update(
+            **{
+                field: F(field)
+                + Case(
+                    *[
+                        When(wallet=wallet_id, then=Value(totals[field]))
+                        for wallet_id, totals in wallets.items()
+                    ],
+                    default=Value(0),
+                    output_field=WalletDailyBalance._meta.get_field(field),
+                )
+                for field in ROLLUP_FIELDS
+            }
+        )
+        if updated < len(wallets):
+            balances = (
+                Wallet.objects.filter(pk__in=wallets)
+                .exclude(daily_balances__day=day)
+                .values_list("id", "balance")
+            )
+            if day < today:
+                # rows of later days hold this batch's later transactions too
+                later_net = recorded_net_after(wallets, day)
+            WalletDailyBalance.objects.bulk_create(
+                WalletDailyBalance(
+                    wallet_id=wallet_id,
+                    day=day,
+                    opening_balance=balance
+                    - later_net[wallet_id]
+                    - rollup_net(wallets[wallet_id]),
+                    **wallets[wallet_id],
+                )
+                for wallet_id, balance in balances
+            )
+        if day < today:
+            WalletDailyBalance.objects.filter(wallet__in=wallets, day__gt=day).update(
+                opening_balance=F("opening_balance")
+                + Case(
+                    *[
+                        When(wallet=wallet_id, then=Value(rollup_net(totals)))
+                        for wallet_id, totals in wallets.items()
+                    ],
+                    default=Value(0),
+                    output_field=WalletDailyBalance._meta.get_field("opening_balance"),
+                )
+            )
+        for wallet_id, totals in wallets.items():
+            later_net[wallet_id] += rollup_net(totals)
+
+
+def rebuild_daily_balances(wallet_ids, since=None):
+    """Recomputes daily balances of wallets from their paid transactions.
+
+    Totals are aggregated by the database per wallet and day. Opening
+    balances are restored backwards from the current wallet balance,
+    which is locked (with its shards folded) while the rollup is rebuilt.
+    With since, only daily balances from that day on are rebuilt.
+    """
+    with transaction.atomic():
+        fold_balance_shards(wallet_ids)
+        balances = dict(
+            Wallet.objects.select_for_update()
+            .filter(pk__in=wallet_ids)
+            .order_by("pk")
+            .values_list("id", "balance")
+        )
+        paid = (
+            Transaction.objects.filter(status="PAID")
+            .order_by()
+            .annotate(day=TruncDate("timestamp"))
+        )
+        daily_balances = WalletDailyBalance.objects.filter(wallet__in=balances)
+        if since:
+            start = datetime.datetime.combine(since, datetime.time())
+            paid = paid.filter(timestamp__gte=timezone.make_aware(start))
+            daily_balances = daily_balances.filter(day__gte=since)
+        sent = (
+            paid.filter(sender__in=balances)
+            .values("sender", "day")
+            .annotate(
+                total_out=Sum("transfer_amount"),
+                fees=Sum(
+                    Round(F("transfer_amount") * F("fee"), 2),
+                    output_field=DecimalField(),
+                ),
+                count=Count("id"),
+            )
+        )
+        received = (
+            paid.filter(receiver__in=balances)
+            .values("receiver", "day")
+            .annotate(
+                total_in=Sum("received_amount"),
+                count=Count("id", filter=~Q(sender=F("receiver"))),
+            )
+        )
+
+        rollups = {}
+        for row in sent:
+            rollup = rollups.setdefault(
+                (row["sender"], row["day"]),
+                WalletDailyBalance(wallet_id=row["sender"], day=row["day"]),
+            )
+            rollup.total_out, rollup.fees = row["total_out"], row["fees"]
+            rollup.count += row["count"]
+        for row in received:
+            rollup = rollups.setdefault(
+                (row["receiver"], row["day"]),
+                WalletDailyBalance(wallet_id=row["receiver"], day=row["day"]),
+            )
+            rollup.total_in = row["total_in"]
+            rollup.count += row["count"]
+
+        for (wallet_id, _), rollup in sorted(rollups.items(), reverse=True):
+            balances[wallet_id] -= rollup_net(vars(rollup))
+            rollup.opening_balance = balances[wallet_id]
+
+        daily_balances.delete()
+        WalletDailyBalance.objects.bulk_create(rollups.values())
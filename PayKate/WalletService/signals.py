@@ -0,0 +1,48 @@
+"""WalletService signal handlers"""
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from WalletService.metrics import install_query_recorder
+from WalletService.models import LedgerEntry, Wallet, WalletCounter
+from WalletService.resolvers import wallet_cache
+
+
+@receiver(post_delete, sender=Wallet)
+def invalidate_wallet_cache(sender, instance, **kwargs):
+    """Drops metadata of a deleted wallet from the wallet cache.
+    Repeated after commit, as a concurrent request could cache it again meanwhile
+    """
+    wallet_cache.delete(instance.name)
+    transaction.on_commit(lambda: wallet_cache.delete(instance.name))
+
+
+@receiver(post_save, sender=Wallet)
+def count_wallet(sender, instance, created, **kwargs):
+    """Takes a place in the limit of the owner of a new wallet"""
+    if created:
+        WalletCounter.objects.add(instance.user_id)
+
+
+@receiver(post_delete, sender=Wallet)
+def release_wallet_counter(sender, instance, **kwargs):
+    """Frees the place of a deleted wallet in the limit of its owner"""
+    WalletCounter.objects.release(instance.user_id)
+
+
+@receiver(post_save, sender=Wallet)
+def post_opening_balance(sender, instance, created, **kwargs):
+    """Posts initial balance of a new wallet (like a bonus) to the ledger"""
+    if created and instance.balance:
+        LedgerEntry.objects.create(
+            wallet=instance,
+            currency=instance.currency,
+            kind="OPENING",
+            amount=instance.balance,
+        )
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    """Counts queries of a new database connection in request metrics"""
+    install_query_recorder(connection)
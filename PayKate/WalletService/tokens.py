@@ -0,0 +1,140 @@
+"""
+WalletService stateless tokens: short-lived access tokens verified without
+database queries and refresh tokens to get new ones
+"""
+import base64
+import hmac
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.crypto import salted_hmac
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+HEADER = {"alg": "HS256", "typ": "JWT"}
+KEY_SALT = "WalletService.tokens"
+KEYWORD = b"bearer"
+
+
+class InvalidToken(Exception):
+    """Raised for malformed, forged, expired or wrong type tokens"""
+
+
+class TokenAuthenticationFailed(AuthenticationFailed):
+    """Raised for requests with an invalid bearer token or a token of a deleted
+    user. Answered with 401 and WWW-Authenticate, while other authentication
+    failures are 403 as session authentication comes first
+    """
+
+    auth_header = 'Bearer realm="api"'
+
+
+def b64encode(data):
+    """Base64url without padding, like JWT has"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data):
+    """Decodes base64url without padding"""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def signature(signing_input):
+    """HMAC-SHA256 of a token with a key derived from SECRET_KEY"""
+    return salted_hmac(KEY_SALT, signing_input, algorithm="sha256").digest()
+
+
+def encode_token(claims):
+    """Signed token of claims in JWT compact format"""
+    signing_input = b".".join(
+        b64encode(json.dumps(part, separators=(",", ":")).encode())
+        for part in (HEADER, claims)
+    )
+    return (signing_input + b"." + b64encode(signature(signing_input))).decode()
+
+
+def decode_token(token, token_type):
+    """Verifies a token, returns its claims.
+    Raises InvalidToken if it isn't a valid unexpired token of the type
+    """
+    try:
+        signing_input, _, signed = token.encode().rpartition(b".")
+        if not hmac.compare_digest(b64decode(signed), signature(signing_input)):
+            raise InvalidToken("Token signature doesn't match")
+        claims = json.loads(b64decode(signing_input.partition(b".")[2]))
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidToken("Malformed token")
+    if not isinstance(claims, dict):
+        raise InvalidToken("Malformed token")
+    if claims.get("type") != token_type:
+        raise InvalidToken(f"Expected a token of {token_type} type")
+    if claims.get("exp", 0) < time.time():
+        raise InvalidToken("Token has expired")
+    return claims
+
+
+def issue_tokens(user):
+    """Access and refresh tokens of a user"""
+    now = int(time.time())
+    claims = {"sub": user.pk, "staff": user.is_staff, "iat": now}
+    return {
+        "access": encode_token(
+            {**claims, "type": "access", "exp": now + settings.ACCESS_TOKEN_LIFETIME}
+        ),
+        "refresh": encode_token(
+            {**claims, "type": "refresh", "exp": now + settings.REFRESH_TOKEN_LIFETIME}
+        ),
+    }
+
+
+def refresh_tokens(refresh_token):
+    """New tokens for a refresh token of a user who is still active.
+    Raises InvalidToken otherwise
+    """
+    claims = decode_token(refresh_token, "refresh")
+    user = User.objects.filter(pk=claims["sub"], is_active=True).first()
+    if user is None:
+        raise InvalidToken("User is inactive or deleted")
+    return issue_tokens(user)
+
+
+def token_user(claims):
+    """User of an access token, built from its claims without a query:
+    only the id and the staff flag are loaded
+    """
+    return User(pk=claims["sub"], is_staff=claims["staff"], is_active=True)
+
+
+def bearer_token(header):
+    """Token of an Authorization header value, None for other schemes"""
+    parts = header.split()
+    if not parts or parts[0].lower() != KEYWORD:
+        return None
+    if len(parts) != 2:
+        raise InvalidToken("Authorization header must be 'Bearer <token>'")
+    return parts[1].decode("latin-1")
+
+
+class TokenAuthentication(BaseAuthentication):
+    """Authenticates requests with an 'Authorization: Bearer <access token>'
+    header. Tokens are checked by their signature and expiry only, access
+    tokens of deactivated users work until they expire. Writes of users
+    deleted meanwhile are answered by views.token_exception_handler
+    """
+
+    def authenticate(self, request):
+        """Returns the user and claims of the token, None without a token"""
+        try:
+            token = bearer_token(get_authorization_header(request))
+            if token is None:
+                return None
+            claims = decode_token(token, "access")
+        except InvalidToken as error:
+            raise TokenAuthenticationFailed(str(error))
+        return token_user(claims), claims
+
+    def authenticate_header(self, request):
+        """WWW-Authenticate value of 401 responses"""
+        return TokenAuthenticationFailed.auth_header
@@ -1,21 +1,64 @@
 """This module is for views creation
 """
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import IntegrityError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import permissions, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import (
     CreateAPIView,
+    GenericAPIView,
     ListAPIView,
     ListCreateAPIView,
     RetrieveDestroyAPIView,
 )
 from rest_framework.response import Response
-from rest_framework.status import HTTP_404_NOT_FOUND
-from WalletService.models import Transaction, Wallet
+from rest_framework.status import (
+    HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
+    HTTP_207_MULTI_STATUS,
+    HTTP_404_NOT_FOUND,
+)
+from rest_framework.views import APIView, exception_handler
+from WalletService.idempotency import IdempotentCreateMixin
+from WalletService.metrics import registry
+from WalletService.models import Transaction, Wallet, WalletDailyBalance
+from WalletService.pagination import TransactionCursorPagination
 from WalletService.permissions import PostOrSafeMethodsOnly, SenderWalletOwnerPermission
+from WalletService.renderers import CSVRenderer, NDJSONRenderer
+from WalletService.services import bulk_transfer
+from WalletService.tokens import TokenAuthenticationFailed
+
+from .serializers import (
+    TokenObtainSerializer,
+    TokenRefreshSerializer,
+    TransactionSerializer,
+    TransferItemSerializer,
+    UserRegisterSerializer,
+    WalletDailyBalanceSerializer,
+    WalletSerializer,
+)
 
-from .serializers import TransactionSerializer, UserRegisterSerializer, WalletSerializer
+
+def token_exception_handler(exc, context):
+    """DRF exception handler answering token authentication failures with 401.
+    Writes of token users, deleted since their token was issued, fail with
+    an IntegrityError of a foreign key, they are answered with 401 too
+    """
+    request = context["request"]
+    if (
+        isinstance(exc, IntegrityError)
+        and isinstance(request.auth, dict)
+        and not User.objects.filter(pk=request.auth["sub"]).exists()
+    ):
+        exc = TokenAuthenticationFailed("User is inactive or deleted")
+    if isinstance(exc, TokenAuthenticationFailed):
+        # APIView made it 403, as session authentication has no WWW-Authenticate
+        exc.status_code = TokenAuthenticationFailed.status_code
+    return exception_handler(exc, context)
 
 
 class CreateUserView(CreateAPIView):
@@ -26,6 +69,33 @@ class CreateUserView(CreateAPIView):
     serializer_class = UserRegisterSerializer
 
 
+class TokenView(GenericAPIView):
+    """Base API view answering a post with tokens made by its serializer.
+    Not authenticated, so a session doesn't make it check CSRF
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        """Returns tokens"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data)
+
+
+class TokenObtainView(TokenView):
+    """API view for getting access and refresh tokens with username and password"""
+
+    serializer_class = TokenObtainSerializer
+
+
+class TokenRefreshView(TokenView):
+    """API view for getting new tokens with a refresh token"""
+
+    serializer_class = TokenRefreshSerializer
+
+
 class ListUserView(ListAPIView):
     """API view for checking all users"""
 
@@ -43,7 +113,7 @@ class WalletListView(ListCreateAPIView):
     def get_queryset(self):
         """Gets user wallets"""
         user = self.request.user
-        return Wallet.objects.filter(user=user)
+        return Wallet.objects.filter(user=user).with_shard_balance()
 
     def perform_create(self, serializer):
         """Transmits user data to serializer create method"""
@@ -60,7 +130,7 @@ class WalletDetailView(RetrieveDestroyAPIView):
     def get_queryset(self):
         """Gets user wallets"""
         user = self.request.user
-        return Wallet.objects.filter(user=user)
+        return Wallet.objects.filter(user=user).with_shard_balance()
 
     def delete(self, request, *args, **kwargs):
         """Deletes user's wallet"""
@@ -69,7 +139,58 @@ class WalletDetailView(RetrieveDestroyAPIView):
         return Response(f"Wallet {name} deleted", status=response.status_code)
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class WalletStatementView(ListAPIView):
+    """API view for a wallet statement: a day by day rollup of transactions"""
+
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = WalletDailyBalanceSerializer
+
+    def get_queryset(self):
+        """Gets daily balances of user's wallet within from-to range"""
+        wallet_id = (
+            self.request.user.wallet_set.filter(name=self.kwargs["name"])
+            .values_list("id", flat=True)
+            .first()
+        )
+        if wallet_id is None:
+            raise NotFound(detail="No such wallet for current user", code=404)
+
+        daily_balances = WalletDailyBalance.objects.filter(wallet=wallet_id)
+        day_from, day_to = self.get_day("from"), self.get_day("to")
+        if day_from:
+            daily_balances = daily_balances.filter(day__gte=day_from)
+        if day_to:
+            daily_balances = daily_balances.filter(day__lte=day_to)
+        return daily_balances
+
+    def get_day(self, param):
+        """Parses optional YYYY-MM-DD date query parameter"""
+        value = self.request.query_params.get(param)
+        if not value:
+            return
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({param: "Date must be in YYYY-MM-DD format"})
+        return day
+
+
+class QueuedCreateMixin:
+    """Answers 202 instead of 201 when a created transaction is only queued"""
+
+    def create(self, request, *args, **kwargs):
+        """Creates a transaction"""
+        response = super().create(request, *args, **kwargs)
+        if response.data.get("status") == "PENDING":
+            response.status_code = HTTP_202_ACCEPTED
+        return response
+
+
+class TransactionViewSet(
+    IdempotentCreateMixin, QueuedCreateMixin, viewsets.ModelViewSet
+):
     """API viewset for transactions"""
 
     permission_classes = [
@@ -78,16 +199,83 @@ class TransactionViewSet(viewsets.ModelViewSet):
         SenderWalletOwnerPermission,
     ]
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
     lookup_field = "id"
 
     def get_queryset(self):
         """Gets users transactions"""
         user = self.request.user
-        user_wallet = user.wallet_set.all()
-        user_transactions = Transaction.objects.filter(
-            Q(receiver__in=user_wallet) | Q(sender__in=user_wallet)
+        return Transaction.objects.for_user(user).with_wallet_names()
+
+
+class TransactionBulkView(GenericAPIView):
+    """API view for making a batch of transfers in one request"""
+
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = TransferItemSerializer
+
+    def post(self, request, *args, **kwargs):
+        """Makes transfers of the batch and reports result of each one.
+        Responds 201 if all transfers are made, 207 if some of them failed
+        """
+        # the size is checked before any transfer of the batch is validated
+        if not (
+            isinstance(request.data, list)
+            and 0 < len(request.data) <= settings.BULK_TRANSACTIONS_MAX
+        ):
+            raise ValidationError(
+                f"Batch must contain from 1 to {settings.BULK_TRANSACTIONS_MAX} transfers"
+            )
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        status = HTTP_201_CREATED
+        for result in bulk_transfer(request.user, serializer.validated_data):
+            if isinstance(result, Transaction):
+                results.append(TransactionSerializer(result).data)
+            else:
+                results.append({"status": "FAILED", "error": str(result)})
+                status = HTTP_207_MULTI_STATUS
+        return Response(results, status=status)
+
+
+class TransactionExportView(APIView):
+    """API view for exporting user's transaction history as csv or ndjson.
+
+    Rows are read with a server-side cursor as plain tuples and streamed
+    to the client while being read, so memory use stays flat however
+    long the history is.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    columns = {
+        "id": "id",
+        "sender": "sender__name",
+        "receiver": "receiver__name",
+        "transfer_amount": "transfer_amount",
+        "fee": "fee",
+        "received_amount": "received_amount",
+        "exchange_rate": "exchange_rate",
+        "status": "status",
+        "timestamp": "timestamp",
+    }
+
+    def get(self, request, *args, **kwargs):
+        """Streams transactions in format chosen by format query parameter"""
+        rows = (
+            Transaction.objects.for_user(request.user)
+            .values_list(*self.columns.values())
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+        renderer = request.accepted_renderer
+        filename = f"transactions.{renderer.format}"
+        return StreamingHttpResponse(
+            renderer.stream(list(self.columns), rows),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
-        return user_transactions
 
 
 class WalletTransactionView(ListAPIView):
@@ -95,25 +283,40 @@ class WalletTransactionView(ListAPIView):
 
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
         """Gets transactions of a wallet"""
         wallet_name = self.kwargs["name"]
         user = self.request.user
-        user_wallets = list(user.wallet_set.all().values("name"))
-        for wallet in user_wallets:
-            if wallet["name"] == wallet_name:
-                return Transaction.objects.filter(
-                    Q(receiver__name=wallet_name) | Q(sender__name=wallet_name)
-                )
-        return
+        wallet_id = (
+            user.wallet_set.filter(name=wallet_name)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if wallet_id is None:
+            return
+        return Transaction.objects.for_wallet(wallet_id).with_wallet_names()
 
     def list(self, request, *args, **kwargs):
-        """Lists transaction if exist. If not - 404"""
+        """Lists transaction if wallet belongs to current user. If not - 404"""
         queryset = self.get_queryset()
-        if not queryset:
+        if queryset is None:
             return Response(
                 {"Failed": "No such wallet for current user"}, status=HTTP_404_NOT_FOUND
             )
-        else:
-            return super().list(self, request)
+        page = self.paginate_queryset(self.filter_queryset(queryset))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class MetricsView(APIView):
+    """API view for request metrics of this process in Prometheus text format"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """Renders histograms of all endpoints"""
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -0,0 +1,151 @@
+"""Module for testing async
+    /async/wallets,
+    /async/wallets/<str:name>,
+    /async/transactions APIs
+"""
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from WalletService.models import Transaction, Wallet
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user
+        )
+    return user
+
+
+@pytest.fixture
+def user2():
+    """Second user with a wallet fixture"""
+
+    user = User.objects.create(username="username2")
+    Wallet.objects.create(
+        name="U2USD1", type="Visa", currency="USD", balance=100, user=user
+    )
+    return user
+
+
+@pytest.fixture
+def async_client():
+    """Async client, requests are made with async_to_sync"""
+    return AsyncClient()
+
+
+def request(client, method, url, **kwargs):
+    """Makes a request with an async client from sync test"""
+
+    async def make_request():
+        """Awaits the request"""
+        return await getattr(client, method)(url, **kwargs)
+
+    return async_to_sync(make_request)()
+
+
+def get(client, url):
+    """Makes a get request with an async client"""
+    return request(client, "get", url)
+
+
+def post(client, url, data):
+    """Makes a json post request with an async client"""
+    return request(client, "post", url, data=data, content_type="application/json")
+
+
+@pytest.mark.django_db
+def test_async_wallets_get(async_client, user, user2):
+    """Testing async wallet list and detail"""
+
+    response = get(async_client, "/async/wallets/")
+    assert response.status_code == 403
+
+    async_client.force_login(user)
+    response = get(async_client, "/async/wallets/")
+    assert response.status_code == 200
+    assert [wallet["name"] for wallet in response.json()] == ["U1USD1", "U1USD2"]
+
+    response = get(async_client, "/async/wallets/U1USD2/")
+    assert response.status_code == 200
+    assert response.json()["name"] == "U1USD2"
+
+    response = get(async_client, "/async/wallets/U2USD1/")
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_transactions_post_get(async_client, user, user2):
+    """Testing async transaction creation and listing"""
+
+    async_client.force_login(user)
+    response = post(
+        async_client,
+        "/async/transactions/",
+        {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "10"},
+    )
+    assert response.status_code == 201
+    assert response.json()["status"] == "PAID"
+    assert Wallet.objects.get(name="U1USD1").balance == 89
+    assert Wallet.objects.get(name="U2USD1").balance == 110
+
+    response = get(async_client, "/async/transactions/")
+    assert response.status_code == 200
+    page = response.json()
+    assert [transaction["id"] for transaction in page["results"]] == list(
+        Transaction.objects.values_list("id", flat=True)
+    )
+    assert page["next"] is None
+
+
+@pytest.mark.django_db
+def test_async_transactions_post_invalid(async_client, user, user2):
+    """Testing async transaction creation errors"""
+
+    async_client.force_login(user)
+    data = {"sender": "U2USD1", "receiver": "U1USD1", "transfer_amount": "10"}
+    response = post(async_client, "/async/transactions/", data)
+    assert response.status_code == 403
+
+    data = {"sender": "NoWallet", "receiver": "U1USD1", "transfer_amount": "10"}
+    response = post(async_client, "/async/transactions/", data)
+    assert response.status_code == 404
+
+    data = {"sender": "U1USD1", "receiver": "NoWallet", "transfer_amount": "10"}
+    response = post(async_client, "/async/transactions/", data)
+    assert response.status_code == 404
+
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1000"}
+    response = post(async_client, "/async/transactions/", data)
+    assert response.status_code == 400
+
+    response = request(async_client, "delete", "/async/transactions/")
+    assert response.status_code == 405
+
+    assert not Transaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_async_csrf(user):
+    """Async views check CSRF of session users like DRF views,
+    failures are answered with json
+    """
+
+    client = Client(enforce_csrf_checks=True)
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1"}
+    response = client.post("/async/transactions/", data=data)
+    assert response.status_code == 403
+    assert "CSRF" in response.json()["detail"]
+
+    token = "a" * 32
+    client.cookies[settings.CSRF_COOKIE_NAME] = token
+    response = client.post("/async/transactions/", data=data, HTTP_X_CSRFTOKEN=token)
+    assert response.status_code == 201
@@ -0,0 +1,64 @@
+"""Module for testing the benchmark suite on small volumes"""
+
+import pytest
+from django.core.management import CommandError, call_command
+from WalletService.benchmarks import BENCHMARKS, Timings, percentile, run_benchmarks
+
+OPTIONS = {
+    "users": 4,
+    "wallets_per_user": 3,
+    "transactions": 50,
+    "requests": 4,
+    "register_requests": 1,
+    "concurrency": 2,
+    "shards": [0, 2],
+    "settlement_transfers": 20,
+    "settlement_wallets": 5,
+    "batch_size": 8,
+    "fee_amounts": 10,
+    "names": 100,
+    "seed": 0,
+}
+
+
+def summaries(results):
+    """Summaries of timed calls found in nested benchmark results"""
+    if isinstance(results, dict):
+        if "calls" in results:
+            yield results
+        for value in results.values():
+            yield from summaries(value)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_benchmarks():
+    """Every benchmark runs on seeded data without failed calls"""
+
+    results = run_benchmarks(list(BENCHMARKS), OPTIONS)
+    assert set(results) == set(BENCHMARKS)
+    assert results["post_transactions"]["calls"] == 4
+    assert set(results["sharded_credits"]) == {"0", "2"}
+    assert results["settlement"]["netted"]["calls"] == 3
+    assert results["export"]["export"]["rows"] == results["export"]["list"]["rows"]
+    for summary in summaries(results):
+        assert summary["errors"] == 0
+
+
+def test_timings_summary():
+    """Percentiles are nearest rank ones, failed calls are counted"""
+
+    timings = Timings()
+    for index in range(100):
+        timings.call(lambda: index % 10)
+    summary = timings.summary()
+    assert (summary["calls"], summary["errors"]) == (100, 10)
+    assert percentile(list(range(1, 101)), 50) == 50
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile([], 99) == 0
+
+
+def test_unknown_benchmark():
+    """Unknown benchmark names are rejected before the database is set up"""
+
+    with pytest.raises(CommandError):
+        call_command("benchmark", "nothing")
@@ -0,0 +1,138 @@
+"""Module for testing WalletService fee engine"""
+
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from WalletService.fees import (
+    CENT,
+    RATE_STEP,
+    FeeSchedule,
+    amount_with_fee,
+    fee_amount,
+    load_fee_schedules,
+    transfer_fee,
+)
+from WalletService.models import LedgerEntry, Wallet
+from WalletService.services import transfer
+
+RANDOM_AMOUNTS = 200_000
+
+
+def fee_in_cents(amount_cents, rate_steps):
+    """Fee computed with integers: amount in cents * rate in RATE_STEPs,
+    rounded half up to cents"""
+    return (amount_cents * rate_steps + 5000) // 10000
+
+
+def test_fee_amount_random_amounts():
+    """Fees of random amounts and rates of any RATE_STEP are exact cents
+    rounded half up"""
+
+    generator = random.Random(20221018)
+    for _ in range(RANDOM_AMOUNTS):
+        amount_cents = generator.randrange(1, 10**10)
+        rate_steps = generator.randrange(0, 10001)
+        amount = Decimal(amount_cents) * CENT
+        rate = Decimal(rate_steps) * RATE_STEP
+
+        fee = fee_amount(amount, rate)
+        assert fee.as_tuple().exponent == -2
+        assert fee == Decimal(fee_in_cents(amount_cents, rate_steps)) * CENT
+        assert fee == (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        assert amount_with_fee(amount, rate) == amount + fee
+
+
+def test_fee_amount_halves():
+    """Half a cent is rounded up"""
+
+    assert fee_amount(Decimal("0.05"), Decimal("0.10")) == Decimal("0.01")
+    assert fee_amount(Decimal("0.04"), Decimal("0.10")) == Decimal("0.00")
+    assert fee_amount(Decimal("10.05"), Decimal("0.10")) == Decimal("1.01")
+    assert amount_with_fee(Decimal("10.05"), Decimal("0.10")) == Decimal("11.06")
+
+
+def test_fee_rate_places():
+    """Rates have up to 4 decimal places, fees are still whole cents"""
+
+    schedule = FeeSchedule("USD", "0.0025", [("0", "0.015")])
+    assert schedule.rate(Decimal("10"), same_owner=True) == Decimal("0.0025")
+    assert schedule.rate(Decimal("10"), same_owner=False) == Decimal("0.015")
+    assert fee_amount(Decimal("99.99"), Decimal("0.015")) == Decimal("1.50")
+    assert fee_amount(Decimal("10.00"), Decimal("0.0025")) == Decimal("0.03")
+
+
+def test_fee_schedule_bands():
+    """Cross owner rate is chosen by volume band of the transfer amount"""
+
+    schedule = FeeSchedule(
+        "USD", "0.01", [("1000.00", "0.05"), ("0.00", "0.10"), ("10000", "0.02")]
+    )
+    assert schedule.rate(Decimal("5000"), same_owner=True) == Decimal("0.01")
+    assert schedule.rate(Decimal("0.01"), same_owner=False) == Decimal("0.10")
+    assert schedule.rate(Decimal("999.99"), same_owner=False) == Decimal("0.10")
+    assert schedule.rate(Decimal("1000.00"), same_owner=False) == Decimal("0.05")
+    assert schedule.rate(Decimal("10000.00"), same_owner=False) == Decimal("0.02")
+
+
+@pytest.mark.parametrize(
+    "same_owner, cross_owner",
+    [
+        ("0.00015", [("0", "0.10")]),
+        ("0", [("0.001", "0.10")]),
+        ("0", [("100", "0.10")]),
+        ("0", [("0", "-0.10")]),
+        ("0", [("0", "ten")]),
+        ("0", []),
+    ],
+)
+def test_fee_schedule_invalid(same_owner, cross_owner):
+    """Misconfigured schedules are rejected on load"""
+
+    with pytest.raises(ImproperlyConfigured):
+        FeeSchedule("USD", same_owner, cross_owner)
+
+
+@pytest.fixture
+def eur_fees():
+    """Fee schedule of EUR only, with same owner fee and two volume bands"""
+
+    fees = {
+        "EUR": {"same_owner": "0.01", "cross_owner": [("0", "0.05"), ("100", "0.03")]}
+    }
+    with override_settings(TRANSFER_FEES=fees):
+        load_fee_schedules()
+        yield
+    load_fee_schedules()
+
+
+@pytest.mark.django_db
+def test_transfer_fee_by_schedule(eur_fees):
+    """Transfers are charged by schedule of the sender wallet currency"""
+
+    user = User.objects.create(username="username")
+    user2 = User.objects.create(username="username2")
+    eur1, eur2, eur3, usd1, usd2 = [
+        Wallet.objects.create(
+            name=name, type="Visa", currency=currency, balance=1000, user=owner
+        )
+        for name, currency, owner in [
+            ("U1EUR1", "EUR", user),
+            ("U1EUR2", "EUR", user),
+            ("U2EUR1", "EUR", user2),
+            ("U1USD1", "USD", user),
+            ("U2USD1", "USD", user2),
+        ]
+    ]
+    assert transfer_fee(eur1, eur2, Decimal("500")) == Decimal("0.01")
+    assert transfer_fee(eur1, eur3, Decimal("50")) == Decimal("0.05")
+    assert transfer_fee(eur1, eur3, Decimal("500")) == Decimal("0.03")
+    # currencies without a schedule are charged the default fee
+    assert transfer_fee(usd1, usd2, Decimal("500")) == Decimal("0.10")
+
+    transfer(eur1, eur3, Decimal("33.30"))
+    assert Wallet.objects.get(name="U1EUR1").balance == Decimal("965.03")
+    assert LedgerEntry.objects.get(kind="FEE").amount == Decimal("1.67")
@@ -0,0 +1,151 @@
+"""Module for testing cross-currency transfers and cached exchange rates"""
+
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from WalletService.fx import rate_cache
+from WalletService.models import ExchangeRate, LedgerEntry, Transaction, Wallet
+
+
+def write_rates(path, rows):
+    """Writes a csv file of exchange rates"""
+    path.write_text("base,quote,rate\n" + "".join(f"{row}\n" for row in rows))
+    return str(path)
+
+
+@pytest.fixture
+def rates(tmp_path):
+    """Exchange rates of USD loaded from a file"""
+
+    rate_cache.clear()
+    path = write_rates(tmp_path / "rates.csv", ["USD,EUR,0.98765432", "USD,RUB,60.5"])
+    call_command("load_exchange_rates", path, stdout=StringIO())
+    yield tmp_path
+    rate_cache.clear()
+
+
+@pytest.fixture
+def user():
+    """User with wallets in every currency"""
+
+    user = User.objects.create(username="username")
+    for name, currency in (("U1USD1", "USD"), ("U1EUR1", "EUR"), ("U1RUB1", "RUB")):
+        Wallet.objects.create(
+            name=name, type="Visa", currency=currency, balance=100, user=user
+        )
+    return user
+
+
+@pytest.fixture
+def user2():
+    """Second user with a EUR wallet"""
+
+    user = User.objects.create(username="username2")
+    Wallet.objects.create(name="U2EUR1", type="Visa", currency="EUR", user=user)
+    return user
+
+
+def fx_queries(queries):
+    """Queries of a captured context which read exchange rates"""
+    return [query for query in queries if "exchangerate" in query["sql"].lower()]
+
+
+@pytest.mark.django_db
+def test_cross_currency_transfer(client, rates, user, user2):
+    """Receiver is credited in its currency, ledger stays balanced per currency"""
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U2EUR1", "transfer_amount": "10.05"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 201
+    body = response.json()
+    assert Decimal(body["exchange_rate"]) == Decimal("0.98765432")
+    assert Decimal(body["received_amount"]) == Decimal("9.93")
+
+    assert Wallet.objects.get(name="U1USD1").balance == Decimal("88.94")
+    assert Wallet.objects.get(name="U2EUR1").balance == Decimal("9.93")
+    postings = (
+        LedgerEntry.objects.filter(transaction=body["id"])
+        .values("currency")
+        .annotate(total=Sum("amount"))
+        .values_list("currency", "total")
+    )
+    assert dict(postings) == {"USD": 0, "EUR": 0}
+
+    response = client.post(
+        "/transactions/bulk/",
+        data=[{"sender": "U1USD1", "receiver": "U1RUB1", "transfer_amount": "1"}],
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    assert Wallet.objects.get(name="U1RUB1").balance == Decimal("160.50")
+
+
+@pytest.mark.django_db
+def test_missing_exchange_rate(client, rates, user, user2):
+    """Transfers without a rate between currencies are rejected"""
+
+    client.force_login(user)
+    data = {"sender": "U1EUR1", "receiver": "U1USD1", "transfer_amount": "10"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 400
+    assert response.json() == {"non_field_errors": ["No exchange rate from EUR to USD"]}
+
+    response = client.post(
+        "/transactions/bulk/", data=[data], content_type="application/json"
+    )
+    assert response.json()[0]["error"] == "No exchange rate from EUR to USD"
+    assert not Transaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rates_cache(client, settings, rates, user, user2):
+    """Rates are read from memory, reloaded only when the table version changes"""
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U2EUR1", "transfer_amount": "10"}
+    client.post("/transactions/", data=data)
+    with CaptureQueriesContext(connection) as context:
+        assert client.post("/transactions/", data=data).status_code == 201
+    assert fx_queries(context) == []
+
+    # another process loads new rates, this one notices after TTL
+    ExchangeRate.objects.update(rate=2, version=2)
+    client.post("/transactions/", data=data)
+    assert Transaction.objects.last().received_amount == Decimal("9.88")
+
+    settings.FX_RATES_TTL = 0
+    with CaptureQueriesContext(connection) as context:
+        client.post("/transactions/", data=data)
+    assert len(fx_queries(context)) == 3
+    assert Transaction.objects.last().received_amount == 20
+
+    with CaptureQueriesContext(connection) as context:
+        client.post("/transactions/", data=data)
+    # only the version is checked while it's the same
+    assert len(fx_queries(context)) == 2
+
+
+@pytest.mark.django_db
+def test_load_exchange_rates(rates):
+    """Loading replaces the rate table, invalid files are rejected"""
+
+    path = write_rates(rates / "new.csv", ["EUR,USD,1.01"])
+    call_command("load_exchange_rates", path, stdout=StringIO())
+    assert list(ExchangeRate.objects.values_list("base", "quote", "version")) == [
+        ("EUR", "USD", 2)
+    ]
+
+    for row in ["USD,USD,1", "USD,GBP,1", "USD,EUR,0", "USD,EUR,one"]:
+        path = write_rates(rates / "invalid.csv", [row])
+        with pytest.raises(CommandError):
+            call_command("load_exchange_rates", path, stdout=StringIO())
+    with pytest.raises(CommandError):
+        call_command("load_exchange_rates", str(rates / "missing.csv"))
+    assert ExchangeRate.objects.count() == 1
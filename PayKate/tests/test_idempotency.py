@@ -0,0 +1,132 @@
+"""Module for testing /transactions api requests with Idempotency-Key header"""
+
+import threading
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from WalletService.models import IdempotencyKey, Transaction, Wallet
+
+transfer = {"receiver": "U1USD2", "sender": "U1USD1", "transfer_amount": 10}
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user
+        )
+    return user
+
+
+@pytest.mark.django_db
+def test_idempotent_transaction_replay(client, user):
+    """Retried request is answered with the stored response"""
+
+    client.force_login(user)
+    response = client.post("/transactions/", data=transfer, HTTP_IDEMPOTENCY_KEY="k1")
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+    replayed = client.post("/transactions/", data=transfer, HTTP_IDEMPOTENCY_KEY="k1")
+    assert replayed.status_code == 201
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert replayed.json() == response.json()
+
+    assert Transaction.objects.count() == 1
+    assert Wallet.objects.get(name="U1USD1").balance == 90
+
+
+@pytest.mark.django_db
+def test_idempotent_transaction_key_reuse(client, user):
+    """Key can't be reused for another request, but can be by another user"""
+
+    client.force_login(user)
+    client.post("/transactions/", data=transfer, HTTP_IDEMPOTENCY_KEY="k1")
+    response = client.post(
+        "/transactions/",
+        data={**transfer, "transfer_amount": 20},
+        HTTP_IDEMPOTENCY_KEY="k1",
+    )
+    assert response.status_code == 422
+
+    user2 = User.objects.create(username="username2")
+    for name in ("U2USD1", "U2USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user2
+        )
+    client.force_login(user2)
+    response = client.post(
+        "/transactions/",
+        data={"receiver": "U2USD2", "sender": "U2USD1", "transfer_amount": 10},
+        HTTP_IDEMPOTENCY_KEY="k1",
+    )
+    assert response.status_code == 201
+    assert Transaction.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_idempotent_transaction_failure_not_stored(client, user):
+    """Failed request is not stored and can be retried"""
+
+    client.force_login(user)
+    response = client.post(
+        "/transactions/",
+        data={**transfer, "transfer_amount": 1000},
+        HTTP_IDEMPOTENCY_KEY="k1",
+    )
+    assert response.status_code == 400
+    assert not IdempotencyKey.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_idempotent_transaction_concurrent_duplicates(user):
+    """Parallel duplicates make exactly one transaction"""
+
+    threads_number = 6
+    barrier = threading.Barrier(threads_number)
+    responses = []
+
+    def send():
+        """Sends the same request as other threads at the same time"""
+        client = Client()
+        client.force_login(user)
+        try:
+            barrier.wait()
+            responses.append(
+                client.post("/transactions/", data=transfer, HTTP_IDEMPOTENCY_KEY="k1")
+            )
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=send) for _ in range(threads_number)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [201] * threads_number
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert Transaction.objects.count() == 1
+    assert Wallet.objects.get(name="U1USD1").balance == 90
+
+
+@pytest.mark.django_db
+def test_purge_idempotency_keys(user):
+    """Only expired keys are deleted"""
+
+    for key in ("old1", "old2", "new"):
+        IdempotencyKey.objects.create(user=user, key=key, request_hash="")
+    IdempotencyKey.objects.exclude(key="new").update(
+        created_on=timezone.now() - timedelta(hours=25)
+    )
+
+    call_command("purge_idempotency_keys", chunk_size=1)
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["new"]
@@ -0,0 +1,106 @@
+"""Module for testing the double-entry ledger of wallet balances"""
+
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from WalletService.models import LedgerEntry, Transaction, Wallet
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user
+        )
+    return user
+
+
+@pytest.fixture
+def user2():
+    """Second user with a wallet fixture"""
+
+    user = User.objects.create(username="username2")
+    Wallet.objects.create(name="U2USD1", type="Visa", currency="USD", user=user)
+    return user
+
+
+def make_transfers(client):
+    """Makes single and bulk transfers between fixture wallets through the api"""
+    transfers = [
+        {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "10"},
+        {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "20"},
+    ]
+    for transfer in transfers:
+        response = client.post("/transactions/", data=transfer)
+        assert response.status_code == 201
+    response = client.post(
+        "/transactions/bulk/",
+        data=[
+            {"sender": "U1USD2", "receiver": "U1USD1", "transfer_amount": "5"},
+            {"sender": "U1USD2", "receiver": "U2USD1", "transfer_amount": "7.5"},
+        ],
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+
+
+def ledger_balances():
+    """Sums of wallet postings by wallet name"""
+    return dict(
+        LedgerEntry.objects.filter(wallet__isnull=False)
+        .values("wallet")
+        .annotate(balance=Sum("amount"))
+        .values_list("wallet__name", "balance")
+    )
+
+
+@pytest.mark.django_db
+def test_opening_entries(user, user2):
+    """Wallets created with funds get an opening posting"""
+
+    assert list(LedgerEntry.objects.values_list("wallet__name", "kind", "amount")) == [
+        ("U1USD1", "OPENING", 100),
+        ("U1USD2", "OPENING", 100),
+    ]
+
+
+@pytest.mark.django_db
+def test_ledger_matches_balances(client, user, user2):
+    """Balances equal sums of postings, every transaction is balanced"""
+
+    client.force_login(user)
+    make_transfers(client)
+
+    assert ledger_balances() == dict(Wallet.objects.values_list("name", "balance"))
+    for transaction_ in Transaction.objects.all():
+        postings = transaction_.ledger_entries.aggregate(total=Sum("amount"))
+        assert postings["total"] == 0
+
+    fees = LedgerEntry.objects.filter(kind="FEE")
+    assert fees.filter(wallet__isnull=False).count() == 0
+    assert fees.aggregate(total=Sum("amount"))["total"] == Decimal("2.75")
+
+
+@pytest.mark.django_db
+def test_rebuild_balances(client, user, user2):
+    """Drifted cached balances are reported by --check and fixed by a rebuild"""
+
+    client.force_login(user)
+    make_transfers(client)
+    expected = dict(Wallet.objects.values_list("name", "balance"))
+    Wallet.objects.filter(name="U1USD2").update(balance=1000)
+
+    out = StringIO()
+    call_command("rebuild_balances", check=True, stdout=out)
+    assert "Found 1 mismatched balances" in out.getvalue()
+    assert Wallet.objects.get(name="U1USD2").balance == 1000
+
+    call_command("rebuild_balances", chunk_size=1, stdout=StringIO())
+    assert dict(Wallet.objects.values_list("name", "balance")) == expected
@@ -0,0 +1,113 @@
+"""Module for testing request metrics middleware and the metrics endpoint"""
+
+import logging
+import re
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from WalletService.metrics import MetricsRegistry, registry
+from WalletService.models import Wallet
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    """Starts every test with empty metrics"""
+    registry.clear()
+    yield
+    registry.clear()
+
+
+@pytest.fixture
+def user():
+    """User with a wallet fixture"""
+
+    user = User.objects.create(username="username")
+    Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=100, user=user
+    )
+    return user
+
+
+@pytest.fixture
+def admin():
+    """Staff user fixture"""
+    return User.objects.create(username="admin", is_staff=True)
+
+
+def sample(body, name, view):
+    """Value of a metric sample of an endpoint in rendered metrics"""
+    match = re.search(rf'^{name}{{view="{re.escape(view)}"}} (\S+)$', body, re.M)
+    return float(match.group(1)) if match else None
+
+
+@pytest.mark.django_db
+def test_metrics_permissions(client, user, admin):
+    """Metrics are shown to admins only"""
+
+    assert client.get("/metrics/").status_code == 403
+    client.force_login(user)
+    assert client.get("/metrics/").status_code == 403
+
+    client.force_login(admin)
+    response = client.get("/metrics/")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+
+
+@pytest.mark.django_db
+def test_request_metrics(client, user, admin):
+    """Query count of every request is recorded by endpoint route"""
+
+    client.force_login(user)
+    with CaptureQueriesContext(connection) as context:
+        assert client.get("/wallets/").status_code == 200
+        assert client.get("/wallets/").status_code == 200
+    # captured queries are read before next request resets the queries log
+    queries = len(context)
+    client.get("/async/wallets/U1USD1/")
+    client.get("/nowhere/")
+
+    client.force_login(admin)
+    body = client.get("/metrics/").content.decode()
+    assert sample(body, "http_request_queries_count", "wallets/") == 2
+    assert sample(body, "http_request_queries_sum", "wallets/") == queries
+    assert sample(body, "http_request_duration_seconds_count", "wallets/") == 2
+    assert sample(body, "http_request_serializer_seconds_sum", "wallets/") > 0
+    assert sample(body, "http_request_queries_sum", "async/wallets/<str:name>/") > 0
+    assert sample(body, "http_request_queries_count", "unresolved") == 1
+    assert "# TYPE http_request_db_seconds histogram" in body
+    assert 'http_request_queries_bucket{view="wallets/",le="+Inf"} 2' in body
+
+
+@pytest.mark.django_db
+def test_query_budget(client, settings, caplog, user):
+    """Requests over the query budget are logged"""
+
+    client.force_login(user)
+    settings.QUERY_BUDGET = 1
+    with caplog.at_level(logging.WARNING, logger="WalletService.metrics"):
+        client.get("/wallets/")
+    assert "GET wallets/ made" in caplog.text
+
+    caplog.clear()
+    settings.QUERY_BUDGET = 0
+    with caplog.at_level(logging.WARNING, logger="WalletService.metrics"):
+        client.get("/wallets/")
+    assert caplog.text == ""
+
+
+def test_histogram_buckets():
+    """Buckets are cumulative, values on a bound fall into its bucket"""
+
+    metrics = MetricsRegistry()
+    for queries in (1, 2, 3, 1000):
+        metrics.observe("view", {"http_request_queries": queries})
+    body = metrics.render()
+    buckets = re.findall(
+        r'http_request_queries_bucket\{view="view",le="([^"]+)"\} (\d+)', body
+    )
+    assert buckets[:4] == [("1", "1"), ("2", "2"), ("5", "3"), ("10", "3")]
+    assert buckets[-1] == ("+Inf", "4")
+    assert sample(body, "http_request_queries_sum", "view") == 1006
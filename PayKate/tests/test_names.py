@@ -0,0 +1,98 @@
+"""Module for testing wallet name generation"""
+
+import string
+
+import pytest
+from django.contrib.auth.models import User
+from WalletService.models import Wallet, WalletNameBlock
+from WalletService.names import (
+    BLOCK_SIZE,
+    BlockNames,
+    WalletNameGenerator,
+    WalletNamesExhausted,
+    has_valid_check_char,
+)
+
+BLOCKS = 45
+
+
+def test_names_unique():
+    """Millions of names of consecutive blocks don't collide"""
+
+    names = set()
+    for block in range(1, BLOCKS + 1):
+        names.update(BlockNames(block, key="key"))
+    assert len(names) == BLOCKS * BLOCK_SIZE > 2_000_000
+
+
+def test_block_names():
+    """Names of a block share its prefix, are shuffled by key and checksummed"""
+
+    block = BlockNames(37, key="key")
+    names = [block.name(position) for position in range(100)]
+    assert all(name.startswith("A011") for name in names)
+    assert all(has_valid_check_char(name) for name in names)
+    assert names != sorted(names)
+    assert names != [
+        BlockNames(37, key="other").name(position) for position in range(100)
+    ]
+
+    with pytest.raises(WalletNamesExhausted):
+        BlockNames(26 * 36**3, key="key")
+
+
+def test_check_char():
+    """Any mistyped character makes a name invalid"""
+
+    name = BlockNames(1, key="key").name(0)
+    for index, typed in enumerate(name):
+        for char in string.digits + string.ascii_uppercase:
+            if char != typed:
+                mistyped = list(name)
+                mistyped[index] = char
+                assert not has_valid_check_char("".join(mistyped))
+    assert not has_valid_check_char(name.lower())
+    assert not has_valid_check_char(name[:-1])
+
+
+@pytest.mark.django_db
+def test_generator_skips_taken_names(django_assert_num_queries):
+    """Blocks are allocated with one insert, names taken before are skipped"""
+
+    user = User.objects.create(username="username")
+    generator = WalletNameGenerator()
+    # block insert and the query of names taken in the block
+    with django_assert_num_queries(2):
+        first = generator.next_name()
+    with django_assert_num_queries(0):
+        generator.names(100)
+    block = WalletNameBlock.objects.latest("pk").pk
+    assert first == BlockNames(block).name(0)
+
+    next_block = BlockNames(block + 1)
+    for position in (0, 2):
+        Wallet.objects.create(
+            name=next_block.name(position), type="Visa", currency="USD", user=user
+        )
+    generator = WalletNameGenerator()
+    assert generator.names(3) == [next_block.name(position) for position in (1, 3, 4)]
+
+    names = generator.names(2 * BLOCK_SIZE)
+    assert len(set(names)) == 2 * BLOCK_SIZE
+
+
+@pytest.mark.django_db
+def test_created_wallet_names(client):
+    """Wallets created through the api get generated names"""
+
+    user = User.objects.create(username="username")
+    client.force_login(user)
+    names = [
+        client.post("/wallets/", data={"type": "Visa", "currency": "USD"}).json()[
+            "name"
+        ]
+        for _ in range(3)
+    ]
+    assert len(set(names)) == 3
+    assert all(has_valid_check_char(name) for name in names)
+    assert len({name[:4] for name in names}) == 1
@@ -0,0 +1,85 @@
+"""Module for testing password hashing of registrations"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import (
+    CommonPasswordValidator,
+    get_default_password_validators,
+)
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from WalletService.passwords import (
+    HashingPool,
+    PasswordHashingBusy,
+    hashing_pool,
+    preload_password_validators,
+    reset_hashing_pool,
+)
+
+DATA = {
+    "username": "username",
+    "password": "Password-2022",
+    "password2": "Password-2022",
+}
+
+
+@pytest.fixture
+def small_pool(settings):
+    """Hashing pool of one worker without a queue"""
+
+    settings.PASSWORD_HASHING_WORKERS = 1
+    settings.PASSWORD_HASHING_QUEUE = 0
+    reset_hashing_pool()
+    yield hashing_pool()
+    reset_hashing_pool()
+
+
+@pytest.mark.django_db
+def test_register_hashes_in_pool(client, small_pool):
+    """User is inserted at once with a hash made by the pool"""
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.post("/register/", data=DATA)
+    assert response.status_code == 201
+    assert [query["sql"].split()[0] for query in context.captured_queries] == [
+        "SELECT",
+        "INSERT",
+    ]
+    assert User.objects.get(username="username").check_password("Password-2022")
+
+
+@pytest.mark.django_db
+def test_register_backpressure(client, small_pool):
+    """Registrations finding the pool busy are answered with 503"""
+
+    assert small_pool.slots.acquire(timeout=0)
+    try:
+        response = client.post("/register/", data=DATA)
+    finally:
+        small_pool.slots.release()
+    assert response.status_code == 503
+    assert response["Retry-After"] == "1"
+    assert not User.objects.exists()
+
+    assert client.post("/register/", data=DATA).status_code == 201
+
+
+def test_hashing_pool():
+    """Pool hashes passwords, rejects them once its slots are taken"""
+
+    pool = HashingPool(1, 1)
+    hashed = pool.hash("Password-2022")
+    assert User(password=hashed).check_password("Password-2022")
+    assert pool.slots.acquire(timeout=0) and pool.slots.acquire(timeout=0)
+    with pytest.raises(PasswordHashingBusy):
+        pool.hash("Password-2022")
+    pool.shutdown()
+
+
+def test_preloaded_validators():
+    """Validators are the cached ones, with common passwords loaded"""
+
+    validators = preload_password_validators()
+    assert validators is get_default_password_validators()
+    common = [item for item in validators if isinstance(item, CommonPasswordValidator)]
+    assert "password" in common[0].passwords
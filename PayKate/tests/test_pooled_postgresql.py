@@ -0,0 +1,168 @@
+"""Module for testing the pooled PostgreSQL backend with stubbed connections"""
+
+import pytest
+from WalletService.pooling import ConnectionPool
+
+psycopg2 = pytest.importorskip("psycopg2")
+extensions = pytest.importorskip("psycopg2.extensions")
+base = pytest.importorskip("WalletService.pooled_postgresql.base")
+
+
+class StubCursor:
+    """Cursor of a stub connection, failing if the connection is broken"""
+
+    def __init__(self, connection):
+        """Cursor of the connection"""
+        self.connection = connection
+
+    def __enter__(self):
+        """Cursor used as a context manager"""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Nothing to close"""
+
+    def execute(self, sql):
+        """Records a query, raises like psycopg2 on a broken connection"""
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.connection.queries.append(sql)
+
+
+class StubConnection:
+    """psycopg2 connection with a transaction status, recording its calls"""
+
+    isolation_level = extensions.ISOLATION_LEVEL_READ_COMMITTED
+
+    def __init__(self, status=extensions.TRANSACTION_STATUS_IDLE):
+        """Open connection in the transaction status"""
+        self.status = status
+        self.closed = 0
+        self.broken = False
+        self.queries = []
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        """Status like psycopg2 reports it"""
+        return self.status
+
+    def rollback(self):
+        """Ends the transaction"""
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        """New cursor"""
+        return StubCursor(self)
+
+    def close(self):
+        """Closes the connection"""
+        self.closed = 1
+
+
+@pytest.fixture
+def pool():
+    """Pool of stub connections with the checks of the backend"""
+
+    pool = ConnectionPool(
+        StubConnection, base.check_connection, base.reset_connection, max_size=2
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def wrapper(monkeypatch, pool):
+    """Database wrapper borrowing stub connections from the pool"""
+
+    monkeypatch.setattr(base.DatabaseWrapper, "get_pool", lambda self, params: pool)
+    settings_dict = {
+        "NAME": "paykate",
+        "USER": "",
+        "PASSWORD": "",
+        "HOST": "",
+        "PORT": "",
+        "OPTIONS": {},
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": False,
+        "AUTOCOMMIT": True,
+        "ATOMIC_REQUESTS": False,
+        "TIME_ZONE": None,
+    }
+    return base.DatabaseWrapper(settings_dict, "pooled")
+
+
+@pytest.mark.parametrize(
+    "status, rollbacks",
+    [
+        (extensions.TRANSACTION_STATUS_IDLE, 0),
+        (extensions.TRANSACTION_STATUS_INTRANS, 1),
+        (extensions.TRANSACTION_STATUS_INERROR, 1),
+    ],
+)
+def test_reset_connection(status, rollbacks):
+    """Transactions left open are rolled back, the connection is reusable"""
+
+    connection = StubConnection(status)
+    assert base.reset_connection(connection)
+    assert connection.rollbacks == rollbacks
+    assert connection.status == extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_reset_lost_connection():
+    """Closed connections and ones of unknown status aren't reusable"""
+
+    assert not base.reset_connection(
+        StubConnection(extensions.TRANSACTION_STATUS_UNKNOWN)
+    )
+    connection = StubConnection()
+    connection.close()
+    assert not base.reset_connection(connection)
+
+
+def test_check_connection():
+    """Checked connections answer a query, which doesn't leave a transaction"""
+
+    connection = StubConnection(extensions.TRANSACTION_STATUS_INTRANS)
+    base.check_connection(connection)
+    assert connection.queries == ["SELECT 1"]
+    assert connection.rollbacks == 1
+
+    connection.broken = True
+    with pytest.raises(psycopg2.OperationalError):
+        base.check_connection(connection)
+
+
+def test_close_returns_connection(wrapper, pool):
+    """Closing the wrapper returns its connection to the pool, rolled back"""
+
+    connection = wrapper.get_new_connection({})
+    assert wrapper.pooled.connection is connection
+    connection.status = extensions.TRANSACTION_STATUS_INTRANS
+    wrapper._close()
+    assert wrapper.pooled is None
+    assert connection.rollbacks == 1 and not connection.closed
+    assert pool.stats()["idle"] == 1
+    assert wrapper.get_new_connection({}) is connection
+
+
+def test_close_discards_broken_connection(wrapper, pool):
+    """Connections which can't be reset are closed instead of being reused"""
+
+    connection = wrapper.get_new_connection({})
+    connection.status = extensions.TRANSACTION_STATUS_UNKNOWN
+    wrapper._close()
+    assert connection.closed
+    assert pool.stats() == {"size": 0, "idle": 0, "opened": 1, "closed": 1, "waits": 0}
+    assert wrapper.get_new_connection({}) is not connection
+
+
+def test_idle_connection_is_checked(wrapper, pool):
+    """Connections idle for check_interval are checked before reuse"""
+
+    pool.check_interval = 0
+    connection = wrapper.get_new_connection({})
+    wrapper._close()
+    connection.broken = True
+    assert wrapper.get_new_connection({}) is not connection
+    assert connection.closed
@@ -0,0 +1,118 @@
+"""Module for testing the database connection pool"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from WalletService.pooling import ConnectionPool, PoolTimeout
+
+
+def connect():
+    """Connection to an in-memory database"""
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def check(connection):
+    """Raises if a connection doesn't answer a query"""
+    connection.execute("SELECT 1")
+
+
+def reset(connection):
+    """Rolls back a returned connection"""
+    connection.rollback()
+    return True
+
+
+def make_pool(**options):
+    """Pool of in-memory sqlite connections"""
+    return ConnectionPool(connect, check, reset, **options)
+
+
+def test_connections_are_reused():
+    """Returned connections are given out again, most recently used first"""
+
+    pool = make_pool(min_size=2, max_size=4)
+    pool.fill()
+    assert pool.stats() == {"size": 2, "idle": 2, "opened": 2, "closed": 0, "waits": 0}
+    first = pool.get()
+    pool.get()
+    third = pool.get()
+    assert pool.stats()["opened"] == 3
+    pool.put(third)
+    pool.put(first)
+    assert pool.get() is first
+    assert pool.stats()["opened"] == 3
+    pool.close()
+
+
+def test_pool_size_and_timeout():
+    """At most max_size connections are given out, others wait or time out"""
+
+    pool = make_pool(max_size=2, timeout=0.05)
+    first = pool.get()
+    pool.get()
+    with pytest.raises(PoolTimeout):
+        pool.get()
+    threading.Timer(0.01, pool.put, args=(first,)).start()
+    pool.timeout = 5
+    assert pool.get() is first
+    assert pool.stats()["waits"] == 2
+
+    pool = make_pool(max_size=3)
+    in_use, peak, lock = [0], [0], threading.Lock()
+
+    def borrow():
+        """Borrows connections over and over"""
+        for _ in range(50):
+            pooled = pool.get()
+            with lock:
+                in_use[0] += 1
+                peak[0] = max(peak[0], in_use[0])
+            pooled.connection.execute("SELECT 1")
+            with lock:
+                in_use[0] -= 1
+            pool.put(pooled)
+
+    threads = [threading.Thread(target=borrow) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 3
+    assert pool.stats()["opened"] <= 3
+
+
+def test_unusable_connections_are_replaced():
+    """Old, broken and dirty connections are closed instead of given out"""
+
+    pool = make_pool(check_interval=0)
+    pooled = pool.get()
+    pool.put(pooled)
+    pooled.connection.close()
+    replacement = pool.get()
+    assert replacement is not pooled
+    assert pool.stats()["closed"] == 1
+
+    pool.reset = lambda connection: False
+    pool.put(replacement)
+    assert pool.stats() == {"size": 0, "idle": 0, "opened": 2, "closed": 2, "waits": 0}
+
+    pool = make_pool(max_lifetime=0.01)
+    pooled = pool.get()
+    time.sleep(0.02)
+    pool.put(pooled)
+    assert pool.get() is not pooled
+
+
+def test_idle_connections_are_closed():
+    """Connections idle for max_idle are closed down to min_size"""
+
+    pool = make_pool(min_size=1, max_idle=0.01)
+    connections = [pool.get() for _ in range(3)]
+    for pooled in connections:
+        pool.put(pooled)
+    time.sleep(0.02)
+    pool.put(pool.get())
+    assert pool.stats()["idle"] == 1
+    assert pool.stats()["size"] == 1
@@ -0,0 +1,165 @@
+"""Module for testing routing of reads to replica databases"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from WalletService import routers
+from WalletService.models import Wallet
+from WalletService.tokens import issue_tokens
+
+
+@pytest.fixture
+def databases(settings, tmp_path):
+    """Replica aliases: one of the test database, one which can't connect"""
+
+    default = connections["default"].settings_dict
+    connections.settings["replica"] = {**default}
+    connections.settings["broken"] = {**default, "NAME": str(tmp_path / "none" / "db")}
+    settings.REPLICA_DATABASES = ["replica"]
+    routers._down.clear()
+    cache.clear()
+    yield
+    for alias in ("replica", "broken"):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+    routers._down.clear()
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=10, user=user
+        )
+    return user
+
+
+def tables(context):
+    """Tables read by captured queries"""
+    return " ".join(query["sql"] for query in context.captured_queries)
+
+
+def get(client, path, **extra):
+    """Gets a path, returns captured queries of the primary and of the replica"""
+    with CaptureQueriesContext(connections["default"]) as primary:
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            assert client.get(path, **extra).status_code == 200
+    return tables(primary), tables(replica)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_go_to_replica(client, databases, user):
+    """Read routes are served by the replica, other routes by the primary"""
+
+    client.force_login(user)
+    for path in ("/wallets/", "/transactions/", "/transactions/U1USD1/"):
+        primary, replica = get(client, path)
+        assert "WalletService_wallet" in replica
+        # the session is read before routing, to find out whether it's pinned
+        assert "WalletService_wallet" not in primary
+    primary, replica = get(client, "/wallets/U1USD1/")
+    assert "WalletService_wallet" in primary and replica == ""
+    assert client.get("/async/wallets/").status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_your_writes(client, settings, databases, user):
+    """Users read from the primary for a while after writing"""
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1"}
+    assert client.post("/transactions/", data=data).status_code == 201
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in primary and replica == ""
+
+    # pins are per user, failed writes don't pin, pins expire
+    other = Client()
+    other.force_login(user)
+    primary, replica = get(other, "/wallets/")
+    assert "WalletService_wallet" in primary and replica == ""
+
+    cache.clear()
+    del client.cookies[routers.PIN_COOKIE]
+    data["transfer_amount"] = "1000"
+    assert client.post("/transactions/", data=data).status_code == 400
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in replica
+
+    settings.READ_YOUR_WRITES_SECONDS = 0
+    data["transfer_amount"] = "1"
+    client.post("/transactions/", data=data)
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in replica
+
+
+@pytest.mark.django_db(transaction=True)
+def test_token_users_are_pinned(client, databases, user):
+    """Users of bearer tokens are pinned by the token subject"""
+
+    header = {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user)['access']}"}
+    primary, replica = get(client, "/wallets/", **header)
+    assert "WalletService_wallet" in replica and primary == ""
+    data = {"type": "Visa", "currency": "EUR"}
+    assert client.post("/wallets/", data=data, **header).status_code == 201
+    assert routers.PIN_COOKIE not in client.cookies
+    # clients without a cookie jar and other clients of the user are pinned
+    for reader in (Client(), client):
+        primary, replica = get(reader, "/wallets/", **header)
+        assert "WalletService_wallet" in primary and replica == ""
+    primary, replica = get(client, "/async/wallets/", **header)
+    assert "WalletService_wallet" in primary and replica == ""
+
+    cache.clear()
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1"}
+    response = client.post("/async/transactions/", data=data, **header)
+    assert response.status_code == 201
+    primary, replica = get(Client(), "/wallets/", **header)
+    assert "WalletService_wallet" in primary and replica == ""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_unavailable(client, settings, databases, user):
+    """Reads fall back to the primary when replicas can't be connected to"""
+
+    settings.REPLICA_DATABASES = ["broken"]
+    client.force_login(user)
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in primary
+    assert "broken" in routers._down
+
+    settings.REPLICA_DATABASES = ["broken", "replica"]
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in replica
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pin_cookie(client, databases, user):
+    """Session clients also get signed cookies of the user, pinning them
+    while the cache entry is missing
+    """
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1"}
+    assert client.post("/transactions/", data=data).status_code == 201
+    cookie = client.cookies[routers.PIN_COOKIE]
+    assert cookie["httponly"] and cookie.value != str(user.pk)
+    cache.clear()
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in primary and replica == ""
+
+    # a pin of another user or a forged one is ignored
+    other = User.objects.create(username="username2")
+    client.force_login(other)
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in replica
+    client.force_login(user)
+    client.cookies[routers.PIN_COOKIE] = str(user.pk)
+    primary, replica = get(client, "/wallets/")
+    assert "WalletService_wallet" in replica
@@ -0,0 +1,63 @@
+"""Module for testing the seed_wallets load test data command"""
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from WalletService.models import LedgerEntry, Transaction, Wallet, WalletCounter
+from WalletService.services import transfer
+
+
+def seed(**options):
+    """Runs the command with small volumes"""
+    options = {"users": 50, "transactions": 2000, "chunk_size": 300, **options}
+    out = StringIO()
+    call_command("seed_wallets", stdout=out, **options)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_seed_wallets():
+    """Seeded balances are sums of ledger postings, receivers follow a power law"""
+
+    out = seed()
+    assert "WalletService_transaction: 2000 rows" in out
+    assert "rows/s" in out
+    assert User.objects.count() == 50
+    assert Wallet.objects.count() == 100
+    assert set(WalletCounter.objects.values_list("wallets", flat=True)) == {2}
+
+    postings = defaultdict(Decimal)
+    for wallet_id, amount in LedgerEntry.objects.values_list("wallet", "amount"):
+        postings[wallet_id] += amount
+    for wallet_id, balance in Wallet.objects.values_list("id", "balance"):
+        assert balance == postings[wallet_id]
+        assert balance >= 0
+    for transaction_ in Transaction.objects.filter(status="PAID")[:100]:
+        assert sum(transaction_.ledger_entries.values_list("amount", flat=True)) == 0
+
+    receivers = Counter(Transaction.objects.values_list("receiver", flat=True))
+    # the hottest wallet of a currency gets many times a uniform share
+    assert receivers.most_common(1)[0][1] > 10 * 2000 / 100
+
+
+@pytest.mark.django_db
+def test_seeded_data_is_usable():
+    """Seeded users log in, new rows get ids after the seeded ones"""
+
+    seed(users=3, transactions=10, password="secret-pass")
+    assert authenticate(username="sseed0", password="secret-pass") is not None
+    sender, receiver = Wallet.objects.filter(currency="USD")[:2]
+    transaction_ = transfer(sender, receiver, Decimal("1.00"))
+    assert transaction_.pk == 11
+
+    seed(users=3, transactions=10, prefix="t")
+    assert Wallet.objects.filter(user__username__startswith="tseed").count() == 6
+    with pytest.raises(CommandError):
+        seed(users=3, transactions=10, prefix="t")
+    with pytest.raises(CommandError):
+        seed(users=3, wallets_per_user=6)
@@ -0,0 +1,167 @@
+"""Module for testing WalletService transfer engine"""
+
+import threading
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from WalletService.models import Transaction, Wallet
+from WalletService.services import (
+    InsufficientFundsError,
+    WalletNotFoundError,
+    lock_wallets,
+    settle_batch,
+    transfer,
+)
+
+THREADS = 8
+TRANSFERS_PER_THREAD = 15
+
+
+@pytest.fixture
+def wallets():
+    """Hot sender wallet and a receiver wallet per thread, all of one owner"""
+
+    user = User.objects.create(username="username")
+    sender = Wallet.objects.create(
+        name="HOT00001", type="Visa", currency="USD", balance=100, user=user
+    )
+    receivers = [
+        Wallet.objects.create(
+            name=f"RCV0000{i}", type="Visa", currency="USD", balance=0, user=user
+        )
+        for i in range(THREADS)
+    ]
+    return sender, receivers
+
+
+@pytest.mark.django_db
+def test_transfer_query_count(django_assert_num_queries, wallets):
+    """Transfer is two conditional updates, one insert of the transaction,
+    one insert of ledger entries and one update of daily balances of the day"""
+
+    sender, receivers = wallets
+    transfer(sender, receivers[0], Decimal("10.00"))
+    # 5 queries + savepoint and its release, as test runs inside a transaction
+    with django_assert_num_queries(7):
+        transfer(sender, receivers[0], Decimal("10.00"))
+
+
+@pytest.mark.django_db
+def test_transfer_insufficient_funds(wallets):
+    """Nothing is written if sender can't cover the transfer"""
+
+    sender, receivers = wallets
+    with pytest.raises(InsufficientFundsError):
+        transfer(sender, receivers[0], Decimal("100.01"))
+
+    sender.refresh_from_db()
+    receivers[0].refresh_from_db()
+    assert sender.balance == 100
+    assert receivers[0].balance == 0
+    assert not Transaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_transfer_to_deleted_wallet(wallets):
+    """Transfers with a wallet deleted after it was looked up are rejected"""
+
+    sender, receivers = wallets
+    receiver = receivers[0]
+    Wallet.objects.filter(pk=receiver.pk).delete()
+    with pytest.raises(WalletNotFoundError):
+        transfer(sender, receiver, Decimal("10.00"))
+    sender.refresh_from_db()
+    assert sender.balance == 100
+    assert not Transaction.objects.exists()
+
+    with pytest.raises(WalletNotFoundError):
+        transfer(receiver, sender, Decimal("10.00"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_transfer_concurrent_hot_wallet(wallets):
+    """Concurrent transfers from one wallet neither lose updates nor overdraw it"""
+
+    sender, receivers = wallets
+    amount = Decimal("1.00")
+    failures = []
+
+    def worker(receiver):
+        """Sends money from the hot wallet until it's out of funds"""
+        try:
+            for _ in range(TRANSFERS_PER_THREAD):
+                try:
+                    transfer(sender, receiver, amount)
+                except InsufficientFundsError:
+                    failures.append(receiver.pk)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(r,)) for r in receivers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    paid = Transaction.objects.filter(status="PAID").count()
+    sender.refresh_from_db()
+    received = sum(Wallet.objects.get(pk=r.pk).balance for r in receivers)
+
+    assert paid == 100
+    assert len(failures) == THREADS * TRANSFERS_PER_THREAD - 100
+    assert sender.balance == 0
+    assert received == 100
+
+
+@pytest.mark.django_db
+def test_settle_batch_nets_deltas(wallets):
+    """Transfers bouncing between wallets are applied with one balance update"""
+
+    sender, receivers = wallets
+    amount = Decimal("60.00")
+    batch = []
+    for _ in range(50):
+        batch.append(
+            Transaction(
+                sender=sender,
+                receiver=receivers[0],
+                fee=0,
+                transfer_amount=amount,
+                received_amount=amount,
+            )
+        )
+        batch.append(
+            Transaction(
+                sender=receivers[0],
+                receiver=sender,
+                fee=0,
+                transfer_amount=amount,
+                received_amount=amount,
+            )
+        )
+    batch.append(
+        Transaction(
+            sender=sender,
+            receiver=receivers[1],
+            fee=0,
+            transfer_amount=Decimal("30"),
+            received_amount=Decimal("30"),
+        )
+    )
+
+    with transaction.atomic():
+        locked = lock_wallets(Wallet.objects.filter(user=sender.user))
+        with CaptureQueriesContext(connection) as queries:
+            paid = settle_batch(batch, {wallet.pk: wallet for wallet in locked})
+
+    updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+    assert len(updates) == 1
+    assert len(paid) == len(batch)
+    assert [wallet.balance for wallet in Wallet.objects.order_by("pk")[:3]] == [
+        70,
+        0,
+        30,
+    ]
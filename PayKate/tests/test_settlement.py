@@ -0,0 +1,203 @@
+"""Module for testing queued transactions and the settlement worker"""
+
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from WalletService.models import Transaction, Wallet, WalletDailyBalance
+from WalletService.services import (
+    enqueue_transfer,
+    rebuild_balances,
+    settle_pending_transfers,
+)
+
+WORKERS = 4
+
+
+@pytest.fixture
+def queued(settings):
+    """Turns queued mode on"""
+    settings.TRANSACTIONS_QUEUED = True
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user
+        )
+    return user
+
+
+@pytest.fixture
+def user2():
+    """Second user with a wallet fixture"""
+
+    user = User.objects.create(username="username2")
+    Wallet.objects.create(name="U2USD1", type="Visa", currency="USD", user=user)
+    return user
+
+
+def balances():
+    """Balances of all wallets by name"""
+    return dict(Wallet.objects.values_list("name", "balance"))
+
+
+def daily_balances():
+    """All daily balances ordered by wallet and day"""
+    return list(
+        WalletDailyBalance.objects.select_related("wallet").order_by("wallet", "day")
+    )
+
+
+def row_values(row):
+    """Daily balance as a comparable tuple"""
+    return (
+        row.wallet_id,
+        row.day,
+        row.opening_balance,
+        row.total_in,
+        row.total_out,
+        row.fees,
+        row.count,
+    )
+
+
+@pytest.mark.django_db
+def test_queued_transaction(client, queued, user, user2):
+    """Queued transaction is accepted, settled by the worker and can be polled"""
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "10"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 202
+    assert response.json()["status"] == "PENDING"
+    assert balances() == {"U1USD1": 100, "U1USD2": 100, "U2USD1": 0}
+
+    url = f"/transactions/{response.json()['id']}/"
+    assert client.get(url).json()["status"] == "PENDING"
+
+    out = StringIO()
+    call_command("settle_transactions", once=True, stdout=out)
+    assert "Settled 1 transactions" in out.getvalue()
+    assert client.get(url).json()["status"] == "PAID"
+    assert balances() == {"U1USD1": 89, "U1USD2": 100, "U2USD1": 10}
+
+
+@pytest.mark.django_db
+def test_queued_transaction_invalid(client, queued, user, user2):
+    """Invalid transactions aren't queued, uncovered ones fail on settlement"""
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "NoWallet", "transfer_amount": "10"}
+    assert client.post("/transactions/", data=data).status_code == 404
+    data = {"sender": "U2USD1", "receiver": "U1USD1", "transfer_amount": "10"}
+    assert client.post("/transactions/", data=data).status_code == 403
+    assert not Transaction.objects.exists()
+
+    data = {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": "1000"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 202
+    settle_pending_transfers(10)
+    assert client.get(f"/transactions/{response.json()['id']}/").json()["status"] == (
+        "FAILED"
+    )
+    assert balances() == {"U1USD1": 100, "U1USD2": 100, "U2USD1": 0}
+
+
+@pytest.mark.django_db
+def test_settlement_nets_batch(django_assert_max_num_queries, user, user2):
+    """Batch is checked in queue order and settled with one update per wallet"""
+
+    u1usd1, u1usd2, u2usd1 = Wallet.objects.order_by("name")
+    for _ in range(30):
+        enqueue_transfer(u1usd1, u1usd2, Decimal("5"))
+        enqueue_transfer(u1usd2, u1usd1, Decimal("5"))
+    enqueue_transfer(u1usd1, u2usd1, Decimal("100"))
+    enqueue_transfer(u1usd2, u2usd1, Decimal("50"))
+
+    # claim, wallets, updates of 3 wallets, statuses, ledger, daily balances
+    with django_assert_max_num_queries(16):
+        assert settle_pending_transfers(100) == 62
+    assert settle_pending_transfers(100) == 0
+
+    assert list(Transaction.objects.values_list("status", flat=True)[60:]) == [
+        "FAILED",
+        "PAID",
+    ]
+    assert balances() == {"U1USD1": 100, "U1USD2": 45, "U2USD1": 50}
+    assert rebuild_balances(list(Wallet.objects.values_list("id", flat=True))) == []
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(
+    not connection.features.has_select_for_update_skip_locked,
+    reason="Concurrent workers need SELECT ... FOR UPDATE SKIP LOCKED",
+)
+def test_concurrent_workers(user, user2):
+    """Concurrent workers don't settle a transaction twice"""
+
+    u1usd1, u1usd2, u2usd1 = Wallet.objects.order_by("name")
+    for _ in range(100):
+        enqueue_transfer(u1usd1, u2usd1, Decimal("1"))
+        enqueue_transfer(u1usd2, u1usd1, Decimal("1"))
+
+    def worker():
+        """Settles small batches until the queue is empty"""
+        try:
+            while settle_pending_transfers(5):
+                pass
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not Transaction.objects.filter(status="PENDING").exists()
+    fees = Transaction.objects.filter(status="PAID", sender=u1usd1).count()
+    assert sum(balances().values()) + fees * Decimal("0.1") == 200
+    assert rebuild_balances(list(Wallet.objects.values_list("id", flat=True))) == []
+
+
+@pytest.mark.django_db
+def test_settled_next_day(client, settings, queued, user, user2):
+    """Transfer queued on a day and settled on the next one keeps
+    daily balances chained and equal to rebuilt ones
+    """
+
+    client.force_login(user)
+    data = {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "10"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 202
+    Transaction.objects.filter(pk=response.json()["id"]).update(
+        timestamp=timezone.now() - timedelta(days=1)
+    )
+
+    settings.TRANSACTIONS_QUEUED = False
+    data = {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "5"}
+    assert client.post("/transactions/", data=data).status_code == 201
+    settle_pending_transfers(10)
+    assert balances() == {"U1USD1": Decimal("83.5"), "U1USD2": 100, "U2USD1": 15}
+
+    rows = daily_balances()
+    for earlier, later in zip(rows, rows[1:]):
+        if earlier.wallet_id == later.wallet_id:
+            assert earlier.closing_balance == later.opening_balance
+    for row in rows:
+        if row.day == timezone.localdate():
+            assert row.closing_balance == row.wallet.balance
+    recorded = [row_values(row) for row in rows]
+    call_command("rebuild_daily_balances")
+    assert [row_values(row) for row in daily_balances()] == recorded
@@ -0,0 +1,177 @@
+"""Module for testing balance shards of hot wallets"""
+
+import threading
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from WalletService.models import Wallet, WalletBalanceShard, WalletDailyBalance
+from WalletService.services import InsufficientFundsError, rebuild_balances, transfer
+
+SENDERS = 6
+
+
+@pytest.fixture
+def merchant():
+    """Merchant with a wallet sharded in 3 balance shards"""
+
+    user = User.objects.create(username="merchant")
+    Wallet.objects.create(name="SHOP0001", type="Visa", currency="USD", user=user)
+    call_command("shard_wallet", "SHOP0001", 3, stdout=StringIO())
+    return user
+
+
+@pytest.fixture
+def customers():
+    """Customer wallets paying to the merchant"""
+
+    user = User.objects.create(username="customer")
+    return [
+        Wallet.objects.create(
+            name=f"CUST000{i}", type="Visa", currency="USD", balance=100, user=user
+        )
+        for i in range(SENDERS)
+    ]
+
+
+def shop():
+    """Merchant wallet with its metadata as resolved for transfers"""
+    return Wallet.objects.with_shard_balance().get(name="SHOP0001")
+
+
+def statement_rows():
+    """Daily balances of the merchant wallet as comparable tuples"""
+    return list(
+        WalletDailyBalance.objects.filter(wallet__name="SHOP0001")
+        .order_by("day")
+        .values_list("day", "opening_balance", "total_in", "total_out", "fees", "count")
+    )
+
+
+@pytest.mark.django_db
+def test_credits_go_to_shards(client, merchant, customers):
+    """Credits of a sharded wallet don't touch the wallet row"""
+
+    for customer in customers:
+        transfer(customer, shop(), Decimal("10.00"))
+
+    wallet = shop()
+    assert wallet.shards == 3
+    assert wallet.balance == 0
+    assert wallet.total_balance == 60
+    shard_balances = WalletBalanceShard.objects.filter(wallet=wallet).values_list(
+        "balance", flat=True
+    )
+    assert len(shard_balances) == 3
+    assert sum(shard_balances) == 60
+    assert Wallet.objects.get(name="SHOP0001").total_balance == 60
+
+    client.force_login(merchant)
+    response = client.get("/wallets/SHOP0001/")
+    assert Decimal(response.json()["balance"]) == 60
+    assert rebuild_balances([wallet.pk], check_only=True) == []
+
+
+@pytest.mark.django_db
+def test_one_sender_credits_every_shard(merchant, customers):
+    """Credits of one hot sender are spread over the shards too"""
+
+    for _ in range(30):
+        transfer(customers[0], shop(), Decimal("1.00"))
+    shard_balances = WalletBalanceShard.objects.filter(
+        wallet__name="SHOP0001"
+    ).values_list("balance", flat=True)
+    assert sum(shard_balances) == 30
+    assert all(balance > 0 for balance in shard_balances)
+
+
+@pytest.mark.django_db
+def test_debit_folds_shards(client, merchant, customers):
+    """Debits see funds of shards, single and bulk ones"""
+
+    for customer in customers:
+        transfer(customer, shop(), Decimal("10.00"))
+
+    client.force_login(merchant)
+    data = {"sender": "SHOP0001", "receiver": "CUST0000", "transfer_amount": "50"}
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 201
+    wallet = shop()
+    assert (wallet.balance, wallet.shard_balance) == (5, 0)
+
+    transfer(customers[1], wallet, Decimal("10.00"))
+    response = client.post(
+        "/transactions/bulk/",
+        data=[{"sender": "SHOP0001", "receiver": "CUST0001", "transfer_amount": "10"}],
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    assert shop().total_balance == 4
+
+    data["transfer_amount"] = "4"
+    response = client.post("/transactions/", data=data)
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_fold_and_unshard(merchant, customers):
+    """Folding moves shard balances to the wallet and refreshes its statement"""
+
+    for customer in customers:
+        transfer(customer, shop(), Decimal("10.00"))
+    assert statement_rows() == []
+
+    call_command("fold_balance_shards", stdout=StringIO())
+    wallet = shop()
+    assert (wallet.balance, wallet.shard_balance) == (60, 0)
+    folded = statement_rows()
+    assert [row[1:] for row in folded] == [(0, 60, 0, 0, SENDERS)]
+
+    call_command("rebuild_daily_balances", stdout=StringIO())
+    assert statement_rows() == folded
+
+    call_command("shard_wallet", "SHOP0001", 0, stdout=StringIO())
+    assert not WalletBalanceShard.objects.exists()
+    transfer(customers[0], shop(), Decimal("10.00"))
+    assert shop().balance == 70
+    assert statement_rows()[-1][2] == 70
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_credits(merchant, customers):
+    """Concurrent credits to shards and debits of the wallet add up"""
+
+    debits = []
+
+    def worker(customer):
+        """Pays to the merchant wallet"""
+        try:
+            for _ in range(5):
+                transfer(customer, shop(), Decimal("2.00"))
+        finally:
+            connection.close()
+
+    def merchant_worker():
+        """Pays from the merchant wallet as long as it has funds"""
+        try:
+            for _ in range(5):
+                try:
+                    transfer(shop(), customers[0], Decimal("1.00"))
+                    debits.append(Decimal("1.10"))
+                except InsufficientFundsError:
+                    pass
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in customers]
+    threads.append(threading.Thread(target=merchant_worker))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert shop().total_balance == SENDERS * 5 * 2 - sum(debits)
+    assert rebuild_balances(list(Wallet.objects.values_list("id", flat=True))) == []
@@ -0,0 +1,159 @@
+"""Module for testing /wallets/<str:name>/statement api
+and rebuilding of wallet daily balances
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from WalletService.models import Transaction, Wallet, WalletDailyBalance
+
+
+@pytest.fixture
+def user():
+    """User with two wallets fixture"""
+
+    user = User.objects.create(username="username")
+    for name in ("U1USD1", "U1USD2"):
+        Wallet.objects.create(
+            name=name, type="Visa", currency="USD", balance=100, user=user
+        )
+    return user
+
+
+@pytest.fixture
+def user2():
+    """Second user with a wallet fixture"""
+
+    user = User.objects.create(username="username2")
+    Wallet.objects.create(name="U2USD1", type="Visa", currency="USD", user=user)
+    return user
+
+
+def make_transfers(client):
+    """Makes transfers between fixture wallets through the api"""
+    transfers = [
+        {"sender": "U1USD1", "receiver": "U1USD2", "transfer_amount": 10},
+        {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": 20},
+        {"sender": "U1USD2", "receiver": "U1USD1", "transfer_amount": 5},
+    ]
+    for transfer in transfers:
+        response = client.post("/transactions/", data=transfer)
+        assert response.status_code == 201
+
+
+def statement_rows():
+    """All daily balances as comparable tuples"""
+    return list(
+        WalletDailyBalance.objects.order_by("wallet__name", "day").values_list(
+            "wallet__name",
+            "day",
+            "opening_balance",
+            "total_in",
+            "total_out",
+            "fees",
+            "count",
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_statement_get(client, user, user2):
+    """Daily balances are updated by transfers"""
+
+    client.force_login(user)
+    make_transfers(client)
+
+    response = client.get("/wallets/U1USD1/statement/")
+    assert response.status_code == 200
+
+    (day,) = response.json()
+    assert day["day"] == str(timezone.localdate())
+    assert Decimal(day["opening_balance"]) == 100
+    assert Decimal(day["total_in"]) == 5
+    assert Decimal(day["total_out"]) == 30
+    assert Decimal(day["fees"]) == 2
+    assert day["count"] == 3
+    assert Decimal(day["closing_balance"]) == Wallet.objects.get(name="U1USD1").balance
+
+
+@pytest.mark.django_db
+def test_statement_range(client, user, user2):
+    """Only days within from-to range are returned"""
+
+    client.force_login(user)
+    make_transfers(client)
+    today = timezone.localdate()
+    WalletDailyBalance.objects.create(
+        wallet=Wallet.objects.get(name="U1USD1"),
+        day=today - timedelta(days=3),
+        opening_balance=100,
+    )
+
+    response = client.get("/wallets/U1USD1/statement/")
+    assert len(response.json()) == 2
+
+    response = client.get(f"/wallets/U1USD1/statement/?from={today}")
+    assert [day["day"] for day in response.json()] == [str(today)]
+
+    response = client.get(f"/wallets/U1USD1/statement/?to={today - timedelta(1)}")
+    assert [day["day"] for day in response.json()] == [str(today - timedelta(3))]
+
+
+@pytest.mark.django_db
+def test_statement_invalid_requests(client, user, user2):
+    """Statement of not user's wallet can't be seen, dates are validated"""
+
+    response = client.get("/wallets/U1USD1/statement/")
+    assert response.status_code == 403
+
+    client.force_login(user)
+    response = client.get("/wallets/U2USD1/statement/")
+    assert response.status_code == 404
+
+    response = client.get("/wallets/U1USD1/statement/?from=2022-13-01")
+    assert response.status_code == 400
+
+    response = client.get("/wallets/U1USD1/statement/?to=yesterday")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_rebuild_daily_balances(client, user, user2):
+    """Rebuilt daily balances match incrementally updated ones"""
+
+    client.force_login(user)
+    make_transfers(client)
+    response = client.post(
+        "/transactions/bulk/",
+        data=[{"sender": "U1USD2", "receiver": "U1USD2", "transfer_amount": "1"}],
+        content_type="application/json",
+    )
+    assert response.status_code == 201
+    incremental = statement_rows()
+    call_command("rebuild_daily_balances")
+    assert statement_rows() == incremental
+
+    # transactions of a previous day
+    Transaction.objects.filter(transfer_amount=10).update(
+        timestamp=timezone.now() - timedelta(days=1)
+    )
+    WalletDailyBalance.objects.all().delete()
+    call_command("rebuild_daily_balances", chunk_size=2)
+    rebuilt = statement_rows()
+
+    yesterday = timezone.localdate() - timedelta(days=1)
+    assert [row[:2] for row in rebuilt] == [
+        ("U1USD1", yesterday),
+        ("U1USD1", timezone.localdate()),
+        ("U1USD2", yesterday),
+        ("U1USD2", timezone.localdate()),
+        ("U2USD1", timezone.localdate()),
+    ]
+    assert rebuilt[0][2:] == (100, 0, 10, 0, 1)
+    assert rebuilt[1][2:] == (90, 5, 20, 2, 2)
+    assert rebuilt[3][2:] == (110, 1, 6, 0, 2)
+    assert rebuilt[4][2:] == (0, 20, 0, 0, 1)
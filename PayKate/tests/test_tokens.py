@@ -0,0 +1,159 @@
+"""Module for testing stateless token authentication"""
+
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from WalletService.models import Wallet
+from WalletService.tokens import decode_token, encode_token, issue_tokens
+
+
+@pytest.fixture
+def user():
+    """User with a wallet fixture"""
+
+    user = User.objects.create(username="username")
+    user.set_password("Password-2022")
+    user.save()
+    Wallet.objects.create(
+        name="U1USD1", type="Visa", currency="USD", balance=100, user=user
+    )
+    return user
+
+
+def bearer(token):
+    """Authorization header of a token"""
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+@pytest.mark.django_db
+def test_obtain_and_use_tokens(client, user):
+    """Tokens are issued for a password, access token authenticates requests"""
+
+    response = client.post(
+        "/token/", data={"username": "username", "password": "wrong"}
+    )
+    assert response.status_code == 400
+    response = client.post(
+        "/token/", data={"username": "username", "password": "Password-2022"}
+    )
+    assert response.status_code == 200
+    tokens = response.json()
+
+    response = client.get("/wallets/", **bearer(tokens["access"]))
+    assert response.status_code == 200
+    assert [wallet["name"] for wallet in response.json()] == ["U1USD1"]
+    response = client.get("/async/wallets/", **bearer(tokens["access"]))
+    assert [wallet["name"] for wallet in response.json()] == ["U1USD1"]
+
+    data = {"sender": "U1USD1", "receiver": "U1USD1", "transfer_amount": "1"}
+    response = client.post("/transactions/", data=data, **bearer(tokens["access"]))
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_token_needs_no_queries(client, user):
+    """Token authentication doesn't read sessions or users"""
+
+    access = issue_tokens(user)["access"]
+    with CaptureQueriesContext(connection) as context:
+        assert client.get("/wallets/", **bearer(access)).status_code == 200
+    tables = " ".join(query["sql"] for query in context.captured_queries)
+    assert "django_session" not in tables
+    assert "auth_user" not in tables
+
+
+@pytest.mark.django_db
+def test_invalid_tokens(client, user, settings):
+    """Forged, expired and refresh tokens don't authenticate requests"""
+
+    tokens = issue_tokens(user)
+    header, claims, signature = tokens["access"].split(".")
+    forged = encode_token({"sub": user.pk, "staff": True, "type": "access"})
+    settings.ACCESS_TOKEN_LIFETIME = -1
+    expired = issue_tokens(user)["access"]
+    for token in (
+        f"{header}.{claims}.{signature[:-2]}AA",
+        f"{header}.{forged.split('.')[1]}.{signature}",
+        tokens["refresh"],
+        expired,
+        "token",
+    ):
+        for path in ("/wallets/", "/async/wallets/"):
+            response = client.get(path, **bearer(token))
+            assert response.status_code == 401
+            assert response["WWW-Authenticate"] == 'Bearer realm="api"'
+            assert "detail" in response.json()
+    # session authentication is the first one, so anonymous requests are 403
+    assert client.get("/wallets/").status_code == 403
+    assert client.get("/async/wallets/").status_code == 403
+
+
+@pytest.mark.django_db
+def test_refresh_tokens(client, user):
+    """Refresh tokens give new tokens while the user is active"""
+
+    tokens = issue_tokens(user)
+    response = client.post("/token/refresh/", data={"refresh": tokens["access"]})
+    assert response.status_code == 400
+    response = client.post("/token/refresh/", data={"refresh": tokens["refresh"]})
+    assert response.status_code == 200
+    claims = decode_token(response.json()["access"], "access")
+    assert claims["sub"] == user.pk
+    assert claims["exp"] > time.time()
+
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    response = client.post("/token/refresh/", data={"refresh": tokens["refresh"]})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_staff_token(client, user):
+    """Staff flag is taken from the token"""
+
+    assert (
+        client.get("/metrics/", **bearer(issue_tokens(user)["access"])).status_code
+        == 403
+    )
+    user.is_staff = True
+    assert (
+        client.get("/metrics/", **bearer(issue_tokens(user)["access"])).status_code
+        == 200
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_user_token(client, user):
+    """Writes of a user deleted since the token was issued are unauthorized"""
+
+    access = issue_tokens(user)["access"]
+    user.delete()
+    data = {"type": "Visa", "currency": "USD"}
+    response = client.post("/wallets/", data=data, **bearer(access))
+    assert response.status_code == 401
+    assert response["WWW-Authenticate"] == 'Bearer realm="api"'
+    assert not Wallet.objects.exists()
+
+
+@pytest.mark.django_db
+def test_session_before_token(client, user):
+    """Sync and async views try the session before the token"""
+
+    client.force_login(user)
+    for path in ("/wallets/", "/async/wallets/"):
+        assert client.get(path, **bearer("forged")).status_code == 200
+
+
+@pytest.mark.django_db
+def test_bearer_without_csrf(user):
+    """Bearer token clients don't need a CSRF token, in sync and async views"""
+
+    client = Client(enforce_csrf_checks=True)
+    access = issue_tokens(user)["access"]
+    data = {"sender": "U1USD1", "receiver": "U1USD1", "transfer_amount": "1"}
+    for path in ("/transactions/", "/async/transactions/"):
+        response = client.post(path, data=data, **bearer(access))
+        assert response.status_code == 201
@@ -1,12 +1,26 @@
 """Module for testing
     /transactions,
+    /transactions/bulk,
+    /transactions/export,
     /transactions/<int:id>,
     /transactions/<str:wallet_name> APIs
 """
 
+import csv
+import json
+from base64 import b64decode, b64encode
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
 import pytest
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from WalletService import services
 from WalletService.models import Transaction, Wallet
+from WalletService.resolvers import WalletResolver, wallet_cache
 from WalletService.serializers import TransactionSerializer, WalletSerializer
 
 
@@ -109,6 +123,14 @@ def create_transactions(user1, user2):
         )
 
 
+def count_get_queries(client, url):
+    """Returns number of sql queries made while requesting url"""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
 class TestTransactionApi:
     """Class to test /transaction api"""
 
@@ -208,6 +230,57 @@ class TestTransactionApi:
         serializer = WalletSerializer(receiver)
         assert float(serializer.data["balance"]) == 110
 
+    @pytest.mark.django_db
+    def test_transaction_create_query_count(
+        self, client, user1, user2, django_assert_num_queries
+    ):
+        """Transfer makes a fixed number of queries:
+        session and user, one lookup of both wallets, two balance updates,
+        inserts of the transaction and its ledger entries and an update
+        of daily balances (with a savepoint and its release in tests)
+        """
+
+        client.force_login(user1)
+        data = {"receiver": "U2RUS1", "sender": "U1RUS1", "transfer_amount": 10}
+        # first transfer of the day creates daily balances
+        client.post("/transactions/", data=data)
+        with django_assert_num_queries(10):
+            response = client.post("/transactions/", data=data)
+        assert response.status_code == 201
+
+    @pytest.mark.django_db
+    def test_transaction_create_cached_wallets(
+        self, client, user1, user2, django_assert_num_queries
+    ):
+        """Wallet lookup is skipped when wallets metadata is cached"""
+
+        wallet_cache.clear()
+        client.force_login(user1)
+        data = {"receiver": "U2RUS1", "sender": "U1RUS1", "transfer_amount": 10}
+        with override_settings(WALLET_CACHE_SIZE=100):
+            response = client.post("/transactions/", data=data)
+            assert response.status_code == 201
+
+            with django_assert_num_queries(9):
+                response = client.post("/transactions/", data=data)
+            assert response.status_code == 201
+        wallet_cache.clear()
+
+        assert Wallet.objects.get(name="U1RUS1").balance == 78
+
+    @pytest.mark.django_db
+    def test_wallet_cache_invalidation(self, user1):
+        """Deleted wallet is dropped from wallets metadata cache"""
+
+        wallet_cache.clear()
+        with override_settings(WALLET_CACHE_SIZE=100):
+            (wallet,) = WalletResolver().resolve("U1RUS1")
+            assert wallet.currency == "RUS"
+
+            Wallet.objects.get(name="U1RUS1").delete()
+            assert WalletResolver().resolve("U1RUS1") == [None]
+        wallet_cache.clear()
+
     @pytest.mark.django_db
     def test_transaction_get(self, client, user1, create_transactions):
         """Testing get request"""
@@ -217,7 +290,7 @@ class TestTransactionApi:
 
         client.force_login(user1)
         response = client.get("/transactions/")
-        transactions = response.json()
+        transactions = response.json()["results"]
         assert response.status_code == 200
 
         user_wallets = user1.wallet_set.all()
@@ -230,6 +303,111 @@ class TestTransactionApi:
             )
             assert statement
 
+    @pytest.mark.django_db
+    def test_transaction_get_sent_and_received(
+        self, client, user2, create_transactions
+    ):
+        """Transactions between two wallets of a user are listed once"""
+
+        client.force_login(user2)
+        response = client.get("/transactions/")
+        assert response.status_code == 200
+
+        ids = [transaction["id"] for transaction in response.json()["results"]]
+        assert sorted(ids) == sorted(Transaction.objects.values_list("id", flat=True))
+
+    @pytest.mark.django_db
+    def test_transaction_list_query_count(self, client, user1, create_transactions):
+        """Number of queries doesn't depend on number of listed transactions"""
+
+        client.force_login(user1)
+        urls = ["/transactions/", "/transactions/U1RUS1/"]
+        queries_before = [count_get_queries(client, url) for url in urls]
+
+        sender = Wallet.objects.get(name="U1RUS1")
+        receiver = Wallet.objects.get(name="U2RUS1")
+        for _ in range(20):
+            Transaction.objects.create(
+                sender=sender, receiver=receiver, transfer_amount=1
+            )
+
+        assert [count_get_queries(client, url) for url in urls] == queries_before
+
+    @pytest.mark.django_db
+    def test_transaction_list_pagination(self, client, user1, create_transactions):
+        """Testing that pages follow each other without gaps or repeats"""
+
+        sender = Wallet.objects.get(name="U1RUS1")
+        receiver = Wallet.objects.get(name="U2RUS1")
+        for _ in range(5):
+            Transaction.objects.create(
+                sender=sender, receiver=receiver, transfer_amount=1
+            )
+        expected_ids = list(
+            Transaction.objects.for_user(user1)
+            .order_by("timestamp", "id")
+            .values_list("id", flat=True)
+        )
+
+        client.force_login(user1)
+        ids = []
+        url = "/transactions/?page_size=3"
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["results"]) <= 3
+            ids.extend(transaction["id"] for transaction in page["results"])
+            url = page["next"]
+
+        assert ids == expected_ids
+
+    @pytest.mark.django_db
+    def test_transaction_list_pagination_same_timestamp(
+        self, client, user1, create_transactions
+    ):
+        """Testing pages of transactions sharing a timestamp in both directions.
+        Cursors keep the id too, so no page is found by an offset
+        """
+
+        sender = Wallet.objects.get(name="U1RUS1")
+        receiver = Wallet.objects.get(name="U2RUS1")
+        for _ in range(10):
+            Transaction.objects.create(
+                sender=sender, receiver=receiver, transfer_amount=1
+            )
+        Transaction.objects.update(timestamp=Transaction.objects.first().timestamp)
+        expected_ids = list(
+            Transaction.objects.for_user(user1)
+            .order_by("timestamp", "id")
+            .values_list("id", flat=True)
+        )
+
+        client.force_login(user1)
+        pages = []
+        url = "/transactions/?page_size=3"
+        while url:
+            page = client.get(url).json()
+            pages.append([transaction["id"] for transaction in page["results"]])
+            url = page["next"]
+            if url:
+                cursor = parse_qs(urlparse(url).query)["cursor"][0]
+                assert "o=" not in b64decode(cursor).decode()
+        assert sum(pages, []) == expected_ids
+
+        url = page["previous"]
+        for expected_page in reversed(pages[:-1]):
+            page = client.get(url).json()
+            assert [transaction["id"] for transaction in page["results"]] == (
+                expected_page
+            )
+            url = page["previous"]
+        assert url is None
+
+        cursor = b64encode(b"p=2022-01-01").decode()  # position without an id
+        response = client.get(f"/transactions/?cursor={cursor}")
+        assert response.status_code == 404
+
     @pytest.mark.django_db
     def test_wallet_method_not_allowed(self, client, user1):
         """Testing if PUT, PATCH, DELETE are not allowed"""
@@ -245,6 +423,190 @@ class TestTransactionApi:
         assert response.status_code == 405
 
 
+class TestTransactionBulkApi:
+    """Class to test /transactions/bulk api"""
+
+    @pytest.mark.django_db
+    def test_transaction_bulk_running_balance(self, client, user1, user2):
+        """Transfers of a batch are checked against running balances"""
+
+        client.force_login(user1)
+        batch = [
+            {"sender": "U1RUS1", "receiver": "U1RUS2", "transfer_amount": "30"}
+        ] * 4
+        response = client.post(
+            "/transactions/bulk/", data=batch, content_type="application/json"
+        )
+        assert response.status_code == 207
+
+        results = response.json()
+        assert [result["status"] for result in results] == ["PAID"] * 3 + ["FAILED"]
+        assert Transaction.objects.filter(status="PAID").count() == 3
+        assert Wallet.objects.get(name="U1RUS1").balance == 10
+        assert Wallet.objects.get(name="U1RUS2").balance == 190
+
+    @pytest.mark.django_db
+    def test_transaction_bulk_invalid_transfers(self, client, user1, user2):
+        """Invalid transfers are reported and skipped, valid ones are made"""
+
+        client.force_login(user1)
+        batch = [
+            {"sender": "U2USD1", "receiver": "U1USD1", "transfer_amount": "1"},
+            {"sender": "U1USD1", "receiver": "NoWallet", "transfer_amount": "1"},
+            {"sender": "U1USD1", "receiver": "U1EUR1", "transfer_amount": "1"},
+            {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "10"},
+        ]
+        response = client.post(
+            "/transactions/bulk/", data=batch, content_type="application/json"
+        )
+        assert response.status_code == 207
+
+        results = response.json()
+        assert [result["status"] for result in results] == ["FAILED"] * 3 + ["PAID"]
+        assert results[3]["sender"] == "U1USD1"
+        assert Decimal(results[3]["fee"]) == Transaction.DEFAULT_FEE
+        assert Wallet.objects.get(name="U1USD1").balance == 89
+        assert Wallet.objects.get(name="U2USD1").balance == 110
+
+    @pytest.mark.django_db
+    def test_transaction_bulk_query_count(self, client, user1):
+        """Number of queries doesn't depend on the batch size"""
+
+        client.force_login(user1)
+        queries = []
+        # first batch of the day also creates daily balances
+        for size in (1, 2, 20):
+            batch = [
+                {"sender": "U1RUS1", "receiver": "U1RUS2", "transfer_amount": "1"}
+            ] * size
+            with CaptureQueriesContext(connection) as context:
+                response = client.post(
+                    "/transactions/bulk/", data=batch, content_type="application/json"
+                )
+            assert response.status_code == 201
+            queries.append(len(context.captured_queries))
+
+        assert queries[1] == queries[2]
+
+    @pytest.mark.django_db
+    def test_transaction_bulk_invalid_batch(self, client, user1):
+        """Testing empty and malformed batches"""
+
+        response = client.post(
+            "/transactions/bulk/", data=[], content_type="application/json"
+        )
+        assert response.status_code == 403
+
+        client.force_login(user1)
+        response = client.post(
+            "/transactions/bulk/", data=[], content_type="application/json"
+        )
+        assert response.status_code == 400
+
+        response = client.post(
+            "/transactions/bulk/",
+            data=[{"sender": "U1RUS1", "transfer_amount": "-1"}],
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+
+        # the size is checked before items are validated
+        for data in ([{}] * (settings.BULK_TRANSACTIONS_MAX + 1), {"sender": "U1RUS1"}):
+            response = client.post(
+                "/transactions/bulk/", data=data, content_type="application/json"
+            )
+            assert response.status_code == 400
+            assert "Batch must contain" in response.json()[0]
+
+    @pytest.mark.django_db
+    def test_transaction_bulk_locks_own_senders(
+        self, client, monkeypatch, user1, user2
+    ):
+        """Wallets of other users named as senders aren't locked"""
+
+        locked, lock = [], services.lock_wallets
+
+        def lock_wallets(wallets):
+            """Records names of the locked wallets"""
+            wallets = lock(wallets)
+            locked.extend(wallet.name for wallet in wallets)
+            return wallets
+
+        monkeypatch.setattr(services, "lock_wallets", lock_wallets)
+        client.force_login(user1)
+        batch = [
+            {"sender": "U2USD2", "receiver": "U2EUR1", "transfer_amount": "1"},
+            {"sender": "U1USD1", "receiver": "U2USD1", "transfer_amount": "1"},
+        ]
+        response = client.post(
+            "/transactions/bulk/", data=batch, content_type="application/json"
+        )
+        assert response.status_code == 207
+        assert sorted(locked) == ["U1USD1", "U2EUR1", "U2USD1"]
+
+
+class TestTransactionExportApi:
+    """Class to test /transactions/export api"""
+
+    @pytest.mark.django_db
+    def test_transaction_export_csv(self, client, user1, create_transactions):
+        """Testing csv export of user transactions"""
+
+        client.force_login(user1)
+        response = client.get("/transactions/export/?format=csv")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        assert response.streaming
+
+        content = b"".join(response.streaming_content).decode()
+        header, *rows = csv.reader(content.splitlines())
+        assert header == [
+            "id",
+            "sender",
+            "receiver",
+            "transfer_amount",
+            "fee",
+            "received_amount",
+            "exchange_rate",
+            "status",
+            "timestamp",
+        ]
+        expected = Transaction.objects.for_user(user1)
+        assert [int(row[0]) for row in rows] == [t.id for t in expected]
+        assert rows[0][1:3] == ["U1RUS1", "U2RUS1"]
+
+    @pytest.mark.django_db
+    def test_transaction_export_ndjson(self, client, user2, create_transactions):
+        """Testing ndjson export of user transactions"""
+
+        client.force_login(user2)
+        response = client.get("/transactions/export/?format=ndjson")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson; charset=utf-8"
+
+        content = b"".join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        assert len(rows) == 4
+        assert rows[-1]["sender"] == "U2USD1"
+        assert rows[-1]["receiver"] == "U2USD2"
+        assert float(rows[-1]["transfer_amount"]) == 10
+
+    @pytest.mark.django_db
+    def test_transaction_export_invalid_requests(self, client, user1):
+        """Testing export permissions and formats"""
+
+        response = client.get("/transactions/export/?format=ndjson")
+        assert response.status_code == 403
+
+        client.force_login(user1)
+        response = client.get("/transactions/export/?format=xml")
+        assert response.status_code == 404
+
+        response = client.get("/transactions/export/")
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+
+
 class TestTransactionIdDetailApi:
     """Class to test /transaction/<int:id>"""
 
@@ -304,7 +666,7 @@ class TestTransactionOfWalletApi:
 
         client.force_login(user1)
         response = client.get(f"/transactions/{user1_wallet_name}/")
-        response_transactions = response.json()
+        response_transactions = response.json()["results"]
         assert response.status_code == 200
 
         user1_wallet = Wallet.objects.get(name=user1_wallet_name)
@@ -1,9 +1,14 @@
 """Modeule for testing /wallets and /wallets/<str:name> api"""
 
 
+import threading
+
 import pytest
 from django.contrib.auth.models import User
-from WalletService.models import Wallet
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from WalletService.models import Wallet, WalletCounter
 
 
 @pytest.fixture
@@ -91,6 +96,79 @@ class TestWalletApi:
         response = client.post("/wallets/", data=data)
         assert response.status_code == 400
 
+    @pytest.mark.django_db
+    def test_wallet_counter(self, user, client):
+        """Limit is checked with the counter, deleted wallets free their places"""
+        data = {"type": "Visa", "currency": "USD"}
+        client.force_login(user)
+        Wallet.objects.create(name="OLD00001", type="Visa", currency="USD", user=user)
+        response = client.post("/wallets/", data=data)
+        assert response.status_code == 201
+        # the counter of a user with wallets made before counters starts at their count
+        assert WalletCounter.objects.get(user=user).wallets == 2
+
+        with CaptureQueriesContext(connection) as context:
+            client.post("/wallets/", data=data)
+        sql = " ".join(query["sql"] for query in context.captured_queries)
+        assert "COUNT(" not in sql.upper()
+
+        client.delete("/wallets/OLD00001/")
+        assert WalletCounter.objects.get(user=user).wallets == 2
+        for i in range(Wallet.MAX_USER_WALLETS):
+            client.post("/wallets/", data=data)
+        assert Wallet.objects.filter(user=user).count() == Wallet.MAX_USER_WALLETS
+        assert WalletCounter.objects.get(user=user).wallets == Wallet.MAX_USER_WALLETS
+
+    @pytest.mark.django_db
+    def test_wallet_counter_outside_api(self, user, client):
+        """Wallets created without the api are counted too, so deleting them
+        doesn't let a user go over the limit
+        """
+        data = {"type": "Visa", "currency": "USD"}
+        client.force_login(user)
+        assert client.post("/wallets/", data=data).status_code == 201
+        for i in range(Wallet.MAX_USER_WALLETS - 1):
+            Wallet.objects.create(
+                name=f"OLD0000{i}", type="Visa", currency="USD", user=user
+            )
+        assert client.post("/wallets/", data=data).status_code == 400
+
+        Wallet.objects.get(name="OLD00000").delete()
+        assert client.post("/wallets/", data=data).status_code == 201
+        assert client.post("/wallets/", data=data).status_code == 400
+        assert Wallet.objects.filter(user=user).count() == Wallet.MAX_USER_WALLETS
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_wallets_creation(self, user):
+        """Concurrent creations never give a user more wallets than allowed"""
+        data = {"type": "Visa", "currency": "USD"}
+        clients = [Client() for _ in range(Wallet.MAX_USER_WALLETS * 2)]
+        for client in clients:
+            client.force_login(user)
+        clients[0].post("/wallets/", data=data)
+        barrier = threading.Barrier(len(clients))
+        statuses = []
+
+        def create(client):
+            """Creates a wallet once every thread is ready"""
+            try:
+                barrier.wait()
+                statuses.append(client.post("/wallets/", data=data).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=create, args=(client,)) for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(statuses) == [201] * (Wallet.MAX_USER_WALLETS - 1) + [400] * (
+            len(clients) - Wallet.MAX_USER_WALLETS + 1
+        )
+        assert Wallet.objects.filter(user=user).count() == Wallet.MAX_USER_WALLETS
+
     @pytest.mark.django_db
     def test_wallet_method_not_allowed(self, client, user):
         """Testing if PUT, PATCH are allowed"""